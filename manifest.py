@@ -201,7 +201,7 @@ DIST_FILES = [
     ] + \
     listTree('pyformex',listdirs=False,sorted=True,
              excludedirs=['.svn'],
-             includedirs=['gui','plugins'],
+             includedirs=['gui','plugins','bench'],
              includefiles=['.*\.py$','pyformex(rc)?$'],
              excludefiles=['core.py','curvetools.py','backports.py'],
              ) + \
@@ -105,8 +105,8 @@ class DebugLevels(object):
     NONE = 0
     INFO, WARNING, OPTION, CONFIG, DETECT, MEM, SCRIPT, GUI, MENU, DRAW, \
           CANVAS, OPENGL, LIB, MOUSE, APPS, IMAGE, MISC, ABQ, WIDGET, \
-          PROJECT, MULTI = \
-          [ 2 ** i for i in range(21) ]
+          PROJECT, MULTI, MESH, FILE = \
+          [ 2 ** i for i in range(23) ]
 
 delattr(DebugLevels,'i')
 
@@ -118,7 +118,7 @@ def reduceAdjacency(adj):
     n = adj.shape[0]
     adj[adj == arange(n).reshape(n,-1)] = -1 # remove the item i
     adj = sortAdjacency(adj)
-    adj[adj[:,:-1] == adj[:,1:]] = -1 #remove duplicate items
+    adj[:,:-1][adj[:,:-1] == adj[:,1:]] = -1 #remove duplicate items
     adj = sortAdjacency(adj)
     return adj
 
@@ -314,8 +314,8 @@ class Adjacency(ndarray):
         a pair of adjacent elements. The element number in the first columne
         is always the smaller of the two element numbers.
         """
-        p = [ [[i,j] for j in k if j >= 0] for i,k in enumerate(self[:-1]) if max(k) >= 0]
-        p = row_stack(p)
+        i,j = where(self >= 0)
+        p = column_stack([i,self[i,j]]).astype(self.dtype)
         return p[p[:,1] > p[:,0]]
   
   
@@ -379,8 +379,9 @@ class Adjacency(ndarray):
             return
 
         # Remember current elements front
-        elems = clip(asarray(startat),0,self.nelems())
+        elems = clip(asarray(startat),0,self.nelems()-1)
         prop = 0
+        first = 0
         while elems.size > 0:
             # Store prop value for current elems
             p[elems] = prop
@@ -396,13 +397,83 @@ class Adjacency(ndarray):
                 continue
 
             # No more elements in this part: start a new one
-            elems = where(p<0)[0]
+            # All elements before first have been visited
+            elems = where(p[first:]<0)[0][:1]
             if elems.size > 0:
                 # Start a new part
-                elems = elems[[0]]
+                first += elems[0]
+                elems = array([first])
                 prop += partinc
 
 
+    def components(self):
+        """Find the connected components of the adjacency graph.
+
+        Two elements belong to the same component if they are connected
+        by a chain of adjacent elements.
+
+        Returns an int array with the component number of each element.
+        The components are numbered in order of their lowest element
+        number.
+
+        Example:
+
+        >>> A = Adjacency([[1,-1],[0,-1],[-1,-1],[4,-1],[3,-1]])
+        >>> print(A.components())
+        [0 0 1 2 2]
+        """
+        n = self.nelems()
+        p = self.pairs()
+        try:
+            from scipy.sparse import coo_matrix
+            from scipy.sparse.csgraph import connected_components
+            g = coo_matrix((ones(p.shape[0],dtype=int8),(p[:,0],p[:,1])),shape=(n,n))
+            lab = connected_components(g,directed=False)[1]
+        except ImportError:
+            lab = connectedLabels(n,p)
+        # Renumber in order of the lowest element
+        first = unique(lab,return_index=True)[1]
+        num = zeros(first.size,dtype=int)
+        num[lab[sort(first)]] = arange(first.size)
+        return num[lab]
+
+
+    def frontLevels(self,startat,maxlevel=-1):
+        """Compute the front levels from a set of starting elements.
+
+        This performs a breadth first search, starting from all elements
+        in `startat` at once.
+
+        Parameters:
+
+        - `startat`: int or int array: element(s) of the initial front.
+        - `maxlevel`: int: if non-negative, the walk is stopped after
+          reaching level `maxlevel`.
+
+        Returns an int array with for each element the number of steps
+        needed to reach it from the nearest start element, or -1 if the
+        element is not reached.
+
+        Example:
+
+        >>> A = Adjacency([[1,-1],[0,2],[1,-1],[4,-1],[3,-1]])
+        >>> print(A.frontLevels([0,4]))
+        [0 1 2 1 0]
+        """
+        lev = -ones(self.nelems(),dtype=int)
+        front = unique(asarray(startat,dtype=int))
+        level = 0
+        while front.size > 0:
+            lev[front] = level
+            if level == maxlevel:
+                break
+            level += 1
+            front = asarray(self[front]).ravel()
+            front = front[front >= 0]
+            front = unique(front[lev[front] < 0])
+        return lev
+
+
     def frontWalk(self,startat=0,frontinc=1,partinc=1,maxval=-1):
         """Walks through the elements by their node front.
 
@@ -411,12 +482,18 @@ class Adjacency(ndarray):
         over a given number of single pass increments. The step number at
         which an element is reached is recorded and returned.
 
+        The result is the same as the last array yielded by
+        :meth:`frontFactory`, but all parts after the first one are
+        walked simultaneously, using the connected components of the
+        graph. This makes it efficient for tables with many parts.
+
         Parameters:
 
         - `startat`: initial element numbers in the front. It can be a single
           element number or a list of numbers.
         - `frontinc`: increment for the front number on each frontal step.
         - `partinc`: increment for the front number when the front
+          gets empty and a new part is started.
         - `maxval`: maximum frontal value. If negative (default) the walk will
           continue until all elements have been reached. If non-negative,
           walking will stop as soon as the frontal value reaches this
@@ -434,14 +511,164 @@ class Adjacency(ndarray):
           ...       [-1, -1,  0,  1],
           ...       [-1, -1,  2,  5],
           ...       [-1, -1,  2,  4]])
-          >>> print A.frontWalk()
+          >>> print(A.frontWalk())
           [0 1 1 1 2 2]
         """
-        for p in self.frontFactory(startat=startat,frontinc=frontinc,partinc=partinc):
-            if maxval >= 0:
-                if p.max() > maxval:
-                    break
+        n = self.nelems()
+        if n <= 0:
+            return -ones(0,dtype=int)
+        startat = clip(asarray(startat,dtype=int).reshape(-1),0,n-1)
+
+        # Walk the first part, which may be stopped by maxval
+        maxlevel = -1
+        if maxval >= 0 and frontinc > 0:
+            maxlevel = maxval // frontinc + 1
+        lev = self.frontLevels(startat,maxlevel)
+        p = lev * frontinc
+        p[lev < 0] = -1
+        if maxval >= 0 and lev.max() * frontinc > maxval:
+            return p
+        rest = lev < 0
+        if not rest.any():
+            return p
+
+        # Walk all other parts together, from their lowest element
+        comp = self.components()
+        comp = unique(comp[rest],return_inverse=True)[1]
+        first = unique(comp,return_index=True)[1]
+        ind = where(rest)[0]
+        lev = self.frontLevels(ind[first])[ind]
+
+        # Front value of the start of each part
+        nlev = zeros(first.size,dtype=int)
+        maximum.at(nlev,comp,lev)
+        start = p.max() + frontinc + partinc
+        base = start + concatenate([[0],cumsum((nlev[:-1]+1)*frontinc + partinc)])
+        val = base[comp] + lev * frontinc
+
+        if maxval >= 0:
+            # Stop at the first front exceeding maxval
+            over = val > maxval
+            if over.any():
+                part = comp[over].min()
+                level = lev[over & (comp == part)].min()
+                keep = (comp < part) | ((comp == part) & (lev <= level))
+                val[~keep] = -1
+        p[ind] = val
         return p
 
 
+    def cuthillMcKee(self,reverse=True):
+        """Return the (reverse) Cuthill-McKee order of the items.
+
+        The Cuthill-McKee ordering numbers the items in breadth first
+        order, starting from a pseudo-peripheral item in each connected
+        component. The unnumbered neighbours of each item are numbered
+        in order of increasing degree. The reversed order generally gives
+        a lower profile. Both result in a small bandwidth of the
+        adjacency matrix.
+
+        All components are processed simultaneously, one level at a time.
+
+        Parameters:
+
+        - `reverse`: bool: if True (default), the reverse Cuthill-McKee
+          order is returned.
+
+        Returns an int array with the item numbers in the new order.
+
+        Example:
+
+        >>> A = Adjacency([[3,-1],[2,-1],[1,3],[0,2]])
+        >>> print(A.cuthillMcKee(reverse=False))
+        [1 2 3 0]
+        """
+        n = self.nelems()
+        if n == 0:
+            return zeros(0,dtype=int)
+        deg = (self >= 0).sum(axis=-1)
+        comp = self.components()
+        ncomp = comp.max() + 1
+
+        def minDegree(sel):
+            """Item with minimum degree in each component among sel"""
+            ind = where(sel)[0]
+            srt = ind[lexsort((deg[ind],comp[ind]))]
+            first = unique(comp[srt],return_index=True)[1]
+            return srt[first]
+
+        # Pseudo-peripheral start items
+        start = minDegree(ones(n,dtype=bool))
+        ecc = zeros(ncomp,dtype=int)
+        for i in range(4):
+            lev = self.frontLevels(start)
+            emax = zeros(ncomp,dtype=int)
+            maximum.at(emax,comp,lev)
+            if (emax <= ecc).all():
+                break
+            better = emax > ecc
+            ecc = maximum(ecc,emax)
+            new = minDegree(lev == emax[comp])
+            start[better] = new[better]
+        lev = self.frontLevels(start)
+
+        # Number the items level by level
+        rank = -ones(n,dtype=int)
+        rank[start] = comp[start]
+        items = start[argsort(comp[start])]
+        order = [ items ]
+        nr = items.size
+        for l in range(1,lev.max()+1):
+            items = where(lev == l)[0]
+            nb = asarray(self[items])
+            prev = (nb >= 0) & (lev[nb] == l-1)
+            parent = where(prev,rank[nb],n).min(axis=-1)
+            items = items[lexsort((items,deg[items],parent,comp[items]))]
+            rank[items] = arange(nr,nr+items.size)
+            nr += items.size
+            order.append(items)
+        # Sort on component and level
+        order = concatenate(order)
+        order = order[lexsort((lev[order],comp[order]))]
+        if reverse:
+            order = order[::-1]
+        return order
+
+
+def connectedLabels(n,pairs):
+    """Label the connected components of a graph.
+
+    - `n`: int: number of nodes in the graph.
+    - `pairs`: (npairs,2) int array with the connected node pairs.
+
+    Returns an int array with a label for each node. Nodes in the same
+    component get the same label, which is the lowest node number in the
+    component.
+
+    Example:
+
+    >>> print(connectedLabels(6,[[3,4],[1,4],[0,5]]))
+    [0 1 2 1 1 0]
+    """
+    lab = arange(n)
+    pairs = asarray(pairs).reshape(-1,2)
+    i,j = pairs[:,0],pairs[:,1]
+    while True:
+        # Hook the roots to the lowest connected root
+        li,lj = lab[i],lab[j]
+        todo = li != lj
+        if not todo.any():
+            return lab
+        i,j,li,lj = i[todo],j[todo],li[todo],lj[todo]
+        m = minimum(li,lj)
+        minimum.at(lab,li,m)
+        minimum.at(lab,lj,m)
+        # Compress the paths
+        while True:
+            ll = lab[lab]
+            if (ll == lab).all():
+                break
+            lab = ll
+
+
 # End
@@ -91,6 +91,16 @@ def setAppDirs():
         pf.debug(str(p),pf.DEBUG.CONFIG)
 
 
+def checkAppDirs():
+    """Make sure that the application directories have been set.
+
+    Without GUI, the application directories are only set when they are
+    needed for the first time.
+    """
+    if getattr(pf,'appdirs',None) is None:
+        setAppDirs()
+
+
 def addAppDir(d):
     """Add the application directory d to the sys.path
 
@@ -143,6 +153,7 @@ directory as a pyFormex application path.
 
 def findAppDir(path):
     """Return the AppDir for a given path"""
+    checkAppDirs()
     for p in pf.appdirs:
         if p.path == path:
             return p
@@ -158,6 +169,7 @@ def load(appname,refresh=False):
     traceback is store in a module variable _traceback.
     """
     global _traceback
+    checkAppDirs()
     pf.debug("Loading %s with refresh=%s" % (appname,refresh),pf.DEBUG.APPS)
     print("Loading application %s " % appname)
     try:
@@ -176,6 +188,7 @@ def load(appname,refresh=False):
 def findmodule(mod):
     """Find the path a module would be loaded from"""
     import sys, imp, os
+    checkAppDirs()
     path = sys.path
     for i in mod.split('.'):
         path = [imp.find_module(i,path)[1],]
@@ -674,6 +674,38 @@ def growAxis(a,add,axis=-1,fill=0):
         return concatenate([a,fill * ones(missing,dtype=a.dtype)],axis=axis)
 
 
+def growBuffer(a,n,size):
+    """Make sure an array has room for a number of items along axis 0.
+
+    This is a helper function for accumulating data in a buffer array
+    with amortized growth.
+
+    Parameters:
+
+    - `a`: array: the buffer.
+    - `n`: int: the number of items (along axis 0) of `a` that are in use.
+    - `size`: int: the required number of items.
+
+    Returns `a` itself if it has at least `size` items. Else, returns a new
+    (uninitialized) array of the same type, with the first `n` items
+    copied from `a` and with at least twice the number of items of `a`.
+    Growing the buffer by doubling its size makes the total cost of
+    repeatedly adding items to it linear in the final number of items.
+
+    Example:
+
+      >>> a = growBuffer(arange(3),3,4)
+      >>> a.shape, a[:3]
+      ((6,), array([0, 1, 2]))
+
+    """
+    if a.shape[0] >= size:
+        return a
+    b = empty((max(size,2*a.shape[0]),)+a.shape[1:],dtype=a.dtype)
+    b[:n] = a[:n]
+    return b
+
+
 def reorderAxis(a,order,axis=-1):
     """Reorder the planes of an array along the specified axis.
 
@@ -0,0 +1,283 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+"""Benchmarks for the core operations of pyFormex.
+
+This package contains a simple framework to time a set of benchmarks
+of performance critical operations at some synthetic problem sizes.
+The results can be saved to a JSON file, together with information
+about the machine, and compared with a baseline saved earlier.
+
+The benchmarks themselves are defined in the module :mod:`bench.cases`.
+The benchmark suite can be run from the command line with::
+
+  pyformex --bench [-- options] [benchmark names]
+
+See :func:`main` for the options.
+"""
+from __future__ import print_function
+
+import pyformex as pf
+import os,sys,time
+
+
+# The standard problem sizes
+sizes = {
+    'small': 20,
+    'medium': 100,
+    'large': 300,
+    }
+
+# The registered benchmarks
+benchmarks = []
+
+
+class Benchmark(object):
+    """A benchmark of some operation.
+
+    Parameters:
+
+    - `name`: the name of the benchmark.
+    - `func`: the function to be timed.
+    - `setup`: a function taking a size parameter n and returning a
+      tuple with the arguments for `func`. It is called before each
+      timed run, so that every run starts from fresh objects without
+      cached data. The time spent in `setup` is not included in the
+      benchmark.
+    - `sizes`: a dict mapping the size names to the size parameters n.
+      The default uses the standard :data:`sizes`.
+    - `teardown`: a function called with the arguments returned by
+      `setup` after each timed run, e.g. to remove temporary files.
+    """
+
+    def __init__(self,name,func,setup,sizes=None,teardown=None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.sizes = sizes
+        self.teardown = teardown
+
+
+    def size(self,size):
+        """Return the size parameter for the named size."""
+        if self.sizes is None:
+            return sizes[size]
+        return self.sizes[size]
+
+
+    def run(self,size,repeat=3):
+        """Run the benchmark for the given size.
+
+        The timed function is run `repeat` times, each time on the
+        arguments of a new call of `setup`, and the shortest time
+        (in seconds) is returned. Any output to sys.stdout during the
+        setup and the timed runs is discarded.
+        """
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull,'w')
+        try:
+            times = []
+            for i in range(repeat):
+                args = self.setup(self.size(size))
+                try:
+                    t = time.time()
+                    self.func(*args)
+                    times.append(time.time()-t)
+                finally:
+                    if self.teardown:
+                        self.teardown(*args)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        return min(times)
+
+
+def benchmark(name,setup,sizes=None,teardown=None):
+    """Decorator registering a function as a benchmark.
+
+    See :class:`Benchmark` for the parameters.
+    """
+    def register(func):
+        benchmarks.append(Benchmark(name,func,setup,sizes,teardown))
+        return func
+    return register
+
+
+def machineInfo():
+    """Return a dict with information about the machine and software."""
+    import platform
+    import numpy
+    import utils
+    from multiprocessing import cpu_count
+    return {
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpus': cpu_count(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pyformex': pf.fullVersion(),
+        'libraries': utils.Libraries(),
+        }
+
+
+def runBenchmarks(names=None,sizes=['small','medium'],repeat=3,verbose=True):
+    """Run the benchmarks.
+
+    Parameters:
+
+    - `names`: list of benchmark names to run. The default runs all
+      registered benchmarks.
+    - `sizes`: list of the size names at which to run the benchmarks.
+    - `repeat`: number of times each benchmark is repeated. The shortest
+      time is recorded.
+    - `verbose`: if True, the results are printed while running.
+
+    Returns a list of dicts with keys 'name', 'size', 'n' and 'time'.
+    A benchmark that raises an exception is reported with a time None
+    and the error message under the key 'error'.
+    """
+    import cases
+    res = []
+    for b in benchmarks:
+        if names and b.name not in names:
+            continue
+        for size in sizes:
+            r = { 'name':b.name, 'size':size, 'n':b.size(size) }
+            try:
+                r['time'] = b.run(size,repeat)
+                msg = "%10.4f" % r['time']
+            except Exception as e:
+                r['time'] = None
+                r['error'] = "%s: %s" % (e.__class__.__name__,e)
+                msg = "    FAILED %s" % r['error']
+            if verbose:
+                print("%-20s %-8s %s" % (b.name,size,msg))
+                sys.stdout.flush()
+            res.append(r)
+    return res
+
+
+def saveResults(filename,results):
+    """Save benchmark results to a JSON file, with the machine info."""
+    import json
+    data = {
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': machineInfo(),
+        'results': results,
+        }
+    with open(filename,'w') as fil:
+        json.dump(data,fil,indent=1,sort_keys=True)
+
+
+def loadResults(filename):
+    """Load the benchmark results from a JSON file saved by saveResults."""
+    import json
+    with open(filename) as fil:
+        return json.load(fil)['results']
+
+
+def compare(results,baseline,tolerance=0.25):
+    """Compare benchmark results with a baseline.
+
+    Parameters:
+
+    - `results`: list of results as returned by :func:`runBenchmarks`.
+    - `baseline`: list of results to compare with.
+    - `tolerance`: relative increase of the time that is accepted.
+
+    Returns a list of (name,size,time,basetime) tuples for the benchmarks
+    that have become slower than the baseline time by more than the
+    tolerance, or that fail while they did not in the baseline.
+    """
+    base = dict([ ((r['name'],r['size']),r['time']) for r in baseline ])
+    slower = []
+    for r in results:
+        key = (r['name'],r['size'])
+        t0 = base.get(key,None)
+        if t0 is None:
+            continue
+        if r['time'] is None or r['time'] > t0 * (1.+tolerance):
+            slower.append((r['name'],r['size'],r['time'],t0))
+    return slower
+
+
+def main(args):
+    """Run the benchmark suite from the command line.
+
+    `args` is the list of command line arguments. Arguments not starting
+    with a '-' are the names of the benchmarks to run. The options are:
+
+    - ``--list``: list the benchmarks and exit.
+    - ``--size SIZES``: comma separated list of the sizes to run.
+      Default 'small,medium'.
+    - ``--repeat N``: number of repetitions per benchmark. Default 3.
+    - ``--output FILE``: save the results to FILE in JSON format.
+    - ``--baseline FILE``: compare the results with those in FILE.
+    - ``--tolerance TOL``: accepted relative slowdown. Default 0.25.
+
+    Returns 1 if the comparison with the baseline found regressions,
+    else 0.
+    """
+    import optparse
+    import cases
+    parser = optparse.OptionParser(usage="pyformex --bench [-- options] [names]")
+    parser.add_option("--list",action="store_true",default=False,
+                      help="List the available benchmarks and exit")
+    parser.add_option("--size",default='small,medium',
+                      help="Comma separated list of sizes (%s)" % ','.join(sorted(sizes,key=sizes.get)))
+    parser.add_option("--repeat",type="int",default=3,
+                      help="Number of repetitions per benchmark")
+    parser.add_option("--output",default=None,
+                      help="Save the results to this JSON file")
+    parser.add_option("--baseline",default=None,
+                      help="Compare the results with this JSON file")
+    parser.add_option("--tolerance",type="float",default=0.25,
+                      help="Accepted relative slowdown compared to the baseline")
+    opts,names = parser.parse_args(args)
+
+    if opts.list:
+        print('\n'.join([ b.name for b in benchmarks ]))
+        return 0
+
+    results = runBenchmarks(names,opts.size.split(','),opts.repeat)
+    if opts.output:
+        saveResults(opts.output,results)
+        print("Saved benchmark results to %s" % opts.output)
+    if opts.baseline:
+        slower = compare(results,loadResults(opts.baseline),opts.tolerance)
+        if slower:
+            print("Benchmarks slower than the baseline %s:" % opts.baseline)
+            for name,size,t,t0 in slower:
+                if t is None:
+                    t = "FAILED"
+                else:
+                    t = "%.4f" % t
+                print("%-20s %-8s %10s %10.4f" % (name,size,t,t0))
+            return 1
+        print("No regressions compared to the baseline %s" % opts.baseline)
+    return 0
+
+
+# End
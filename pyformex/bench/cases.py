@@ -0,0 +1,199 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+"""The benchmarks of the pyFormex benchmark suite.
+
+All benchmarks work on synthetic models generated from a size parameter
+n, so that they are reproducible on any machine. Most use a wavy
+triangulated surface of 2*n*n triangles.
+"""
+from __future__ import print_function
+
+import pyformex as pf
+from bench import benchmark
+from formex import *
+from mesh import Mesh
+from connectivity import Connectivity
+from elements import elementType
+from plugins.trisurface import TriSurface
+import arraytools
+import os,shutil,tempfile
+
+
+def _surface(n):
+    """Return a wavy triangulated surface with 2*n*n triangles."""
+    S = TriSurface(Formex('3:012934').replic2(n,n))
+    x = S.coords
+    x[:,2] = 0.1*n*sin(x[:,0]*2*pi/n)*cos(x[:,1]*2*pi/n)
+    return S
+
+
+def _tempfile(name):
+    """Return a file name in a new temporary directory."""
+    return os.path.join(tempfile.mkdtemp(prefix='pyformex-bench-'),name)
+
+
+def _cleanup(fn):
+    """Remove the temporary directory containing the file fn."""
+    shutil.rmtree(os.path.dirname(fn),ignore_errors=True)
+
+
+############ Mesh topology ############
+
+def _points(n):
+    S = _surface(n)
+    return S.coords[S.elems].reshape(-1,3),
+
+@benchmark('fuse',_points)
+def fuse(x):
+    x.fuse()
+
+
+@benchmark('inverseIndex',lambda n: (_surface(n).elems.view(ndarray),))
+def inverseIndex(elems):
+    arraytools.inverseIndex(elems)
+
+
+@benchmark('adjacency',lambda n: (_surface(n).elems.view(ndarray),))
+def adjacency(elems):
+    # A new Connectivity is needed because the inverse is cached
+    Connectivity(elems).adjacency('e')
+
+
+@benchmark('insertLevel',lambda n: (_surface(n).elems.view(ndarray),))
+def insertLevel(elems):
+    Connectivity(elems,eltype=elementType('tri3')).insertLevel(1)
+
+
+@benchmark('getBorder',lambda n: (_surface(n),))
+def getBorder(S):
+    Mesh(S.coords,S.elems).getBorder()
+
+
+############ Surface operations ############
+
+@benchmark('smooth',lambda n: (_surface(n),))
+def smooth(S):
+    S.smooth()
+
+
+@benchmark('subdivide',lambda n: (_surface(n),))
+def subdivide(S):
+    Mesh(S.coords,S.elems).subdivide(2)
+
+
+# This uses the Formex method, because fixing the normals of the
+# TriSurface result needs an external program
+@benchmark('cutWithPlane',lambda n: (_surface(n).toFormex(),))
+def cutWithPlane(F):
+    F.cutWithPlane(F.center(),[1.,1.,0.],side='+')
+
+
+@benchmark('distanceOfPoints',lambda n: (_surface(n),))
+def distanceOfPoints(S):
+    X = Coords([[0.,0.,1.],[0.5,0.5,-1.],[1.,1.,0.]]) * S.sizes()
+    S.distanceOfPoints(X)
+
+
+############ File formats ############
+
+@benchmark('writeSTL',lambda n: (_surface(n),))
+def writeSTL(S):
+    fn = _tempfile('bench.stl')
+    try:
+        S.write(fn,'stlb')
+    finally:
+        _cleanup(fn)
+
+
+def _stlfile(n):
+    fn = _tempfile('bench.stl')
+    _surface(n).write(fn,'stlb')
+    return fn,
+
+@benchmark('readSTL',_stlfile,teardown=_cleanup)
+def readSTL(fn):
+    TriSurface.read(fn)
+
+
+@benchmark('writePGF',lambda n: (_surface(n),))
+def writePGF(S):
+    import geomfile
+    fn = _tempfile('bench.pgf')
+    try:
+        f = geomfile.GeometryFile(fn,'w')
+        f.write(S)
+        f.close()
+    finally:
+        _cleanup(fn)
+
+
+def _pgffile(n):
+    import geomfile
+    fn = _tempfile('bench.pgf')
+    f = geomfile.GeometryFile(fn,'w')
+    f.write(_surface(n))
+    f.close()
+    return fn,
+
+@benchmark('readPGF',_pgffile,teardown=_cleanup)
+def readPGF(fn):
+    import geomfile
+    geomfile.GeometryFile(fn,'r').read()
+
+
+def _abqmodel(n):
+    from plugins.fe import mergedModel
+    from plugins.properties import PropertyDB,ElemSection
+    from plugins.fe_abq import Step,AbqData
+    S = _surface(n)
+    M = mergedModel([Mesh(S.coords,S.elems)])
+    P = PropertyDB()
+    steel = {
+        'name': 'steel',
+        'young_modulus': 207000,
+        'poisson_ratio': 0.3,
+        'density': 0.1,
+        }
+    plate = {
+        'name': 'plate',
+        'sectiontype': 'solid',
+        'thickness': 0.01,
+        'material': 'steel',
+        }
+    P.elemProp(set=arange(S.nelems()),eltype='CPS3',section=ElemSection(section=plate,material=steel))
+    bnodes = where(M.coords.test(max=M.coords.bbox()[0,0]+0.01))[0]
+    P.nodeProp(tag='init',set=bnodes,bound=[1,1,0,0,0,0])
+    return AbqData(M,prop=P,steps=[Step()],bound=['init']),
+
+@benchmark('writeAbaqus',_abqmodel)
+def writeAbaqus(data):
+    fn = _tempfile('bench.inp')
+    try:
+        data.write(jobname=fn,group_by_group=True)
+    finally:
+        _cleanup(fn)
+
+
+# End
@@ -37,7 +37,10 @@ from __future__ import print_function
 from arraytools import *
 from adjacency import *
 from utils import deprecation
+import bisect
 from messages import _future_deprecation
+from instrument import instrumented
+import pyformex as pf
 
 
 # BV: Should we make an InverseConnectivity class?
@@ -513,6 +516,9 @@ class Connectivity(ndarray):
             node 0, then the as yet unlisted elements connected to node 1, etc.
           - 'random': the elements are randomly renumbered.
           - 'reverse': the elements are renumbered in reverse order.
+          - 'rcm': the elements are renumbered in reverse Cuthill-McKee
+            order of the element adjacency, giving elements that share
+            nodes close numbers.
 
        	Returns:
 
@@ -539,13 +545,19 @@ class Connectivity(ndarray):
                  [2, 3]])
 
         """
-        if order == 'nodes':
+        if not isinstance(order,basestring):
+            pass
+        elif order == 'nodes':
             a = sort(self,axis=-1)  # first sort rows
             order = sortByColumns(a)
         elif order == 'reverse':
             order = arange(self.nelems()-1,-1,-1)
         elif order == 'random':
             order = random.permutation(self.nelems())
+        elif order == 'rcm':
+            order = self.adjacency('e').cuthillMcKee()
+        if isinstance(order,basestring):
+            raise ValueError,"Invalid order: %s" % order
         else:
             order = asarray(order)
             if not (order.dtype.kind == 'i' and \
@@ -554,6 +566,32 @@ class Connectivity(ndarray):
         return order
 
 
+    def bandwidth(self):
+        """Return the bandwidth and profile of the node numbering.
+
+        These are the bandwidth and profile of a symmetric matrix with
+        nonzero entries for all pairs of nodes in the same element, as
+        e.g. the stiffness matrix of a finite element model.
+        The bandwidth is the largest difference between the numbers of
+        two nodes of the same element. The profile is the sum over all
+        nodes of the difference between the node number and the lowest
+        node number it is connected to.
+
+        Returns a tuple of two ints (bandwidth,profile).
+
+        Example:
+
+          >>> Connectivity([[0,1],[1,2],[2,3],[3,0]]).bandwidth()
+          (3, 5)
+        """
+        if self.size == 0:
+            return 0,0
+        lo = self.min(axis=1)
+        low = arange(self.max()+1)
+        minimum.at(low,self.ravel(),repeat(lo,self.nplex()))
+        return int((self.max(axis=1) - lo).max()),int((arange(low.size) - low).sum())
+
+
     def renumber(self,start=0):
         """Renumber the nodes to a consecutive integer range.
 
@@ -599,6 +637,7 @@ class Connectivity(ndarray):
         return elems,nodes
 
 
+    @instrumented(pf.DEBUG.MESH,'Connectivity.inverse')
     def inverse(self):
         """Return the inverse index of a Connectivity table.
 
@@ -744,6 +783,11 @@ class Connectivity(ndarray):
                 inv[mask] = -1
             adj = inv[self].reshape((self.nelems(),-1))
         elif kind == 'n':
+            import memory
+            nbytes = 4 * inv.size * self.nplex() * inv.dtype.itemsize
+            rows = memory.chunksize('Connectivity.adjacency',nbytes,inv.shape[0])
+            if rows < inv.shape[0]:
+                return Adjacency(_nodeAdjacency(self,inv,rows),normalize=False)
             adj = concatenate([where(inv>=0,self[:,i][inv],inv) for i in range(self.nplex())],axis=1)
         else:
             raise ValueError,"kind should be 'e' or 'n', got %s" % str(kind)
@@ -795,6 +839,7 @@ class Connectivity(ndarray):
     # BV: should we add a 'unique=False' option to create tables of
     # all intermediate entities without uniqifying?
     #
+    @instrumented(pf.DEBUG.MESH,'Connectivity.insertLevel')
     def insertLevel(self,selector):
         """Insert an extra hierarchical level in a Connectivity table.
 
@@ -1351,6 +1396,33 @@ def findConnectedLineElems(elems):
     srt = zeros_like(elems) - 1
     ind = zeros((elems.shape[0],2),dtype=Int)
     ind[:,0] = -1
+    #
+    # To find the elements connected to a node, we use a lookup table
+    # of the end nodes, sorted by node number and then by the position
+    # in elems[:,[0,-1]]. This finds the same element as a where()
+    # on the whole table would, but in constant time.
+    #
+    ends = asarray(elems[:,[0,-1]]).ravel()
+    order = argsort(ends,kind='mergesort')
+    nodes = ends[order].tolist()
+    order = order.tolist()
+    used = (elems[:,0] < 0).tolist()
+    first = {}
+
+    def findNext(j):
+        """Return the first unused element with end node j, and the column"""
+        i = first.get(j,None)
+        if i is None:
+            i = bisect.bisect_left(nodes,j)
+        while i < len(nodes) and nodes[i] == j:
+            e,c = divmod(order[i],2)
+            if not used[e]:
+                first[j] = i
+                return e,c
+            i += 1
+        first[j] = i
+        return None
+
     ie = 0
     je = 0
     rev = False
@@ -1364,19 +1436,18 @@ def findConnectedLineElems(elems):
             srt[ie] = elems[je]
             ind[ie] = ( je, +1 )
         elems[je] = -1 # Done with this one
+        used[je] = True
         j = srt[ie][-1] # remember endpoint
         if j == k:
             break
         ie += 1
 
         # Look for the next connected element (only thru first or last node!)
-        w = where(elems[:,[0,-1]] == j)
-        #print(w)
-        if w[0].size == 0:
+        w = findNext(int(j))
+        if w is None:
             # Try reversing
-            w = where(elems[:,[0,-1]] == k)
-            #print(w)
-            if w[0].size == 0:
+            w = findNext(int(k))
+            if w is None:
                 break
             else:
                 j,k = k,j
@@ -1384,8 +1455,8 @@ def findConnectedLineElems(elems):
                 srt[:ie] = srt[ie-1::-1,::-1].copy()  # copy needed!!
                 ind[:ie] = ind[ie-1::-1].copy() # rows only
                 ind[:ie,1] *= -1 # change sign of 2nd column
-        je = w[0][0]
-        rev = w[-1][0] > 0 #check if the target node is the first or last
+        je = w[0]
+        rev = w[1] > 0 #check if the target node is the first or last
 
     return srt,ind
 
@@ -1476,6 +1547,27 @@ def connectedLineElems(elems,return_indices=False):
 
 
 
+def _nodeAdjacency(elems,inv,rows):
+    """Compute the node adjacency table in chunks of nodes.
+
+    This computes the same table as ``elems.adjacency('n')``, but processes
+    the nodes in chunks of `rows` nodes to limit the size of the temporary
+    arrays. `inv` is the inverse index of `elems`.
+
+    Returns the reduced adjacency table as an integer array.
+    """
+    res = []
+    for i in range(0,inv.shape[0],rows):
+        ia = inv[i:i+rows]
+        adj = concatenate([where(ia>=0,elems[:,j][ia],ia) for j in range(elems.nplex())],axis=1)
+        adj[adj == arange(i,i+adj.shape[0]).reshape(-1,1)] = -1 # remove the node itself
+        adj = sortAdjacency(adj)
+        adj[:,:-1][adj[:,:-1] == adj[:,1:]] = -1 # remove duplicates
+        res.append(sortAdjacency(adj))
+    ncol = max([ a.shape[1] for a in res ])
+    return concatenate([ concatenate([-ones((a.shape[0],ncol-a.shape[1]),dtype=a.dtype),a],axis=1) for a in res ])
+
+
 ############################################################################
 #
 # Deprecated
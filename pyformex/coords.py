@@ -42,6 +42,8 @@ from __future__ import print_function
 from arraytools import *
 from lib import misc
 from utils import deprecated,deprecation,warn
+from instrument import instrumented
+import pyformex as pf
 
 
 ###########################################################################
@@ -430,13 +432,15 @@ class Coords(ndarray):
 
     #  Distance
 
-    def distanceFromPlane(self,p,n):
+    def distanceFromPlane(self,p,n,nproc=None,blocksize=None):
         """Returns the distance of all points from the plane (p,n).
 
         Parameters:
 
         - `p`: is a point specified by 3 coordinates.
         - `n`: is the normal vector to a plane, specified by 3 components.
+        - `nproc`, `blocksize`: can be specified to compute the distances
+          block-wise, possibly in parallel. See :func:`multi.blockwise`.
 
         The return value is a float array with shape ``self.pshape()`` with
         the distance of each point to the plane through p and having normal n.
@@ -450,14 +454,15 @@ class Coords(ndarray):
           [[ 0.  3.  0.]]
 
         """
+        import multi
         p = asarray(p).reshape((3))
         n = asarray(n).reshape((3))
         n = normalize(n)
-        d = inner(self,n) - inner(p,n)
-        return asarray(d)
+        d = multi.blockwise(inner,self.points(),(n,),nproc,blocksize) - inner(p,n)
+        return asarray(d).reshape(self.pshape())
 
 
-    def distanceFromLine(self,p,n):
+    def distanceFromLine(self,p,n,nproc=None,blocksize=None):
         """Returns the distance of all points from the line (p,n).
 
         p,n are (1,3) or (npts,3) arrays defining 1 or npts lines
@@ -466,6 +471,9 @@ class Coords(ndarray):
 
         - `p`: is a point on the line specified by 3 coordinates.
         - `n`: is a vector specifying the direction of the line through p.
+        - `nproc`, `blocksize`: can be specified to compute the distances
+          block-wise, possibly in parallel. See :func:`multi.blockwise`.
+          This is only done for a single line.
 
         The return value is a [...] shaped array with the distance of
         each point to the line through p with direction n.
@@ -480,9 +488,11 @@ class Coords(ndarray):
         """
         p = asarray(p)#.reshape((3))
         n = asarray(n)#.reshape((3))
-        t = cross(n,p-self)
-        d = sqrt(sum(t*t,-1)) / length(n)
-        return asarray(d)
+        if p.size == 3 and n.size == 3:
+            import multi
+            d = multi.blockwise(_distanceFromLine,self.points(),(p.reshape(3),n.reshape(3)),nproc,blocksize)
+            return asarray(d).reshape(self.pshape())
+        return _distanceFromLine(self,p,n)
 
 
     def distanceFromPoint(self,p):
@@ -1547,10 +1557,8 @@ class Coords(ndarray):
         dir = Coords(dir,copy=True)
         if step is not None:
             dir *= step
-        f = resize(self,(n,)+self.shape)
-        for i in range(1,n):
-            f[i] += i*dir
-        return Coords(f)
+        i = arange(n,dtype=Float).reshape((n,)+(1,)*self.ndim)
+        return Coords(self[newaxis] + i*dir)
 
 
     def split(self):
@@ -1567,10 +1575,7 @@ class Coords(ndarray):
     def sort(self,order=[0,1,2]):
         """Sort points in the specified order of their coordinates.
 
-        The points are sorted based on their coordinate values. There is a
-        maximum number of points (above 2 million) that can be sorted. If you
-        need to to sort more, first split up your data according to the first
-        axis.
+        The points are sorted based on their coordinate values.
 
         Parameters:
 
@@ -1583,15 +1588,104 @@ class Coords(ndarray):
           If taken in the specified order, it is guaranteed that no point can
           have a coordinate that is larger that the corresponding coordinate
           of the next point.
+
+        Example:
+
+        >>> X = Coords([[1.,0.,0.],[0.,1.,0.],[0.,0.,1.],[0.,1.,-1.]])
+        >>> print(X.sort())
+        [2 3 1 0]
+        >>> print(X.sort([2,1,0]))
+        [3 0 1 2]
+
+        See also :meth:`spaceOrder` for a sort order with better spatial
+        locality.
+        """
+        x = self.reshape(-1,3)
+        return lexsort([ x[:,i] for i in order[::-1] ])
+
+
+    def spaceKeys(self,curve='hilbert',nbits=10,bbox=None):
+        """Return the keys of the points on a space filling curve.
+
+        The points are quantized on a regular grid with ``2**nbits`` cells
+        in each direction, spanning the bounding box `bbox` (default is
+        the bounding box of the points), and each point gets the position
+        of its grid cell along the space filling curve.
+
+        Parameters:
+
+        - `curve`: 'morton' or 'hilbert': the type of space filling curve.
+          See :func:`mortonKeys` and :func:`hilbertKeys`.
+        - `nbits`: int: number of bits per coordinate, at most 21.
+        - `bbox`: (2,3) float array with the bounding box of the grid.
+
+        Returns an int64 array with shape self.pshape(). Points in the same
+        grid cell get the same key.
         """
-        n = self.shape[0]
-        nmax = iinfo('int64').max # max integer, a bit above 2 million
-        if n > nmax:
-            raise ValueError,"I can only sort %s points" % nmax
-        s0,s1,s2 = [ argsort(self[:,i]) for i in range(3) ]
-        i0,i1,i2 = [ inverseUniqueIndex(i) for i in [s0,s1,s2] ]
-        val = i2 + n * (i1 + n * i0)
-        return argsort(val)
+        if curve == 'morton':
+            return mortonKeys(self,nbits,bbox)
+        elif curve == 'hilbert':
+            return hilbertKeys(self,nbits,bbox)
+        else:
+            raise ValueError,"Invalid curve type: %s" % curve
+
+
+    def spaceOrder(self,curve='hilbert',nbits=10,bbox=None):
+        """Return the order of the points along a space filling curve.
+
+        Parameters are like in :meth:`spaceKeys`.
+
+        Returns an int array which is a permutation of
+        range(self.npoints()). Points that are close in space will mostly
+        be close in this order, which improves memory locality of
+        algorithms that process the points sequentially.
+        Points in the same grid cell keep their original order.
+
+        Example:
+
+        >>> X = Coords([[1.,1.,1.],[0.,1.,0.],[0.,0.,0.],[1.,0.,0.]])
+        >>> print(X.spaceOrder('morton',nbits=1))
+        [2 3 1 0]
+        """
+        return self.spaceKeys(curve,nbits,bbox).reshape(-1).argsort(kind='mergesort')
+
+
+    def spaceBuckets(self,nbits=4,curve='morton',bbox=None):
+        """Group the points in buckets of a regular grid.
+
+        The points are quantized on a regular grid with ``2**nbits`` cells
+        in each direction and grouped per grid cell. The buckets are
+        ordered along a space filling curve.
+
+        Parameters are like in :meth:`spaceKeys`.
+
+        Returns a tuple:
+
+        - `keys`: int array (nbuckets): the keys (see :meth:`spaceKeys`) of
+          the nonempty grid cells, in increasing order,
+        - `order`: int array (npoints): the point numbers sorted by bucket,
+        - `starts`: int array (nbuckets+1): the start position of each
+          bucket in `order`. The points in bucket i are
+          ``order[starts[i]:starts[i+1]]``.
+
+        Example:
+
+        >>> X = Coords([[1.,1.,1.],[0.,0.,0.],[0.,1.,0.],[0.,0.,0.1]])
+        >>> keys,order,starts = X.spaceBuckets(nbits=1)
+        >>> print(keys)
+        [0 2 7]
+        >>> print(order)
+        [1 3 2 0]
+        >>> print(starts)
+        [0 2 3 4]
+        """
+        keys = self.spaceKeys(curve,nbits,bbox).reshape(-1)
+        order = keys.argsort(kind='mergesort')
+        keys = keys[order]
+        starts = concatenate([[0],where(keys[1:] != keys[:-1])[0]+1,[keys.shape[0]]])
+        if keys.shape[0] == 0:
+            starts = starts[-1:]
+        return keys[starts[:-1]],order,starts
 
 
     def boxes(self,ppb=1,shift=0.5,minsize=1.e-5):
@@ -1651,6 +1745,7 @@ class Coords(ndarray):
         return ox,dx,nx
 
 
+    @instrumented(pf.DEBUG.MESH,'Coords.fuse')
     def fuse(self,ppb=1,shift=0.5,rtol=1.e-5,atol=1.e-5,repeat=True,nodesperbox=None):
         """Find (almost) identical nodes and return a compressed set.
 
@@ -1999,6 +2094,118 @@ def testBbox(A,bb,dirs=[0,1,2],nodes='any'):
     return stack(test).prod(axis=0).astype(bool)
 
 
+def _distanceFromLine(x,p,n):
+    """Return the distance of the points x from the line (p,n)."""
+    t = cross(n,p-x)
+    return sqrt(sum(t*t,-1)) / length(n)
+
+
+def gridIndex(x,nbits=10,bbox=None):
+    """Quantize points to integer coordinates on a regular grid.
+
+    - `x`: (...,3) float array of points.
+    - `nbits`: int: number of bits per coordinate: the grid has
+      ``2**nbits`` cells in each direction.
+    - `bbox`: (2,3) float array with the bounding box of the grid. Default
+      is the bounding box of the points.
+
+    Returns an int64 array with the same shape as x, holding the grid
+    cell indices in the range ``[0,2**nbits)``.
+    """
+    x = asarray(x,dtype=float64)
+    if bbox is None:
+        bbox = [x.reshape(-1,3).min(axis=0),x.reshape(-1,3).max(axis=0)] if x.size > 0 else zeros((2,3))
+    bmin,bmax = asarray(bbox,dtype=float64)
+    size = bmax-bmin
+    size[size <= 0.] = 1.
+    n = 2**nbits
+    return ((x-bmin) * (n/size)).astype(int64).clip(0,n-1)
+
+
+def _spreadBits(a):
+    """_Spread the lower 21 bits of a to every third bit."""
+    a = a.astype(uint64) & uint64(0x1fffff)
+    a = (a | (a << uint64(32))) & uint64(0x1f00000000ffff)
+    a = (a | (a << uint64(16))) & uint64(0x1f0000ff0000ff)
+    a = (a | (a << uint64(8))) & uint64(0x100f00f00f00f00f)
+    a = (a | (a << uint64(4))) & uint64(0x10c30c30c30c30c3)
+    a = (a | (a << uint64(2))) & uint64(0x1249249249249249)
+    return a
+
+
+def _interleave(i,j,k):
+    """_Interleave the bits of three int arrays, k being most significant."""
+    return (_spreadBits(i) | (_spreadBits(j) << uint64(1)) | (_spreadBits(k) << uint64(2))).astype(int64)
+
+
+def mortonKeys(x,nbits=10,bbox=None):
+    """Compute the Morton (Z-order) keys of a set of points.
+
+    The points are quantized on a regular grid (see :func:`gridIndex`)
+    and the key is obtained by interleaving the bits of the three integer
+    coordinates. Sorting points on their Morton keys puts points that are
+    close in space mostly close in the sequence.
+
+    - `x`: (...,3) float array of points.
+    - `nbits`: int: number of bits per coordinate, at most 21.
+    - `bbox`: (2,3) float array with the bounding box of the grid.
+
+    Returns an int64 array with shape x.shape[:-1].
+
+    Example:
+
+    >>> X = Coords([[0.,0.,0.],[1.,0.,0.],[0.,1.,0.],[1.,1.,1.]])
+    >>> print(mortonKeys(X,nbits=1))
+    [0 1 2 7]
+    """
+    if nbits > 21:
+        raise ValueError,"nbits can not be larger than 21"
+    g = gridIndex(x,nbits,bbox)
+    return _interleave(g[...,0],g[...,1],g[...,2])
+
+
+def hilbertKeys(x,nbits=10,bbox=None):
+    """Compute the Hilbert curve keys of a set of points.
+
+    This is like :func:`mortonKeys`, but uses the 3D Hilbert curve,
+    which has better locality: consecutive keys are always in
+    neighbouring grid cells. The keys are computed with the algorithm
+    of J. Skilling (Programming the Hilbert curve, 2004).
+
+    Returns an int64 array with shape x.shape[:-1].
+
+    Example:
+
+    >>> X = Coords([[0.,0.,0.],[1.,0.,0.],[0.,1.,0.],[1.,1.,1.]])
+    >>> print(hilbertKeys(X,nbits=1))
+    [0 7 3 5]
+    """
+    if nbits > 21:
+        raise ValueError,"nbits can not be larger than 21"
+    X = [ g.copy() for g in rollaxis(gridIndex(x,nbits,bbox),-1) ]
+    # Inverse undo excess work
+    Q = 1 << (nbits-1)
+    while Q > 1:
+        P = Q - 1
+        for i in range(3):
+            hit = (X[i] & Q) != 0
+            t = where(hit,P,(X[0] ^ X[i]) & P)
+            X[0] ^= t
+            X[i] ^= where(hit,0,t)
+        Q >>= 1
+    # Gray encode
+    for i in range(1,3):
+        X[i] ^= X[i-1]
+    t = zeros_like(X[0])
+    Q = 1 << (nbits-1)
+    while Q > 1:
+        t ^= where((X[2] & Q) != 0,Q-1,0)
+        Q >>= 1
+    for i in range(3):
+        X[i] ^= t
+    return _interleave(X[2],X[1],X[0])
+
+
 def origin():
     """Return a single point with coordinates [0.,0.,0.].
 
@@ -2209,6 +2416,20 @@ def sweepCoords(self,path,origin=[0.,0.,0.],normal=0,upvector=2,avgdir=False,end
     the curve.
 
     The return value is a sequence of the transformed Coords objects.
+    See :func:`iterSweepCoords` for a version that creates the copies
+    one at a time.
+    """
+    return list(iterSweepCoords(self,path,origin,normal,upvector,avgdir,enddir,scalex,scaley))
+
+
+def iterSweepCoords(self,path,origin=[0.,0.,0.],normal=0,upvector=2,avgdir=False,enddir=None,scalex=None,scaley=None):
+    """Sweep a Coords object along a path, yielding the copies one by one.
+
+    This is a generator version of :func:`sweepCoords`, taking the same
+    arguments. Only the directions along the path are computed beforehand;
+    the transformed copies are created when they are requested.
+    This allows sweeping large cross sections along long paths without
+    having all the copies in memory at once.
     """
     points = path.coords
     if isinstance(avgdir,bool):
@@ -2254,11 +2475,8 @@ def sweepCoords(self,path,origin=[0.,0.,0.],normal=0,upvector=2,avgdir=False,end
         scaley = ones(points.shape[0])
 
     base = self.translate(-Coords(origin))
-    sequence = [ base.scale([scx,scy,1.]).rotate(vectorRotation(normal,d,upvector)).translate(p)
-                 for scx,scy,d,p in zip(scalex,scaley,directions,points)
-                 ]
-
-    return sequence
+    for scx,scy,d,p in zip(scalex,scaley,directions,points):
+        yield base.scale([scx,scy,1.]).rotate(vectorRotation(normal,d,upvector)).translate(p)
 
 
 ##############################################################################
@@ -130,11 +130,11 @@ def run():
     from timer import Timer
     pf.GUI.setBusy()
     timer = Timer()
-    tri = sf.isosurface(data,level,nproc=4)
+    S = sf.isoTriSurface(data,level,nproc=4)
     sec = timer.seconds()
-    print("Got %s triangles in %s seconds" % (len(tri),sec))
-    if len(tri) > 0:
-        S = TriSurface(tri).scale(scale[::-1])
+    print("Got %s triangles in %s seconds" % (S.nelems(),sec))
+    if S.nelems() > 0:
+        S = S.scale(scale[::-1])
         draw(S)
         export({'isosurf':S})
     pf.GUI.setBusy(False)
@@ -38,6 +38,7 @@ import pyformex as pf
 from mesh import *
 import utils
 from lib import misc
+from instrument import instrumented
 import os
 
 
@@ -182,6 +183,7 @@ def read_off(fn):
     return nodes.reshape((-1,3)),elems.reshape((-1,4))[:,1:]
 
 
+@instrumented(pf.DEBUG.FILE)
 def read_stl_bin(fn):
     """Read a binary stl.
 
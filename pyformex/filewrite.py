@@ -39,6 +39,7 @@ import pyformex as pf
 import numpy as np
 from lib import misc
 from arraytools import checkArray
+from instrument import instrumented
 import utils
 import os
 
@@ -176,6 +177,7 @@ def writeGTS(fn,coords,edges,faces):
 
 # Output of surface file formats
 
+@instrumented(pf.DEBUG.FILE,arg=1)
 def writeSTL(f,x,n=None,binary=False,color=None):
     """Write a collection of triangles to an STL file.
 
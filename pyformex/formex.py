@@ -1006,8 +1006,11 @@ class Formex(Geometry):
             state['prop'] = state['p']
             del state['p']
         if 'f'  in state:
-            state['coords'] = state['f']
+            state['_coords'] = state['f']
             del state['f']
+        if 'coords' in state:
+            state['_coords'] = state['coords']
+            del state['coords']
         self.__dict__.update(state)
 
 
@@ -1384,9 +1387,8 @@ maxprop  = %s
         It allows us to write simple expressions as F+G to concatenate
         the Formices F and G.
         """
-        return self.copy().append(other)
-    # BV: would Formex.concatenate([self,other]) be better?
-    #
+        return Formex.concatenate([self,other])
+
 
     @classmethod
     def concatenate(clas,Flist):
@@ -1413,24 +1415,10 @@ maxprop  = %s
         We made it a class method and not a global function, because that
         would interfere with NumPy's own concatenate function.
         """
-        def _force_prop(m):
-            if m.prop is None:
-                return zeros(m.nelems(),dtype=Int)
-            else:
-                return m.prop
-
-        f = concatenate([ F.coords for F in Flist ])
-
-        # Keep the available props
-        prop = [F.prop for F in Flist if F.prop is not None]
-        if len(prop) == 0:
-            prop = None
-        elif len(prop) < len(Flist):
-            prop = concatenate([_force_prop(F) for F in Flist])
-        else:
-            prop = concatenate(prop)
-
-        return Formex(f,prop,Flist[0].eltype)
+        B = FormexBuilder(eltype=Flist[0].eltype,size=sum([F.nelems() for F in Flist]))
+        for F in Flist:
+            B.add(F)
+        return B.formex()
 
 
     def select(self,idx):
@@ -1457,6 +1445,37 @@ maxprop  = %s
         return self.select(complement(idx,self.nelems()))
 
 
+    def reorder(self,order):
+        """Reorder the elements of a Formex.
+
+        Parameters:
+
+        - `order`: either a 1-D integer array with a permutation of
+          ``arange(self.nelems())``, specifying the requested order, or one of
+          the following predefined strings:
+
+          - 'random': order the elements randomly.
+          - 'reverse': order the elements in reverse order.
+          - 'morton', 'hilbert': order the elements along a space filling
+            curve through their centroids. Elements that are close in space
+            will mostly be close in the sequence. See
+            :meth:`Coords.spaceOrder`.
+
+        Returns a Formex equivalent with self but with the elements ordered
+        as specified.
+        """
+        if isinstance(order,basestring):
+            if order == 'random':
+                order = random.permutation(self.nelems())
+            elif order == 'reverse':
+                order = arange(self.nelems()-1,-1,-1)
+            elif order in ['morton','hilbert']:
+                order = self.centroids().spaceOrder(order)
+            else:
+                raise ValueError,"Invalid order: %s" % order
+        return self.select(order)
+
+
     def selectNodes(self,idx):
         """Return a Formex which holds only some nodes of the parent.
 
@@ -1776,82 +1795,107 @@ maxprop  = %s
             return self.reflect(dir,pos)
 
 
-    def replicate(self,n,dir=0,step=1.0):
+    def replicate(self,n,dir=0,step=1.0,lazy=False):
         """Replicate a Formex n times with fixed step in any direction.
 
         Returns a Formex which is the concatenation of n copies, where each
         copy is equal to the previous one translated over `(dir,step)`, where
         `dir` and `step` are interpreted just like in the :meth:`translate`
         method. The first of the copies is equal to the original.
+
+        If `lazy` is True, a :class:`ReplicatedFormex` is returned instead,
+        which only creates the copies when they are needed.
         """
-        f = self.coords.replicate(n,dir,step=step)
-        f.shape = (f.shape[0]*f.shape[1],f.shape[2],f.shape[3])
-        ## the replication of the properties is automatic!
-        return Formex(f,self.prop,self.eltype)
+        trl = Coords([0.,0.,0.]).replicate(n,dir,step=step)
+        return self._replicated(trl,lazy=lazy)
 
 
-    def rep(self,n,dir=None,step=None):
+    def rep(self,n,dir=None,step=None,lazy=False):
         """Like replicate, but allow repeated replication
 
         n, dir and step are lists. Default values for dir are [0,1,2]
         and [1.0,1.0,1.0], cutoff at the length of the specified n.
         """
-        F = self
         if dir is None:
             dir = range(len(n))
         if step is None:
             step = [1.]*len(n)
+        trl = zeros((1,3),dtype=Float)
         for ni,diri,stepi in zip(n,dir,step):
-            F = F.replicate(ni,diri,stepi)
-        return F
+            trl = Coords([0.,0.,0.]).replicate(ni,diri,stepi)[:,newaxis] + trl
+            trl = trl.reshape(-1,3)
+        return self._replicated(trl,lazy=lazy)
 
 
-    def replic(self,n,step=1.0,dir=0):
+    def replic(self,n,step=1.0,dir=0,lazy=False):
         """Return a Formex with n replications in direction dir with step.
 
         The original Formex is the first of the n replicas.
         """
         n = int(n)
-        f = array( [ self.coords for i in range(n) ] )
-        for i in range(1,n):
-            f[i,:,:,dir] += i*step
-        f.shape = (f.shape[0]*f.shape[1],f.shape[2],f.shape[3])
-        ## the replication of the properties is automatic!
-        return Formex(f,self.prop,self.eltype)
+        trl = zeros((n,3),dtype=Float)
+        trl[:,dir] = arange(n)*step
+        return self._replicated(trl,lazy=lazy)
 
 
-    def replic2(self,n1,n2,t1=1.0,t2=1.0,d1=0,d2=1,bias=0,taper=0):
+    def replic2(self,n1,n2,t1=1.0,t2=1.0,d1=0,d2=1,bias=0,taper=0,lazy=False):
         """Replicate in two directions.
 
         n1,n2 number of replications with steps t1,t2 in directions d1,d2
         bias, taper : extra step and extra number of generations in direction
         d1 for each generation in direction d2
         """
-        P = [ self.translatem((d1,i*bias),(d2,i*t2)).replic(n1+i*taper,t1,d1)
-              for i in range(n2) ]
-        ## We should replace the Formex concatenation here by
-        ## separate data and prop concatenations, because we are
-        ## guaranteed that either none or all formices in P have props.
-        return Formex.concatenate(P)
+        trl = []
+        for i in range(n2):
+            ni = n1+i*taper
+            if ni <= 0:
+                continue
+            t = zeros((ni,3),dtype=Float)
+            t[:,d2] += i*t2
+            t[:,d1] += i*bias + arange(ni)*t1
+            trl.append(t)
+        if trl:
+            trl = concatenate(trl)
+        else:
+            trl = zeros((0,3),dtype=Float)
+        return self._replicated(trl,lazy=lazy)
 
 
-    def rosette(self,n,angle,axis=2,point=[0.,0.,0.]):
+    def rosette(self,n,angle,axis=2,point=[0.,0.,0.],lazy=False):
         """Return a Formex with n rotational replications with angular
         step angle around an axis parallel with one of the coordinate axes
         going through the given point. axis is the number of the axis (0,1,2).
         point must be given as a list (or array) of three coordinates.
         The original Formex is the first of the n replicas.
         """
-        f = self.coords - point
-        f = array( [ f for i in range(n) ] )
-        for i in range(1,n):
-            m = array(rotationMatrix(i*angle,axis))
-            f[i] = dot(f[i],m)
-        f.shape = (f.shape[0]*f.shape[1],f.shape[2],f.shape[3])
-        return Formex(f + point,self.prop,self.eltype)
+        if array(axis).size == 1:
+            # build the rotation matrices around a global axis at once
+            a = arange(n)*angle*DEG
+            i,j,k = roll(range(3),-axis)
+            rot = zeros((n,3,3))
+            rot[:,i,i] = 1.
+            rot[:,j,j] = rot[:,k,k] = cos(a)
+            rot[:,j,k] = sin(a)
+            rot[:,k,j] = -rot[:,j,k]
+        else:
+            rot = array([ rotationMatrix(i*angle,axis) for i in range(n) ])
+        return self._replicated(rot=rot,center=point,lazy=lazy)
 
     ros = rosette
 
+
+    def _replicated(self,trl=None,rot=None,center=None,lazy=False):
+        """Return the (lazy) replication of self with given transforms.
+
+        This is the common implementation of the replication methods.
+        See :class:`ReplicatedFormex` for the meaning of the parameters.
+        """
+        R = ReplicatedFormex(self,trl,rot,center)
+        if lazy:
+            return R
+        return R.toFormex()
+
+
     def translatem(self,*args,**kargs):
         """Multiple subsequent translations in axis directions.
 
@@ -2131,6 +2175,266 @@ maxprop  = %s
     nnodes = npoints
 
 
+class FormexBuilder(object):
+    """Accumulate elements to build a Formex.
+
+    A FormexBuilder collects the elements of many formices in a buffer that
+    grows by doubling its size, so that building a Formex from n parts
+    takes a time linear in the total number of elements. Compare this to a
+    loop doing ``F = F + G``, which copies all previous elements at every
+    step and thus takes quadratic time.
+
+    Parameters:
+
+    - `nplex`: int: the plexitude of the elements. If not specified, it is
+      set from the first nonempty part that is added.
+    - `eltype`: str: the element type of the resulting Formex. If not
+      specified, it is set from the first Formex that is added.
+    - `size`: int: the initial capacity (in elements) of the buffer. If you
+      know the final number of elements, setting it avoids all regrowing.
+
+    If any of the added parts has property numbers, the resulting Formex will
+    have properties, and the parts without properties get property 0.
+
+    Example:
+
+    >>> B = FormexBuilder()
+    >>> for i in range(3):
+    ...     B += Formex([[[i,0.,0.]]],i)
+    >>> F = B.formex()
+    >>> print(F)
+    {[0.0,0.0,0.0], [1.0,0.0,0.0], [2.0,0.0,0.0]}
+    >>> print(F.prop)
+    [0 1 2]
+    """
+
+    def __init__(self,nplex=None,eltype=None,size=0):
+        """Create a new empty FormexBuilder."""
+        self.nplex = nplex
+        self.eltype = eltype
+        self.size = size
+        self.n = 0
+        self.coords = self.prop = None
+
+
+    def nelems(self):
+        """Return the number of elements added so far."""
+        return self.n
+
+
+    def extend(self,n,prop=None):
+        """Add n elements and return their coordinates for filling in.
+
+        - `n`: int: number of elements to add.
+        - `prop`: int or int array: property numbers for the new elements.
+          The values are repeated if there are less than `n`.
+
+        Returns a writable float array with shape (n,nplex,3), to be filled
+        with the coordinates of the new elements. This allows to create the
+        elements in place in the buffer, without a temporary array.
+        The builder's `nplex` should have been set.
+        """
+        if self.nplex is None:
+            raise ValueError,"The plexitude of the FormexBuilder has not been set"
+        if self.coords is None:
+            self.coords = zeros((max(n,self.size),self.nplex,3),dtype=Float)
+        m = self.n + n
+        self.coords = growBuffer(self.coords,self.n,m)
+        if prop is not None or self.prop is not None:
+            if self.prop is None:
+                self.prop = zeros(self.coords.shape[:1],dtype=Int)
+            self.prop = growBuffer(self.prop,self.n,self.coords.shape[0])
+            if prop is None:
+                self.prop[self.n:m] = 0
+            else:
+                self.prop[self.n:m] = resize(asarray(prop,dtype=Int),(n,))
+        x = self.coords[self.n:m]
+        self.n = m
+        return x
+
+
+    def add(self,F,prop=None):
+        """Add the elements of a Formex.
+
+        - `F`: a Formex, or an array with shape (nelems,nplex,3).
+        - `prop`: property numbers for the elements. The default is to use
+          the property numbers of `F`, if any.
+
+        Returns the builder itself, so that calls can be chained. A
+        FormexBuilder `B` can also be extended with ``B += F``.
+        """
+        if isinstance(F,Formex):
+            if prop is None:
+                prop = F.prop
+            if self.eltype is None:
+                self.eltype = F.eltype
+            x = F.coords
+        else:
+            x = Coords(F)
+        if x.size == 0:
+            return self
+        if self.nplex is None:
+            self.nplex = x.shape[1]
+        elif x.shape[1:] != (self.nplex,3):
+            raise ValueError,"Can not add elements with plexitude %s to a FormexBuilder with plexitude %s" % (x.shape[1],self.nplex)
+        self.extend(x.shape[0],prop)[...] = x
+        return self
+
+    __iadd__ = add
+
+
+    def formex(self):
+        """Return the Formex with all the added elements."""
+        if self.n == 0:
+            if self.nplex is None:
+                return Formex(eltype=self.eltype)
+            return Formex(zeros((0,self.nplex,3),dtype=Float),eltype=self.eltype)
+        if self.prop is None:
+            prop = None
+        else:
+            prop = self.prop[:self.n]
+        return Formex(self.coords[:self.n],prop,self.eltype)
+
+
+class ReplicatedFormex(object):
+    """A lazy replication of a Formex.
+
+    A ReplicatedFormex represents the concatenation of n transformed copies
+    of a base Formex, without actually creating the copies. Only the base
+    Formex and the n transformations are stored, so that very large regular
+    structures can be defined with little memory. The copies are only
+    created when they are really needed, e.g. when the structure is drawn
+    or exported. Some properties, like the number of elements and the
+    bounding box, can be computed without creating the copies.
+
+    The i-th copy has coordinates ``dot(x-center,rot[i]) + center + trl[i]``,
+    where x are the coordinates of the base Formex.
+
+    Parameters:
+
+    - `F`: the base Formex.
+    - `trl`: (n,3) float array: the translation vectors of the copies.
+    - `rot`: (n,3,3) float array: the rotation matrices of the copies.
+    - `center`: point around which the rotations are done. Default is the
+      origin.
+
+    At least one of `trl` and `rot` should be specified. If both are,
+    they should have the same length.
+
+    A ReplicatedFormex is usually obtained from one of the Formex replication
+    methods with the `lazy=True` argument.
+
+    Example:
+
+      >>> R = Formex('4:0123').replic2(1000,1000,lazy=True)
+      >>> print(R.ncopies(),R.nelems())
+      1000000 1000000
+      >>> print(R.bbox())
+      [[    0.     0.     0.]
+       [ 1000.  1000.     0.]]
+      >>> print(R.copy(1001).coords)
+      [[[ 1.  1.  0.]
+        [ 2.  1.  0.]
+        [ 2.  2.  0.]
+        [ 1.  2.  0.]]]
+    """
+    def __init__(self,F,trl=None,rot=None,center=None):
+        if trl is None and rot is None:
+            raise ValueError,"Need at least one of trl or rot"
+        if trl is not None:
+            trl = checkArray(trl,(-1,3),'f','i')
+        if rot is not None:
+            rot = checkArray(rot,(-1,3,3)).astype(float64)
+            if center is None:
+                center = zeros(3)
+            center = asarray(center,dtype=float64)
+            if trl is not None and trl.shape[0] != rot.shape[0]:
+                raise ValueError,"trl and rot should have the same length"
+        self.F = F
+        self.trl = trl
+        self.rot = rot
+        self.center = center
+
+
+    def ncopies(self):
+        """Return the number of copies."""
+        if self.trl is not None:
+            return self.trl.shape[0]
+        return self.rot.shape[0]
+
+    def nelems(self):
+        """Return the number of elements of the full Formex."""
+        return self.ncopies() * self.F.nelems()
+
+    def nplex(self):
+        """Return the plexitude of the elements."""
+        return self.F.nplex()
+
+    def _coords(self,i0,i1):
+        """Create the coordinates of the copies i0 to i1.
+
+        Returns a float array with shape ((i1-i0)*nelems,nplex,3).
+        """
+        x = self.F.coords
+        if self.rot is None:
+            f = x[newaxis] + self.trl[i0:i1,newaxis,newaxis]
+        else:
+            f = dot(x-self.center,self.rot[i0:i1])
+            f = f.transpose(2,0,1,3) + self.center
+            if self.trl is not None:
+                f += self.trl[i0:i1,newaxis,newaxis]
+        return f.reshape(-1,x.shape[1],3).astype(Float)
+
+
+    def copy(self,i):
+        """Return the i-th copy as a Formex."""
+        return self.blocks(1,i,i+1).next()
+
+
+    def blocks(self,ncopies=None,start=0,stop=None):
+        """Iterate over the copies in blocks.
+
+        Yields Formices each holding `ncopies` subsequent copies (the last
+        may hold less). The default creates all copies in a single block.
+        This allows to process a huge ReplicatedFormex with a limited
+        amount of memory.
+        `start` and `stop` can be specified to only iterate over a range
+        of copies.
+        """
+        if stop is None:
+            stop = self.ncopies()
+        if ncopies is None:
+            ncopies = max(stop-start,1)
+        F = self.F
+        for i in range(start,stop,ncopies):
+            j = min(i+ncopies,stop)
+            yield Formex(self._coords(i,j),F.prop,F.eltype)
+
+
+    def bbox(self):
+        """Return the bounding box of the full Formex.
+
+        For a pure translational replication, this is computed from the
+        bounding box of the base Formex, without creating the copies.
+        """
+        if self.rot is None:
+            bb = self.F.bbox()
+            if self.ncopies() > 0:
+                bb = bb + array([self.trl.min(axis=0),self.trl.max(axis=0)])
+            return Coords(bb)
+        return bbox([ F for F in self.blocks(max(1,self.ncopies()//16)) ])
+
+
+    def toFormex(self):
+        """Return the full Formex with all the copies."""
+        return Formex(self._coords(0,self.ncopies()),self.F.prop,self.F.eltype)
+
+
+    def write_geom(self,f,name=None,sep=None):
+        """Write the full Formex to a pyFormex geometry file."""
+        f.writeFormex(self.toFormex(),name,sep)
+
+
 ##############################################################################
 #
 #    Functions which are not Formex class methods
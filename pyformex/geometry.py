@@ -31,6 +31,80 @@ Coords class to the derived classes.
 from __future__ import print_function
 
 from coords import Coords
+from numpy import asarray,dot,empty,eye,float64
+
+# The Coords transformations that are affine and can be deferred
+_affine_transforms = [ 'scale', 'translate', 'rotate', 'shear', 'reflect',
+                       'affine', 'position' ]
+
+
+def affineMatrix(func,*args,**kargs):
+    """Return the matrix of an affine Coords transformation.
+
+    - `func`: an affine :class:`Coords` transformation method, like
+      :meth:`Coords.scale` or :meth:`Coords.rotate`.
+    - `args`, `kargs`: the arguments to be passed to `func`.
+
+    Returns a (4,4) float array M such that the transformation maps
+    a point x to ``[x,1] * M``, or None if the transformation with these
+    arguments is not a single affine transformation (e.g. if it uses
+    an array of translation vectors, or is performed inplace).
+    The matrix is found by transforming the origin and the unit points
+    in double precision.
+
+    Example:
+
+    >>> print(affineMatrix(Coords.translate,[1.,2.,3.]))
+    [[ 1.  0.  0.  0.]
+     [ 0.  1.  0.  0.]
+     [ 0.  0.  1.  0.]
+     [ 1.  2.  3.  1.]]
+    """
+    if kargs.get('inplace',False):
+        return None
+    for a in list(args)+kargs.values():
+        if a is None or isinstance(a,str):
+            continue
+        a = asarray(a)
+        if a.size > 3 and a.shape != (3,3):
+            return None
+    X = Coords([[0.,0.,0.],[1.,0.,0.],[0.,1.,0.],[0.,0.,1.]],dtyp=float64)
+    try:
+        Y = asarray(func(X,*args,**kargs),dtype=float64)
+    except:
+        return None
+    if Y.shape != (4,3):
+        return None
+    mat = eye(4)
+    mat[:3,:3] = Y[1:] - Y[0]
+    mat[3,:3] = Y[0]
+    return mat
+
+
+def applyAffine(x,mat,inplace=False,blocksize=65536):
+    """Apply an affine transformation matrix to a Coords.
+
+    - `x`: a :class:`Coords` object.
+    - `mat`: (4,4) float array: an affine transformation matrix as returned
+      by :func:`affineMatrix`.
+    - `inplace`: bool: if True, the result is written into `x`.
+    - `blocksize`: int: number of points that are transformed at once.
+
+    The points are transformed in blocks, so that the only temporary memory
+    needed is that for a block of points.
+    Returns a Coords with the same shape as `x`.
+    """
+    if inplace:
+        out = x
+    else:
+        out = Coords(empty(x.shape,dtype=x.dtype))
+    xp = x.reshape(-1,3)
+    op = out.reshape(-1,3)
+    A,t = mat[:3,:3],mat[3,:3]
+    for i in range(0,xp.shape[0],blocksize):
+        j = i+blocksize
+        op[i:j] = dot(xp[i:j],A) + t
+    return out
 
 
 class Geometry(object):
@@ -73,6 +147,15 @@ class Geometry(object):
     Most derived classes that are part of pyFormex however override this
     default and implement a more efficient copy method.
 
+    The affine transformations (:meth:`scale`, :meth:`translate`,
+    :meth:`rotate`, :meth:`shear`, :meth:`reflect`, :meth:`affine`,
+    :meth:`position`) can be deferred: see :meth:`deferred`. The
+    transformed object then shares the untransformed coords with the
+    original, and the transformations are composed into a single matrix,
+    that is only applied when the `coords` attribute is read.
+    Derived classes whose objects hold data computed from their coords
+    should set the class attribute `_deferrable` to False.
+
     The following :class:`Geometry` methods return the value of the same
     method applied on the `coords` attribute. Refer to the correponding
     :class:`coords.Coords` method for their precise arguments.
@@ -137,16 +220,153 @@ class Geometry(object):
     :meth:`trl`.
     """
     
+    _deferrable = True  # Can the affine transformations be deferred?
+    _deferred = False   # Are the affine transformations deferred?
+
+    ########### The coords attribute #################
+
+    def _get_coords(self):
+        """Return the coords, applying any deferred transformation."""
+        d = self.__dict__
+        if d.get('_trf',None) is not None:
+            self._coords = applyAffine(self._coords,self._trf)
+            self._trf = None
+        try:
+            return d['_coords']
+        except KeyError:
+            # objects restored from older pyFormex versions
+            return d.get('coords',None)
+
+
+    def _set_coords_attr(self,coords):
+        """Set the coords, dropping any deferred transformation."""
+        self._coords = coords
+        self._trf = None
+
+
+    coords = property(_get_coords,_set_coords_attr)
+
+
+    ########### Deferred transformations #################
+
+    def deferred(self,flag=True):
+        """Return the object with deferred affine transformations on or off.
+
+        - `flag`: bool: if True, the affine transformations (:meth:`scale`,
+          :meth:`translate`, :meth:`rotate`, :meth:`shear`,
+          :meth:`reflect`, :meth:`affine`, :meth:`position`) of the
+          returned object and of all objects derived from it by these
+          transformations are deferred.
+
+        A deferred transformation returns an object sharing the coords
+        array of the original, and only stores the transformation matrix.
+        Subsequent affine transformations are composed into that matrix.
+        The matrix is applied in a single pass over the coordinates when
+        the `coords` attribute is read, or when :meth:`applyDeferred` is
+        called. Other transformations are performed immediately (after
+        applying any pending transformation), but the result keeps the
+        deferred mode. This avoids the creation of a full coordinate array
+        for every step in a chain of affine transformations.
+
+        Because the transformations are composed in double precision, the
+        result may differ from the immediate transformations in the last
+        bits of the single precision coordinates.
+
+        Classes with `_deferrable` False always transform immediately.
+
+        Example:
+
+        >>> from formex import Formex
+        >>> F = Formex('4:0123').deferred()
+        >>> G = F.scale(2.).translate([1.,0.,0.]).reflect(0,2.)
+        >>> print(G.pendingTransform() is not None, G._coords is F.coords)
+        True True
+        >>> print(G.coords.reshape(-1,3))
+        [[ 3.  0.  0.]
+         [ 1.  0.  0.]
+         [ 1.  2.  0.]
+         [ 3.  2.  0.]]
+        >>> print(G.pendingTransform())
+        None
+        """
+        G = self._deferred_copy()
+        G._deferred = bool(flag)
+        return G
+
+
+    def pendingTransform(self):
+        """Return the deferred transformation matrix.
+
+        Returns the (4,4) matrix of the affine transformation that still
+        has to be applied to the stored coordinates, or None if there is
+        no deferred transformation.
+        See :func:`affineMatrix` for the format of the matrix.
+        """
+        return self.__dict__.get('_trf',None)
+
+
+    def applyDeferred(self,inplace=False):
+        """Apply the deferred transformation now.
+
+        - `inplace`: bool: if True, the transformed coordinates are written
+          into the stored coords array instead of in a new one. Since that
+          array is shared with the objects from which this object was
+          derived by deferred transformations, these objects and the other
+          objects derived from them become invalid. Use this only to save
+          memory in a chain of transformations of which only the last
+          result is kept.
+
+        Returns the object itself.
+        """
+        trf = self.pendingTransform()
+        if trf is not None:
+            self._coords = applyAffine(self._coords,trf,inplace=inplace)
+            self._trf = None
+        return self
+
+
+    def _deferred_copy(self):
+        """Return a shallow copy of the object.
+
+        The copy shares the stored coords and the deferred transformation
+        with the original. Derived classes can override this to create
+        a new object with the same coords.
+        """
+        from copy import copy
+        return copy(self)
+
+
+    def _defer(self,mat):
+        """Return a copy with the deferred transformation mat appended."""
+        trf = self.pendingTransform()
+        if trf is not None:
+            mat = dot(trf,mat)
+        G = self._deferred_copy()
+        G._trf = mat
+        G._deferred = True
+        return G
+
+
     ########### Change the coords #################
 
     def _coords_transform(func):
         """Perform a transformation on the .coords attribute of the object.
 
-        This is a decorator function.
+        This is a decorator function. If the object is in deferred mode
+        and the transformation is affine, the transformation is deferred.
         """
         coords_func = getattr(Coords,func.__name__)
+        affine = func.__name__ in _affine_transforms
         def newf(self,*args,**kargs):
-            """Performs the Coords %s transformation on the coords attribute""" 
+            """Performs the Coords %s transformation on the coords attribute"""
+            if self._deferred:
+                if affine and self._deferrable:
+                    mat = affineMatrix(coords_func,*args,**kargs)
+                    if mat is not None:
+                        return self._defer(mat)
+                G = self._set_coords(coords_func(self.coords,*args,**kargs))
+                G._deferred = True
+                return G
             return self._set_coords(coords_func(self.coords,*args,**kargs))
         newf.__name__ = func.__name__
         newf.__doc__ ="""Apply '%s' transformation to the Geometry object. 
@@ -37,6 +37,7 @@ from formex import Formex
 from mesh import Mesh
 from odict import ODict
 from pyformex import message,debug,warning,DEBUG
+from instrument import instrumented
 
 
 import os
@@ -139,6 +140,7 @@ class GeometryFile(object):
         filewrite.writeData(self.fil,data,sep)
 
 
+    @instrumented(DEBUG.FILE,'GeometryFile.write',arg=1)
     def write(self,geom,name=None,sep=None):
         """Write any geometry object to the geometry file.
 
@@ -290,6 +292,67 @@ class GeometryFile(object):
             self.writeData(F.normals,sep)
 
 
+    def writeMeshChunks(self,ncoords,nelems,nplex,eltype,coords,elems,prop=None,name=None,sep=None,objtype='Mesh'):
+        """Write a Mesh to a pyFormex geometry file from chunks of data.
+
+        This writes the same data block as :meth:`writeMesh`, but the
+        Mesh does not have to exist as a whole: the coordinates,
+        connectivity and property numbers are taken from iterables
+        producing consecutive chunks of the respective arrays.
+        This allows writing Meshes that are too large to fit in memory.
+
+        - `ncoords`, `nelems`, `nplex`, `eltype`: the total number of nodes,
+          number of elements, plexitude and element type name of the Mesh.
+          These are needed beforehand to write the header.
+        - `coords`: iterable of float arrays with shape (n,3), together
+          holding `ncoords` points.
+        - `elems`: iterable of int arrays with shape (n,nplex), together
+          holding `nelems` elements.
+        - `prop`: None or an iterable of int arrays, together holding
+          `nelems` property numbers.
+
+        Note that the iterables are consumed in order: all the coords
+        chunks are written before the first elems chunk is requested.
+        """
+        self.checkWritable()
+        if objtype is None:
+            objtype = 'Mesh'
+        if sep is None:
+            sep = self.sep
+        hasprop = prop is not None
+        head = "# objtype='%s'; ncoords=%s; nelems=%s; nplex=%s; props=%s; eltype='%s'; normals=%s; color=%r; sep='%s'" % (objtype,ncoords,nelems,nplex,hasprop,eltype,False,'',sep)
+        if name:
+            head += "; name='%s'" % name
+        self.fil.write(head+'\n')
+        self.writeChunks(coords,sep,(ncoords,3))
+        self.writeChunks(elems,sep,(nelems,nplex))
+        if hasprop:
+            self.writeChunks(prop,sep,(nelems,))
+
+
+    def writeChunks(self,chunks,sep,shape):
+        """Write a sequence of array chunks as a single data block.
+
+        The chunks are concatenated along their first axis and should
+        together have the specified `shape`. The result in the file is
+        the same as writing the full array with :meth:`writeData`.
+        """
+        n = 0
+        for data in chunks:
+            data = asarray(data)
+            if data.size == 0:
+                continue
+            if data.shape[1:] != shape[1:]:
+                raise ValueError,"Chunk has shape %s, expected (*,%s)" % (data.shape,shape[1:])
+            if n > 0 and sep:
+                self.fil.write(sep)
+            filewrite.writeData(self.fil,data,sep,end='')
+            n += data.shape[0]
+        if n != shape[0]:
+            raise ValueError,"Chunks hold %s items, expected %s" % (n,shape[0])
+        self.fil.write('\n')
+
+
     def writeTriSurface(self,F,name=None,sep=None):
         """Write a TriSurface to a pyFormex geometry file.
 
@@ -399,6 +462,7 @@ class GeometryFile(object):
         self.results = ODict()
 
 
+    @instrumented(DEBUG.FILE,'GeometryFile.read')
     def read(self,count=-1):
         """Read a pyFormex Geometry File.
 
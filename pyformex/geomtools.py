@@ -36,16 +36,24 @@ class Plane(object):
         self.coords = Coords.concatenate([P,normalize(n)])
 
 
-def areaNormals(x):
+def areaNormals(x,nproc=None,blocksize=None):
     """Compute the area and normal vectors of a collection of triangles.
 
     x is an (ntri,3,3) array with the coordinates of the vertices of ntri
     triangles.
 
+    `nproc` and `blocksize` can be specified to compute the result
+    block-wise, possibly in parallel. See :func:`multi.blockwise`.
+
     Returns a tuple (areas,normals) with the areas and the normals of the
     triangles. The area is always positive. The normal vectors are normalized.
     """
-    x = x.reshape(-1,3,3)
+    import multi
+    return multi.blockwise(_areaNormals,x.reshape(-1,3,3),nproc=nproc,blocksize=blocksize)
+
+
+def _areaNormals(x):
+    """Compute the area and normals of an (ntri,3,3) array of triangles."""
     area,normals = vectorPairAreaNormals(x[:,1]-x[:,0],x[:,2]-x[:,1])
     area *= 0.5
     return area,normals
@@ -1071,6 +1079,31 @@ def insideTriangle(x,P,method='bary'):
         return (d > 0).all(axis=-1)
 
 
+def _chunkedDistance(name,func,X,P,return_points,factor):
+    """Compute the perpendicular distances of points to a set of items.
+
+    This calls one of the functions _faceDistance or _edgeDistance on
+    chunks of the points X that fit in the memory budget, and combines
+    the results. `factor` is an estimate of the number of temporary
+    floats created per point and item.
+    """
+    import memory
+    X = asarray(X)
+    nX = X.shape[0]
+    nbytes = factor * nX * P.shape[0] * X.dtype.itemsize
+    rows = memory.chunksize(name,nbytes,nX)
+    if rows >= nX:
+        return func(X,P,return_points)
+    res = []
+    for i in range(0,nX,rows):
+        r = func(X[i:i+rows],P,return_points)
+        if len(r[0]) > 0:
+            res.append((r[0]+i,)+r[1:])
+    if len(res) == 0:
+        return ([],)*(3 if return_points else 2)
+    return tuple([ concatenate(r) for r in zip(*res) ])
+
+
 def faceDistance(X,Fp,return_points=False):
     """Compute the closest perpendicular distance to a set of triangles.
 
@@ -1086,9 +1119,17 @@ def faceDistance(X,Fp,return_points=False):
     - OKdist is an array with the shortest distances for these points;
     - OKpoints is an array with the closest footpoints for these points
       and is only returned if return_points = True.
+
+    The points are processed in chunks if the temporary data would
+    exceed the memory budget (see :mod:`memory`).
     """
     if not Fp.shape[1] == 3:
         raise ValueError, "Currently this function only works for triangular faces."
+    return _chunkedDistance('faceDistance',_faceDistance,X,Fp,return_points,12)
+
+
+def _faceDistance(X,Fp,return_points=False):
+    """Compute the closest perpendicular distance to a set of triangles."""
     # Compute normals on the faces
     Fn = cross(Fp[:,1]-Fp[:,0],Fp[:,2]-Fp[:,1])
     # Compute intersection points of perpendiculars from X on facets F
@@ -1131,7 +1172,15 @@ def edgeDistance(X,Ep,return_points=False):
     - OKdist is an array with the shortest distances for these points;
     - OKpoints is an array with the closest footpoints for these points
       and is only returned if return_points = True.
+
+    The points are processed in chunks if the temporary data would
+    exceed the memory budget (see :mod:`memory`).
     """
+    return _chunkedDistance('edgeDistance',_edgeDistance,X,Ep,return_points,8)
+
+
+def _edgeDistance(X,Ep,return_points=False):
+    """Compute the closest perpendicular distance to a set of edges."""
     # Compute vectors along the edges
     En = Ep[:,1] - Ep[:,0]
     # Compute intersection points of perpendiculars from X on edges E
@@ -1171,7 +1220,19 @@ def vertexDistance(X,Vp,return_points=False):
     - OKdist is an array with the shortest distances for the points;
     - OKpoints is an array with the closest vertices for the points
       and is only returned if return_points = True.
+
+    The points are processed in chunks if the temporary data would
+    exceed the memory budget (see :mod:`memory`).
     """
+    import memory,multi
+    X = asarray(X)
+    nbytes = 5 * X.shape[0] * Vp.shape[0] * X.dtype.itemsize
+    rows = memory.chunksize('vertexDistance',nbytes,X.shape[0])
+    return multi.blockwise(_vertexDistance,X,(Vp,return_points),nproc=1,blocksize=rows)
+
+
+def _vertexDistance(X,Vp,return_points=False):
+    """Compute the closest distance of points X to a set of vertices."""
     # Compute the distances
     dist = length(X[:,newaxis]-Vp)
     # Get the shortest distances
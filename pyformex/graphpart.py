@@ -0,0 +1,426 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+"""Multilevel graph partitioning.
+
+This module partitions the vertices of a graph in a number of parts of
+(nearly) equal weight, while minimizing the total weight of the edges
+connecting different parts. It is mostly used to partition the elements
+of a Mesh, using the element adjacency as graph, e.g. to distribute the
+work for parallel processing or to create domains for a finite element
+solver.
+
+The algorithm is a multilevel recursive bisection, as in METIS:
+
+- the graph is coarsened by repeatedly collapsing pairs of vertices
+  joined by a heavy edge (heavy edge matching),
+- the coarsest graph is bisected by growing a region from a number of
+  seed vertices, keeping the best result,
+- the bisection is projected back to the finer graphs, improving it at
+  every level by moving the boundary vertices with a positive gain
+  to the other side, while keeping the balance.
+
+All steps are vectorized over the vertices and edges of the graph.
+"""
+from __future__ import print_function
+
+import heapq
+from arraytools import *
+
+
+class Graph(object):
+    """A weighted undirected graph in compressed sparse row format.
+
+    Parameters:
+
+    - `n`: int: number of vertices.
+    - `pairs`: (nedges,2) int array with the connected vertex pairs.
+      Each edge should be specified only once.
+    - `eweights`: (nedges,) array with the edge weights. Default 1.
+    - `vweights`: (n,) array with the vertex weights. Default 1.
+
+    The edges are stored in both directions, sorted by the first vertex:
+    the edges from vertex i are ``rows[xadj[i]:xadj[i+1]]`` and
+    ``cols[xadj[i]:xadj[i+1]]``.
+    """
+
+    def __init__(self,n,pairs,eweights=None,vweights=None):
+        pairs = asarray(pairs).reshape(-1,2)
+        pairs = pairs[pairs[:,0] != pairs[:,1]]
+        if eweights is None:
+            eweights = ones(pairs.shape[0])
+        if vweights is None:
+            vweights = ones(n)
+        rows = concatenate([pairs[:,0],pairs[:,1]])
+        cols = concatenate([pairs[:,1],pairs[:,0]])
+        w = concatenate([eweights,eweights]).astype(float64)
+        srt = rows.argsort(kind='mergesort')
+        self.n = n
+        self.rows = rows[srt]
+        self.cols = cols[srt]
+        self.ew = w[srt]
+        self.vw = asarray(vweights,dtype=float64)
+        self.xadj = concatenate([[0],cumsum(bincount(self.rows,minlength=n))])
+
+
+    def cut(self,part):
+        """Return the total weight of the edges between different parts."""
+        return self.ew[part[self.rows] != part[self.cols]].sum() / 2
+
+
+    def subgraph(self,sel):
+        """Return the subgraph of the selected vertices.
+
+        - `sel`: (n,) boolean array flagging the selected vertices.
+
+        Returns the subgraph and the indices of the selected vertices.
+        """
+        ind = where(sel)[0]
+        num = -ones(self.n,dtype=int)
+        num[ind] = arange(ind.size)
+        ok = sel[self.rows] & sel[self.cols] & (self.rows < self.cols)
+        pairs = column_stack([num[self.rows[ok]],num[self.cols[ok]]])
+        return Graph(ind.size,pairs,self.ew[ok],self.vw[ind]),ind
+
+
+    def coarsen(self,rounds=8,rand=None):
+        """Coarsen the graph by heavy edge matching.
+
+        Every vertex proposes to match with its heaviest unmatched
+        neighbour (with random tie breaking). Mutual proposals are
+        matched. This is repeated for a number of rounds.
+
+        Returns the coarse graph and the map of the vertices to the
+        coarse vertices.
+        """
+        if rand is None:
+            rand = random.RandomState(0)
+        n = self.n
+        match = -ones(n,dtype=int)
+        # Symmetric random perturbation of the edge weights
+        a,b = minimum(self.rows,self.cols),maximum(self.rows,self.cols)
+        h = ((a * 2654435761 + b * 40503) % 1000003) / 1000003.
+        h = (h + rand.rand()) % 1.
+        key = self.ew * (1. + 0.01*h)
+        for r in range(rounds):
+            free = match < 0
+            ok = free[self.rows] & free[self.cols]
+            if not ok.any():
+                break
+            rr,cc,kk = self.rows[ok],self.cols[ok],key[ok]
+            srt = lexsort((-kk,rr))
+            first = unique(rr[srt],return_index=True)[1]
+            best = -ones(n,dtype=int)
+            best[rr[srt][first]] = cc[srt][first]
+            bkey = zeros(n)
+            bkey[rr[srt][first]] = kk[srt][first]
+            v = where(best >= 0)[0]
+            mutual = best[best[v]] == v
+            match[v[mutual]] = best[v[mutual]]
+            # Other proposals: the target accepts its heaviest proposer,
+            # unless it is itself accepted by its own target
+            v = v[~mutual]
+            v = v[match[best[v]] < 0]
+            srt = lexsort((-bkey[v],best[v]))
+            u,first = unique(best[v][srt],return_index=True)
+            acc = -ones(n,dtype=int)
+            acc[u] = v[srt][first]
+            u = u[(best[u] < 0) | (acc[best[u].clip(0)] != u)]
+            match[u] = acc[u]
+            match[acc[u]] = u
+        unmatched = match < 0
+        match[unmatched] = arange(n)[unmatched]
+        rep = minimum(arange(n),match)
+        rep,cmap = unique(rep,return_inverse=True)
+        nc = rep.size
+        vw = bincount(cmap,weights=self.vw,minlength=nc)
+        cr,cc = cmap[self.rows],cmap[self.cols]
+        ok = cr < cc
+        ekey = cr[ok].astype(int64) * nc + cc[ok]
+        ekey,inv = unique(ekey,return_inverse=True)
+        ew = bincount(inv,weights=self.ew[ok],minlength=ekey.size)
+        pairs = column_stack([ekey // nc,ekey % nc])
+        return Graph(nc,pairs,ew,vw),cmap
+
+
+    def refine(self,part,frac=0.5,ubfactor=1.03,npasses=8,rand=None):
+        """Improve a bisection of the graph.
+
+        Boundary vertices with a positive gain (the weight of the edges
+        to the other side minus the weight of the edges to their own side)
+        are moved to the other side, as long as the balance tolerance
+        allows it. Neighbouring vertices are not moved in the same pass.
+        Overweight parts are first balanced by moving the vertices with
+        the highest gain.
+
+        - `part`: (n,) int array with values 0 or 1.
+        - `frac`: float: target fraction of the total vertex weight in
+          part 0.
+        - `ubfactor`: float: allowed imbalance factor of the parts.
+
+        Returns the improved part array.
+        """
+        if rand is None:
+            rand = random.RandomState(0)
+        part = part.copy()
+        W = self.vw.sum()
+        target = array([frac,1.-frac]) * W
+        maxw = target * ubfactor + self.vw.max()
+        tie = rand.rand(self.n)
+        for p in range(npasses):
+            other = part[self.rows] != part[self.cols]
+            ext = bincount(self.rows,weights=self.ew*other,minlength=self.n)
+            int_ = bincount(self.rows,weights=self.ew*~other,minlength=self.n)
+            gain = ext - int_
+            pw = bincount(part,weights=self.vw,minlength=2)
+            heavy = pw > maxw
+            if heavy.any():
+                # Balance: allow negative gains on the heavy side
+                s = heavy.argmax()
+                cand = (part == s) & (ext > 0)
+                if not cand.any():
+                    cand = part == s
+            else:
+                cand = (gain > 0) | ((gain == 0) & (ext > 0) & (tie < 0.5))
+            if not cand.any():
+                break
+            # Do not move neighbours simultaneously: keep the best
+            rank = gain + 1.e-3 * tie
+            both = cand[self.rows] & cand[self.cols]
+            lose = both & (rank[self.rows] < rank[self.cols])
+            cand[self.rows[lose]] = False
+            v = where(cand)[0]
+            # Respect the maximum weights
+            v = v[argsort(-rank[v])]
+            move = zeros(v.size,dtype=bool)
+            for s in range(2):
+                vs = part[v] == s
+                if heavy.any():
+                    if not heavy[s]:
+                        continue
+                    need = pw[s] - target[s]
+                    cum = cumsum(self.vw[v[vs]])
+                    move[vs] = (cum - self.vw[v[vs]]) < need
+                else:
+                    room = maxw[1-s] - pw[1-s]
+                    cum = cumsum(self.vw[v[vs]])
+                    move[vs] = cum <= room
+            v = v[move]
+            if v.size == 0:
+                break
+            if not heavy.any() and gain[v].sum() <= 0:
+                break
+            part[v] = 1 - part[v]
+        return self.fmRefine(part,maxw)
+
+
+    def fmRefine(self,part,maxw,npasses=4,nfail=50):
+        """Improve a bisection with the Fiduccia-Mattheyses method.
+
+        In each pass, the unlocked vertex with the highest gain is moved
+        to the other side and locked, even if the gain is negative, as
+        long as the weight of the other side remains below `maxw`.
+        The pass ends after `nfail` moves without improvement, and the
+        moves after the best cut are undone. Only the vertices near the
+        boundary are visited.
+
+        - `part`: (n,) int array with values 0 or 1.
+        - `maxw`: (2,) float array with the maximum weight of the parts.
+
+        Returns the improved part array.
+        """
+        part = part.copy()
+        xadj,cols,ew,vw = self.xadj,self.cols,self.ew,self.vw
+        for p in range(npasses):
+            other = part[self.rows] != part[self.cols]
+            gain = bincount(self.rows,weights=self.ew*(2*other-1),minlength=self.n).astype(float64)
+            ext = bincount(self.rows,weights=self.ew*other,minlength=self.n)
+            pw = bincount(part,weights=vw,minlength=2)
+            heap = [ (-gain[v],v) for v in where(ext > 0)[0] ]
+            heapq.heapify(heap)
+            locked = set()
+            moves = []
+            total = best = 0.
+            nbest = 0
+            while heap and len(moves) - nbest < nfail:
+                g,v = heapq.heappop(heap)
+                if v in locked or -g != gain[v]:
+                    continue
+                s = part[v]
+                if pw[1-s] + vw[v] > maxw[1-s]:
+                    continue
+                part[v] = 1-s
+                pw[s] -= vw[v]
+                pw[1-s] += vw[v]
+                locked.add(v)
+                moves.append(v)
+                total -= g
+                if total > best:
+                    best,nbest = total,len(moves)
+                nb = cols[xadj[v]:xadj[v+1]]
+                w = ew[xadj[v]:xadj[v+1]]
+                # neighbours on the new side lose, on the old side gain
+                gain[nb] += where(part[nb] == 1-s,-2.,2.) * w
+                for u in nb:
+                    if u not in locked:
+                        heapq.heappush(heap,(-gain[u],u))
+            for v in moves[nbest:]:
+                part[v] = 1-part[v]
+            if best <= 0.:
+                break
+        return part
+
+
+    def growBisection(self,frac=0.5,ubfactor=1.03,nseeds=8,rand=None):
+        """Bisect the graph by growing a region from a seed vertex.
+
+        The region is grown by repeatedly adding the neighbouring vertex
+        that gives the largest decrease (or smallest increase) of the cut,
+        until it holds the required fraction of the total vertex weight.
+        This is done from a number of random seeds, and the bisection
+        with the lowest cut after refinement is returned. This is only
+        meant for small graphs.
+
+        Returns an (n,) int array with values 0 or 1.
+        """
+        if rand is None:
+            rand = random.RandomState(0)
+        xadj,cols,ew,vw = self.xadj,self.cols,self.ew,self.vw
+        W = vw.sum()
+        best,bestcut = None,None
+        for s in rand.permutation(self.n)[:nseeds]:
+            part = ones(self.n,dtype=int)
+            # gain of moving a vertex to part 0
+            gain = -bincount(self.rows,weights=ew,minlength=self.n).astype(float64)
+            heap = [(0.,s)]
+            w = 0.
+            while w < frac*W:
+                if not heap:
+                    # Disconnected: continue from an unvisited vertex
+                    v = where(part==1)[0]
+                    if v.size == 0:
+                        break
+                    heap = [(-gain[v[0]],v[0])]
+                g,v = heapq.heappop(heap)
+                if part[v] == 0 or -g != gain[v]:
+                    continue
+                part[v] = 0
+                w += vw[v]
+                nb = cols[xadj[v]:xadj[v+1]]
+                gain[nb] += 2. * ew[xadj[v]:xadj[v+1]]
+                for u in nb[part[nb] == 1]:
+                    heapq.heappush(heap,(-gain[u],u))
+            part = self.refine(part,frac,ubfactor,rand=rand)
+            cut = self.cut(part)
+            if bestcut is None or cut < bestcut:
+                best,bestcut = part,cut
+        return best
+
+
+    def bisect(self,frac=0.5,ubfactor=1.03,coarsest=100,rand=None):
+        """Bisect the graph with the multilevel method.
+
+        - `frac`: float: target fraction of the total vertex weight in
+          part 0.
+        - `ubfactor`: float: allowed imbalance factor of the parts.
+        - `coarsest`: int: number of vertices under which the graph is
+          not coarsened further.
+
+        Returns an (n,) int array with values 0 or 1.
+        """
+        if rand is None:
+            rand = random.RandomState(0)
+        graphs,maps = [self],[]
+        G = self
+        while G.n > coarsest:
+            C,cmap = G.coarsen(rand=rand)
+            if C.n > 0.9 * G.n:
+                break
+            graphs.append(C)
+            maps.append(cmap)
+            G = C
+        part = G.growBisection(frac,ubfactor,rand=rand)
+        for G,cmap in zip(graphs[-2::-1],maps[::-1]):
+            part = G.refine(part[cmap],frac,ubfactor,rand=rand)
+        return part
+
+
+    def partition(self,nparts,ubfactor=1.03,seed=0):
+        """Partition the graph in nparts parts by recursive bisection.
+
+        - `nparts`: int: number of parts.
+        - `ubfactor`: float: allowed imbalance factor of the final parts.
+        - `seed`: int: seed for the random choices.
+
+        Returns an (n,) int array with the part number of each vertex.
+        """
+        rand = random.RandomState(seed)
+        # Spread the imbalance over the bisection levels
+        ubfactor **= 1. / max(1,int(ceil(log2(nparts))))
+        part = zeros(self.n,dtype=int)
+        todo = [(self,arange(self.n),0,nparts)]
+        while todo:
+            G,ind,first,k = todo.pop()
+            if k <= 1 or G.n == 0:
+                part[ind] = first
+                continue
+            k1 = k // 2
+            if G.n <= 1:
+                bis = zeros(G.n,dtype=int)
+            else:
+                bis = G.bisect(float(k1)/k,ubfactor,rand=rand)
+            for s,f,kk in [(0,first,k1),(1,first+k1,k-k1)]:
+                S,sind = G.subgraph(bis == s)
+                todo.append((S,ind[sind],f,kk))
+        return part
+
+
+def partitionGraph(n,pairs,nparts,eweights=None,vweights=None,ubfactor=1.03,seed=0):
+    """Partition a graph in parts of equal weight with a minimal cut.
+
+    Parameters:
+
+    - `n`: int: number of vertices.
+    - `pairs`: (nedges,2) int array with the connected vertex pairs.
+    - `nparts`: int: number of parts.
+    - `eweights`: (nedges,) array with the edge weights. Default 1.
+    - `vweights`: (n,) array with the vertex weights. Default 1.
+    - `ubfactor`: float: allowed imbalance factor: the weight of the
+      parts will not exceed `ubfactor` times the average weight (plus
+      the weight of a single vertex).
+    - `seed`: int: seed for the random choices made by the algorithm.
+
+    Returns an (n,) int array with the part number of each vertex.
+
+    Example:
+
+    >>> n = 8
+    >>> pairs = [[i,i+1] for i in range(n-1)]
+    >>> print(partitionGraph(n,pairs,2))
+    [0 0 0 0 1 1 1 1]
+    """
+    return Graph(n,pairs,eweights,vweights).partition(nparts,ubfactor,seed)
+
+
+# End
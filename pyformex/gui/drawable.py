@@ -38,6 +38,7 @@ import geomtools
 import simple
 import utils
 import olist
+from instrument import instrumented
 
 from lib import drawgl
 
@@ -1179,6 +1180,7 @@ class Drawable(object):
         for i in self.extra:
             i.use_list()
 
+    @instrumented(pf.DEBUG.DRAW,'Drawable.create_list')
     def create_list(self,**kargs):
         displist = GL.glGenLists(1)
         GL.glNewList(displist,GL.GL_COMPILE)
@@ -520,6 +520,18 @@ def setDebug():
         pf.options.debuglevel = debug
 
 
+def showTimings():
+    """Show the report of the instrumented functions."""
+    import instrument
+    draw.showText(instrument.report(),mono=True)
+
+
+def resetTimings():
+    """Clear the data recorded by the instrumented functions."""
+    import instrument
+    instrument.reset()
+
+
 def setOptions():
     options = [ 'redirect','debuglevel','rst2html']
     options = [ o for o in options if hasattr(pf.options,o) ]
@@ -592,6 +604,8 @@ MenuData = [
     (_('&Settings'),[
         (_('&Settings Dialog'),settings),
         (_('&Debug'),setDebug),
+        (_('&Timings Report'),showTimings),
+        (_('&Reset Timings'),resetTimings),
         (_('&Options'),setOptions),
         (_('&Draw Wait'),setDrawWait),
         (_('&Rendering Params'),setRendering),
@@ -0,0 +1,224 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+"""Instrumentation of performance critical functions.
+
+This module provides a lightweight registry recording the number of calls,
+the wall time, the size of the processed data and the growth of the peak
+memory of the process for a number of key functions of pyFormex.
+
+Recording is switched on per subsystem by the debug levels of the
+:class:`pyformex.DebugLevels` class, e.g. with the command line option
+``--debug mesh,file`` or through the Settings->Debug menu of the GUI.
+Functions are instrumented with the :func:`instrumented` decorator,
+code sections with the :func:`timing` context manager. If the debug level
+of the subsystem is not set, only the test of the debug level is added to
+the execution of the function.
+
+The collected data can be reported with :func:`report`, or with the
+``--timings`` command line option at exit of pyFormex.
+"""
+from __future__ import print_function
+
+import pyformex as pf
+import time,types
+from contextlib import contextmanager
+
+try:
+    import resource
+    def peakMemory():
+        """Return the peak resident memory of the process in KiB."""
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+except ImportError:
+    def peakMemory():
+        """Return the peak resident memory of the process in KiB."""
+        return 0
+
+
+class Record(object):
+    """The instrumentation data for a single function or code section.
+
+    Attributes:
+
+    - `calls`: the number of calls,
+    - `time`: the total wall time in seconds,
+    - `tmax`: the largest wall time of a single call,
+    - `size`: the largest data size passed to the function,
+    - `mem`: the largest growth of the peak memory during a call, in KiB.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.
+        self.tmax = 0.
+        self.size = 0
+        self.mem = 0
+
+
+    def add(self,t,size=0,mem=0):
+        """Add the data of a call to the record."""
+        self.calls += 1
+        self.time += t
+        self.tmax = max(self.tmax,t)
+        self.size = max(self.size,size)
+        self.mem = max(self.mem,mem)
+
+
+# The registry with the recorded data
+_registry = {}
+# The names currently being recorded
+_active = set()
+
+
+def enabled(level):
+    """Check whether the instrumentation of a subsystem is switched on.
+
+    `level` is one or more (OR-ed) debug levels from :class:`DebugLevels`.
+    """
+    try:
+        return bool(pf.options.debuglevel & level)
+    except AttributeError:
+        return False
+
+
+def dataSize(obj):
+    """Return the size of the data in an object.
+
+    Returns the number of items for an array-like object, the number
+    of elements for a Geometry object with elements, or 0 if the object
+    has no size.
+    """
+    try:
+        if hasattr(obj,'nelems'):
+            return int(obj.nelems())
+        return int(obj.size)
+    except Exception:
+        return 0
+
+
+@contextmanager
+def timing(name,level,size=0):
+    """A context manager recording the execution of a code section.
+
+    Parameters:
+
+    - `name`: the name under which the data are recorded.
+    - `level`: the debug level(s) for which the recording is done.
+    - `size`: the size of the data processed in the code section.
+
+    Nested (recursive) executions of a section with the same name are
+    only recorded once, as part of the outer execution.
+
+    Example::
+
+      with timing('distanceOfPoints/vertex',pf.DEBUG.MESH,X.size):
+          ...
+    """
+    if name in _active or not enabled(level):
+        yield
+        return
+    _active.add(name)
+    mem = peakMemory()
+    t = time.time()
+    try:
+        yield
+    finally:
+        t = time.time() - t
+        _active.discard(name)
+        if name not in _registry:
+            _registry[name] = Record()
+        _registry[name].add(t,size,peakMemory()-mem)
+
+
+def instrumented(level,name=None,arg=0):
+    """Decorator recording the calls of a function in the registry.
+
+    Parameters:
+
+    - `level`: the debug level(s) for which the calls are recorded.
+    - `name`: the name under which the data are recorded. The default
+      is the name of the function. For methods it is advised to specify
+      the name as 'Class.method'.
+    - `arg`: the index of the positional argument whose size is recorded
+      as the data size. The default is the first argument, which is `self`
+      for a method.
+
+    If the decorator is combined with `classmethod` or `staticmethod`,
+    it should be applied first (i.e. be put below them).
+    """
+    def decorator(func):
+        if name is None:
+            key = func.__name__
+        else:
+            key = name
+        is_enabled = enabled
+        record = timing
+        size = dataSize
+        def wrapper(*args,**kargs):
+            if not is_enabled(level):
+                return func(*args,**kargs)
+            with record(key,level,size(args[arg]) if len(args) > arg else 0):
+                return func(*args,**kargs)
+        # The wrapper gets the globals of the wrapped function: this makes
+        # doctest still find the examples in its docstring.
+        wrapper = types.FunctionType(wrapper.func_code,func.func_globals,
+                                     func.__name__,None,wrapper.func_closure)
+        wrapper.__doc__ = func.__doc__
+        wrapper.__module__ = func.__module__
+        wrapper.__dict__.update(func.__dict__)
+        wrapper.func = func
+        return wrapper
+    return decorator
+
+
+def reset():
+    """Clear the instrumentation registry."""
+    _registry.clear()
+
+
+def records():
+    """Return the recorded data.
+
+    Returns a list of (name,Record) tuples sorted by decreasing total time.
+    """
+    return sorted(_registry.items(),key=lambda r:r[1].time,reverse=True)
+
+
+def report():
+    """Return a report of the recorded data as a string."""
+    recs = records()
+    if not recs:
+        return "No instrumentation data recorded. Set the debug levels of the subsystems (e.g. mesh,file,draw) to record."
+    s = "%-40s %8s %10s %10s %10s %10s %10s\n" % ('function','calls','time','mean','max','size','mem(KiB)')
+    for name,r in recs:
+        s += "%-40s %8d %10.4f %10.4f %10.4f %10d %10d\n" % (name,r.calls,r.time,r.time/r.calls,r.tmax,r.size,r.mem)
+    return s
+
+
+def printReport():
+    """Print the report of the recorded data."""
+    print(report())
+
+
+# End
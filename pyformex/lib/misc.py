@@ -443,7 +443,7 @@ def polygoniseCube(pos,val,level):
     """Polygonise a single cube
 
     """
-    pos = pos.astype(float32)
+    pos = pos.astype(np.float32)
     # Determine the index into the edge table which
     # tells us which vertices are inside of the surface
 
@@ -457,7 +457,7 @@ def polygoniseCube(pos,val,level):
     if edgetable[cubeindex] == 0:
         return []
 
-    vertlist = zeros((12,3))
+    vertlist = np.zeros((12,3))
     
     # Find the vertices where the surface intersects the cube
     edge_table = [
@@ -546,8 +546,81 @@ def isosurface(data,level):
         for y in range(data.shape[1]-1) ]
       for z in range(data.shape[0]-1) ]
     
-    triangles = asarray(triangles).reshape(-1,3,3)
+    triangles = np.asarray(triangles).reshape(-1,3,3)
     return triangles
 
 
+# Lowest corner and axis of the cube edges
+edge_low = np.array([0,1,3,0,4,5,7,4,0,1,2,3])
+edge_axis = np.array([0,1,0,1,0,1,0,1,2,2,2,2])
+
+def isosurfaceIndexed(data,level):
+    """Create a fused isosurface through data at given level.
+
+    - `data`: (nz,ny,nx) shaped array of data values at points with
+      coordinates equal to their indices. This defines a 3D volume
+      [0,nx-1], [0,ny-1], [0,nz-1]
+    - `level`: data value at which the isosurface is to be constructed
+
+    Returns a tuple (coords,elems,keys), where coords is a (nv,3) float
+    array with the vertices, elems is an (ntri,3) int array with the
+    triangles, and keys is an (nv,) int64 array with a unique key for
+    each vertex: 4*p+a, where p is the number of the lowest grid point
+    of the cut edge and a its axis, or a=3 if the vertex coincides with
+    grid point p. Triangles with coinciding vertices are skipped.
+    """
+    data = np.asarray(data,dtype=np.float32)
+    level = np.float32(level)
+    nz,ny,nx = data.shape
+    if min(nz,ny,nx) < 2:
+        return np.zeros((0,3),dtype=np.float32),np.zeros((0,3),dtype=np.int32),np.zeros((0,),dtype=np.int64)
+    # Find the cut cells
+    below = data < level
+    cubeindex = np.zeros((nz-1,ny-1,nx-1),dtype=np.int32)
+    for i,(x,y,z) in enumerate(grid):
+        cubeindex |= below[z:z+nz-1,y:y+ny-1,x:x+nx-1].astype(np.int32) << i
+    cubeindex = cubeindex.ravel()
+    cells = np.where(np.asarray(edgetable)[cubeindex] != 0)[0]
+    cz,cy,cx = np.unravel_index(cells,(nz-1,ny-1,nx-1))
+    # Find the triangles
+    tritab = -np.ones((256,15),dtype=np.int32)
+    for i,t in enumerate(tritable):
+        tritab[i,:len(t)] = t
+    edges = tritab[cubeindex[cells]].reshape(-1,5,3)
+    ok = edges[:,:,0] >= 0
+    c = np.repeat(np.arange(len(cells)),5).reshape(-1,5)[ok]
+    e = edges[ok]
+    c = c.reshape(-1,1)
+    # Find the cut edges
+    low = grid[edge_low[e]]
+    ax = edge_axis[e]
+    px,py,pz = cx[c]+low[...,0], cy[c]+low[...,1], cz[c]+low[...,2]
+    qx,qy,qz = px+(ax==0), py+(ax==1), pz+(ax==2)
+    v1 = data[pz,py,px]
+    v2 = data[qz,qy,qx]
+    snap1 = abs(level-v1) < 0.00001
+    snap2 = ~snap1 & (abs(level-v2) < 0.00001)
+    snap = snap1 | snap2 | (abs(v1-v2) < 0.00001)
+    kx,ky,kz = [ np.where(snap2,q,p) for p,q in [(px,qx),(py,qy),(pz,qz)] ]
+    slot = np.where(snap,3,ax)
+    keys = 4*((kz.astype(np.int64)*ny+ky)*nx+kx) + slot
+    # Remove degenerate triangles
+    ok = (keys[:,0] != keys[:,1]) & (keys[:,1] != keys[:,2]) & (keys[:,2] != keys[:,0])
+    keys = keys[ok].ravel()
+    kx,ky,kz,slot,v1,v2 = [ a[ok].ravel() for a in [kx,ky,kz,slot,v1,v2] ]
+    # Number the vertices in order of first appearance
+    ukeys,first,inv = np.unique(keys,return_index=True,return_inverse=True)
+    order = first.argsort()
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    first = first[order]
+    coords = np.column_stack([kx,ky,kz]).astype(np.float32)[first]
+    slot = slot[first]
+    interp = np.where(slot < 3)[0]
+    v1,v2 = v1[first[interp]],v2[first[interp]]
+    coords[interp,slot[interp]] += (level-v1) / (v2-v1)
+    elems = rank[inv].reshape(-1,3).astype(np.int32)
+    return coords,elems,ukeys[order]
+
+
 # End
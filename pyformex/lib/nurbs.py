@@ -32,7 +32,7 @@ from __future__ import print_function
 
 # There should be no other imports here but numpy
 from math import factorial
-from numpy import zeros
+from numpy import zeros,asarray,arange,newaxis
 
 accelerated = False
 
@@ -74,4 +74,305 @@ def allBernstein(n,u):
         B[j] = saved
     return B
 
+
+# The functions below are vectorized over the parametric values:
+# the basis functions for all parametric values are computed at once,
+# looping only over the (small) degree of the splines.
+
+
+def findSpan(U,u,p,n):
+    """Find the knot span indices of the parametric values u.
+
+    Parameters:
+
+    - `U`: knot sequence: U[0] .. U[m]
+    - `u`: (nu,) parametric values: U[0] <= u <= U[m]
+    - `p`: degree of the B-spline basis functions
+    - `n`: number of control points - 1 = m - p - 1
+
+    Returns an (nu,) int array with the index of the knot span for each
+    value in u.
+
+    Vectorized version of algorithm A2.1 from 'The NURBS Book' pg68.
+    """
+    return (U.searchsorted(u,side='right')-1).clip(p,n)
+
+
+def basisFuns(U,u,p,i):
+    """Compute the nonvanishing B-spline basis functions.
+
+    Parameters:
+
+    - `U`: knot sequence: U[0] .. U[m]
+    - `u`: (nu,) parametric values: U[0] <= u <= U[m]
+    - `p`: degree of the B-spline basis functions
+    - `i`: (nu,) index of the knot span for the values u (from findSpan)
+
+    Returns an (nu,p+1) array with the values of the nonzero basis
+    functions at u.
+
+    Vectorized version of algorithm A2.2 from 'The NURBS Book' pg70.
+    """
+    nu = len(u)
+    N = zeros((nu,p+1))
+    left = zeros((nu,p+1))
+    right = zeros((nu,p+1))
+    N[:,0] = 1.0
+    for j in range(1,p+1):
+        left[:,j] = u - U[i+1-j]
+        right[:,j] = U[i+j] - u
+        saved = 0.0
+        for r in range(j):
+            temp = N[:,r] / (right[:,r+1] + left[:,j-r])
+            N[:,r] = saved + right[:,r+1] * temp
+            saved = left[:,j-r] * temp
+        N[:,j] = saved
+    return N
+
+
+def basisDerivs(U,u,p,i,n):
+    """Compute the nonvanishing B-spline basis functions and derivatives.
+
+    Parameters:
+
+    - `U`: knot sequence: U[0] .. U[m]
+    - `u`: (nu,) parametric values: U[0] <= u <= U[m]
+    - `p`: degree of the B-spline basis functions
+    - `i`: (nu,) index of the knot span for the values u (from findSpan)
+    - `n`: number of derivatives to compute (n <= p)
+
+    Returns an (nu,n+1,p+1) array with the values of the nonzero basis
+    functions and their first n derivatives at u.
+
+    Vectorized version of algorithm A2.3 from 'The NURBS Book' pg72.
+    """
+    nu = len(u)
+    ndu = zeros((nu,p+1,p+1))
+    left = zeros((nu,p+1))
+    right = zeros((nu,p+1))
+    ndu[:,0,0] = 1.0
+    for j in range(1,p+1):
+        left[:,j] = u - U[i+1-j]
+        right[:,j] = U[i+j] - u
+        saved = 0.0
+        for r in range(j):
+            # Lower triangle
+            ndu[:,j,r] = right[:,r+1] + left[:,j-r]
+            temp = ndu[:,r,j-1] / ndu[:,j,r]
+            # Upper triangle
+            ndu[:,r,j] = saved + right[:,r+1] * temp
+            saved = left[:,j-r] * temp
+        ndu[:,j,j] = saved
+
+    dN = zeros((nu,n+1,p+1))
+    # Load the basis functions
+    dN[:,0] = ndu[:,:,p]
+
+    # Compute the derivatives (Eq. 2.9)
+    a = zeros((nu,2,p+1))
+    for r in range(p+1):
+        # Alternate rows in array a
+        s1,s2 = 0,1
+        a[:,0,0] = 1.0
+        # Loop to compute kth derivative
+        for k in range(1,n+1):
+            der = zeros(nu)
+            rk,pk = r-k,p-k
+            if r >= k:
+                a[:,s2,0] = a[:,s1,0] / ndu[:,pk+1,rk]
+                der = a[:,s2,0] * ndu[:,rk,pk]
+            j1 = 1 if rk >= -1 else -rk
+            j2 = k-1 if r-1 <= pk else p-r
+            for j in range(j1,j2+1):
+                a[:,s2,j] = (a[:,s1,j] - a[:,s1,j-1]) / ndu[:,pk+1,rk+j]
+                der += a[:,s2,j] * ndu[:,rk+j,pk]
+            if r <= pk:
+                a[:,s2,k] = -a[:,s1,k-1] / ndu[:,pk+1,r]
+                der += a[:,s2,k] * ndu[:,r,pk]
+            dN[:,k,r] = der
+            # Switch rows
+            s1,s2 = s2,s1
+
+    # Multiply by the correct factors
+    r = p
+    for k in range(1,n+1):
+        dN[:,k] *= r
+        r *= (p-k)
+    return dN
+
+
+def curvesPoints(P,U,u):
+    """Compute points on multiple B-spline curves with the same knot vector.
+
+    Input:
+
+    - P: control points P(nb,nc,nd)
+    - U: knot sequence: U[0] .. U[m]
+    - u: parametric values: U[0] <= ui <= U[m]
+
+    Output:
+    - pnt: (nb,nu,nd) points on the B-splines
+
+    The basis functions are computed only once for all curves.
+    """
+    P = asarray(P,dtype=float)
+    U = asarray(U,dtype=float)
+    u = asarray(u,dtype=float).ravel()
+    nb,nc,nd = P.shape
+    p = len(U) - nc - 1
+    s = findSpan(U,u,p,nc-1)
+    N = basisFuns(U,u,p,s)
+    pnt = zeros((nb,len(u),nd))
+    for r in range(p+1):
+        pnt += N[:,r,newaxis] * P[:,s-p+r]
+    return pnt
+
+
+def curvesDerivs(P,U,u,n):
+    """Compute derivatives of multiple B-spline curves with the same knots.
+
+    Input:
+
+    - P: control points P(nb,nc,nd)
+    - U: knot sequence: U[0] .. U[m]
+    - u: parametric values: U[0] <= ui <= U[m]
+    - n: number of derivatives to compute
+
+    Output:
+    - pnt: (nb,n+1,nu,nd) points and derivatives on the B-splines
+
+    The basis functions are computed only once for all curves.
+    """
+    P = asarray(P,dtype=float)
+    U = asarray(U,dtype=float)
+    u = asarray(u,dtype=float).ravel()
+    nb,nc,nd = P.shape
+    p = len(U) - nc - 1
+    du = min(p,n)
+    s = findSpan(U,u,p,nc-1)
+    dN = basisDerivs(U,u,p,s,du)
+    pnt = zeros((nb,n+1,len(u),nd))
+    for r in range(p+1):
+        Pr = P[:,s-p+r]
+        for l in range(du+1):
+            pnt[:,l] += dN[:,l,r,newaxis] * Pr
+    return pnt
+
+
+def curvePoints(P,U,u):
+    """Compute points on a B-spline curve.
+
+    Input:
+
+    - P: control points P(nc,nd)
+    - U: knot sequence: U[0] .. U[m]
+    - u: parametric values: U[0] <= ui <= U[m]
+
+    Output:
+    - pnt: (nu,nd) points on the B-spline
+    """
+    return curvesPoints(asarray(P)[newaxis],U,u)[0]
+
+
+def curveDerivs(P,U,u,n):
+    """Compute derivatives of a B-spline curve.
+
+    Input:
+
+    - P: control points P(nc,nd)
+    - U: knot sequence: U[0] .. U[m]
+    - u: parametric values: U[0] <= ui <= U[m]
+    - n: number of derivatives to compute
+
+    Output:
+    - pnt: (n+1,nu,nd) points and derivatives on the B-spline
+    """
+    return curvesDerivs(asarray(P)[newaxis],U,u,n)[0]
+
+
+def surfacesPoints(P,U,V,u):
+    """Compute points on multiple B-spline surfaces with the same knots.
+
+    Input:
+
+    - P: control points P(nb,ns,nt,nd)
+    - U: knot sequence: U[0] .. U[m]
+    - V: knot sequence: V[0] .. V[n]
+    - u: parametric values (nu,2): U[0] <= ui[0] <= U[m], V[0] <= ui[1] <= V[m]
+
+    Output:
+    - pnt: (nb,nu,nd) points on the B-spline surfaces
+
+    The basis functions are computed only once for all surfaces.
+    """
+    P = asarray(P,dtype=float)
+    U = asarray(U,dtype=float)
+    V = asarray(V,dtype=float)
+    u = asarray(u,dtype=float).reshape(-1,2)
+    nb,ns,nt,nd = P.shape
+    p = len(U) - ns - 1
+    q = len(V) - nt - 1
+    su = findSpan(U,u[:,0],p,ns-1)
+    Nu = basisFuns(U,u[:,0],p,su)
+    sv = findSpan(V,u[:,1],q,nt-1)
+    Nv = basisFuns(V,u[:,1],q,sv)
+    pnt = zeros((nb,len(u),nd))
+    for r in range(p+1):
+        for t in range(q+1):
+            pnt += (Nu[:,r]*Nv[:,t])[:,newaxis] * P[:,su-p+r,sv-q+t]
+    return pnt
+
+
+def surfacePoints(P,U,V,u):
+    """Compute points on a B-spline surface.
+
+    Input:
+
+    - P: control points P(ns,nt,nd)
+    - U: knot sequence: U[0] .. U[m]
+    - V: knot sequence: V[0] .. V[n]
+    - u: parametric values (nu,2): U[0] <= ui[0] <= U[m], V[0] <= ui[1] <= V[m]
+
+    Output:
+    - pnt: (nu,nd) points on the B-spline surface
+    """
+    return surfacesPoints(asarray(P)[newaxis],U,V,u)[0]
+
+
+def surfaceDerivs(P,U,V,u,mu,mv):
+    """Compute derivatives of a B-spline surface.
+
+    Input:
+
+    - P: control points P(ns,nt,nd)
+    - U: knot sequence: U[0] .. U[m]
+    - V: knot sequence: V[0] .. V[n]
+    - u: parametric values (nu,2): U[0] <= ui[0] <= U[m], V[0] <= ui[1] <= V[m]
+    - mu,mv: number of derivatives to compute in u,v direction
+
+    Output:
+    - pnt: (mu+1,mv+1,nu,nd) points and derivatives on the B-spline surface
+    """
+    P = asarray(P,dtype=float)
+    U = asarray(U,dtype=float)
+    V = asarray(V,dtype=float)
+    u = asarray(u,dtype=float).reshape(-1,2)
+    ns,nt,nd = P.shape
+    p = len(U) - ns - 1
+    q = len(V) - nt - 1
+    du = min(p,mu)
+    dv = min(q,mv)
+    su = findSpan(U,u[:,0],p,ns-1)
+    Nu = basisDerivs(U,u[:,0],p,su,du)
+    sv = findSpan(V,u[:,1],q,nt-1)
+    Nv = basisDerivs(V,u[:,1],q,sv,dv)
+    pnt = zeros((mu+1,mv+1,len(u),nd))
+    for r in range(p+1):
+        for t in range(q+1):
+            Prt = P[su-p+r,sv-q+t]
+            for k in range(du+1):
+                for l in range(dv+1):
+                    pnt[k,l] += (Nu[:,k,r]*Nv[:,l,t])[:,newaxis] * Prt
+    return pnt
+
 # End
@@ -1260,6 +1260,182 @@ static void surface_derivs(int mu, int mv, double *P,int ns, int nt, int nd, dou
 }
 
 
+/********************************************************/
+/******************* BATCH EVALUATION *******************/
+/********************************************************/
+
+/* The batch functions evaluate multiple curves or surfaces sharing the
+   same degree and knot vectors. The spans and basis functions are computed
+   only once for each parametric value and then applied to all control nets.
+*/
+
+
+/* curves_points */
+/*
+Compute points on multiple B-spline curves with the same knot vector.
+
+Input:
+
+- P: control points P(nb,nc,nd)
+- nb: number of curves
+- nc: number of control points of each curve
+- nd: dimension of the points (3 or 4)
+- U: knot sequence: U[0] .. U[m]
+- nk: number of knot values = m+1
+- u: parametric values: U[0] <= ui <= U[m]
+- nu: number of parametric values
+
+Output:
+- pnt: (nb,nu,nd) points on the B-splines
+*/
+static void curves_points(double *P, int nb, int nc, int nd, double *U, int nk, double *u, int nu, double *pnt)
+{
+  int b, i, j, p, s, t;
+
+  /* degree of the spline */
+  p = nk - nc - 1;
+
+  /* space for the basis functions */
+  double *N = (double*) malloc((p+1)*sizeof(double));
+
+  /* for each parametric point j */
+  for (j=0; j<nu; ++j) {
+
+    /* find the span index of u[j] */
+    s = find_span(U,u[j],p,nc-1);
+    basis_funs(U,u[j],p,s,N);
+
+    /* apply to all curves */
+    t = (s-p) * nd;
+    for (b=0; b<nb; ++b) {
+      for (i=0; i<nd; ++i) {
+	pnt[(b*nu+j)*nd+i] = dotprod(N,1,P+b*nc*nd+t+i,nd,p+1);
+      }
+    }
+  }
+  free(N);
+}
+
+
+/* curves_derivs */
+/*
+Compute derivatives of multiple B-spline curves with the same knot vector.
+
+Input:
+
+- n: number of derivatives to compute
+- P: control points P(nb,nc,nd)
+- nb: number of curves
+- nc: number of control points of each curve
+- nd: dimension of the points (3 or 4)
+- U: knot sequence: U[0] .. U[m]
+- nk: number of knot values = m+1
+- u: parametric values: U[0] <= ui <= U[m]
+- nu: number of parametric values
+
+Output:
+- pnt: (nb,n+1,nu,nd) points and derivatives on the B-splines
+*/
+static void curves_derivs(int n, double *P, int nb, int nc, int nd, double *U, int nk, double *u, int nu, double *pnt)
+{
+  int b, i, j, l, p, s, t;
+
+  /* degree of the spline */
+  p = nk - nc - 1;
+
+  /* number of nonzero derivatives to compute */
+  int du = min(p,n);
+
+  /* space for the basis functions and derivs (du+1,p+1) */
+  double *dN = (double *) malloc((du+1)*(p+1)*sizeof(double));
+  for (i = 0; i < (du+1)*(p+1); i++) dN[i] = 0.0;
+
+  /* clear everything */
+  for (i = 0; i < nb*(n+1)*nu*nd; i++) pnt[i] = 0.0;
+
+  /* for each parametric point j */
+  for (j = 0; j < nu; j++) {
+    s = find_span(U,u[j],p,nc-1);
+    basis_derivs(U,u[j],p,s,du,dN);
+    t = (s-p) * nd;
+
+    /* for each curve and each nonzero derivative */
+    for (b = 0; b < nb; b++) {
+      for (l = 0; l <= du; l++) {
+	for (i = 0; i < nd; i++) {
+	  pnt[((b*(n+1)+l)*nu+j)*nd+i] = dotprod(dN+l*(p+1),1,P+b*nc*nd+t+i,nd,p+1);
+	}
+      }
+    }
+  }
+  free(dN);
+}
+
+
+/* surfaces_points */
+/*
+Compute points on multiple B-spline surfaces with the same knot vectors.
+
+Input:
+
+- P: control points P(nb,ns,nt,nd)
+- nb: number of surfaces
+- ns,nt: number of control points of each surface
+- nd: dimension of the points (3 or 4)
+- U: knot sequence: U[0] .. U[m]
+- nU: number of knot values U = m+1
+- V: knot sequence: V[0] .. V[n]
+- nV: number of knot values V = n+1
+- u: parametric values (nu,2): U[0] <= ui[0] <= U[m], V[0] <= ui[1] <= V[m]
+- nu: number of parametric values
+
+Output:
+- pnt: (nb,nu,nd) points on the B-spline surfaces
+*/
+static void surfaces_points(double *P, int nb, int ns, int nt, int nd, double *U, int nU, double *V, int nV, double *u, int nu, double *pnt)
+{
+  int b, i, j, p, q, r, su, sv, iu, iv;
+  double S, *Q;
+
+  /* degrees of the spline */
+  p = nU - ns - 1;
+  q = nV - nt - 1;
+
+  /* space for the basis functions */
+  double *Nu = (double*) malloc((p+1)*sizeof(double));
+  double *Nv = (double*) malloc((q+1)*sizeof(double));
+
+  /* for each parametric point j */
+  for (j=0; j<nu; ++j) {
+
+    /* find the span index of u[j] */
+    su = find_span(U,u[2*j],p,ns-1);
+    basis_funs(U,u[2*j],p,su,Nu);
+
+    /* find the span index of v[j] */
+    sv = find_span(V,u[2*j+1],q,nt-1);
+    basis_funs(V,u[2*j+1],q,sv,Nv);
+
+    iu = su-p;
+    iv = sv-q;
+
+    /* apply to all surfaces */
+    for (b=0; b<nb; ++b) {
+      Q = P + b*ns*nt*nd;
+      for (i=0; i<nd; ++i) {
+	S = 0.0;
+	for (r=0; r<=p; ++r) {
+	  S += Nu[r] * dotprod(Nv,1,Q+((iu+r)*nt+iv)*nd+i,nd,q+1);
+	}
+	pnt[(b*nu+j)*nd+i] = S;
+      }
+    }
+  }
+  free(Nu);
+  free(Nv);
+}
+
+
 /* surfaceDecompose */
 /*
 Decompose a Nurbs surface in Bezier patches. 
@@ -2164,6 +2340,231 @@ static PyObject * surfaceDerivs(PyObject *self, PyObject *args)
 }
 
 
+static char curvesPoints_doc[] =
+"Compute points on multiple B-spline curves with the same knot vector.\n\
+\n\
+Input:\n\
+\n\
+- P: control points P(nb,nc,nd)\n\
+- U: knot sequence: U[0] .. U[m]\n\
+- u: parametric values: U[0] <= ui <= U[m]\n\
+\n\
+Output:\n\
+- pnt: (nb,nu,nd) points on the B-splines\n\
+\n\
+The basis functions are computed only once for all curves.\n\
+";
+
+static PyObject * curvesPoints(PyObject *self, PyObject *args)
+{
+  int nb, nd, nc, nk, nu;
+  npy_intp *P_dim, *U_dim, *u_dim, dim[3];
+  double *P, *U, *u, *pnt;
+  PyObject *a1, *a2, *a3;
+  PyObject *arr1=NULL, *arr2=NULL, *arr3=NULL, *ret=NULL;
+
+  if (!PyArg_ParseTuple(args, "OOO", &a1, &a2, &a3))
+    return NULL;
+  arr1 = PyArray_FROM_OTF(a1, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr1 == NULL)
+    return NULL;
+  arr2 = PyArray_FROM_OTF(a2, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr2 == NULL)
+    goto fail;
+  arr3 = PyArray_FROM_OTF(a3, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr3 == NULL)
+    goto fail;
+
+  P_dim = PyArray_DIMS(arr1);
+  U_dim = PyArray_DIMS(arr2);
+  u_dim = PyArray_DIMS(arr3);
+  nb = P_dim[0];
+  nc = P_dim[1];
+  nd = P_dim[2];
+  nk = U_dim[0];
+  nu = u_dim[0];
+  P = (double *)PyArray_DATA(arr1);
+  U = (double *)PyArray_DATA(arr2);
+  u = (double *)PyArray_DATA(arr3);
+
+  /* Create the return array */
+  dim[0] = nb;
+  dim[1] = nu;
+  dim[2] = nd;
+  ret = PyArray_SimpleNew(3,dim, NPY_DOUBLE);
+  pnt = (double *)PyArray_DATA(ret);
+
+  /* Compute */
+  curves_points(P, nb, nc, nd, U, nk, u, nu, pnt);
+
+  /* Clean up and return */
+  Py_DECREF(arr1);
+  Py_DECREF(arr2);
+  Py_DECREF(arr3);
+  return ret;
+
+ fail:
+  Py_XDECREF(arr1);
+  Py_XDECREF(arr2);
+  Py_XDECREF(arr3);
+  return NULL;
+}
+
+
+static char curvesDerivs_doc[] =
+"Compute derivatives of multiple B-spline curves with the same knot vector.\n\
+\n\
+Input:\n\
+\n\
+- P: control points P(nb,nc,nd)\n\
+- U: knot sequence: U[0] .. U[m]\n\
+- u: parametric values: U[0] <= ui <= U[m]\n\
+- n: number of derivatives to compute\n\
+\n\
+Output:\n\
+- pnt: (nb,n+1,nu,nd) points and derivatives on the B-splines\n\
+\n\
+The basis functions are computed only once for all curves.\n\
+";
+
+static PyObject * curvesDerivs(PyObject *self, PyObject *args)
+{
+  int nb, nc, nd, nk, nu, n;
+  npy_intp *P_dim, *U_dim, *u_dim, dim[4];
+  double *P, *U, *u, *pnt;
+  PyObject *a1, *a2, *a3;
+  PyObject *arr1=NULL, *arr2=NULL, *arr3=NULL, *ret=NULL;
+
+  if(!PyArg_ParseTuple(args, "OOOi", &a1, &a2, &a3, &n))
+    return NULL;
+  arr1 = PyArray_FROM_OTF(a1, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr1 == NULL)
+    return NULL;
+  arr2 = PyArray_FROM_OTF(a2, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr2 == NULL)
+    goto fail;
+  arr3 = PyArray_FROM_OTF(a3, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr3 == NULL)
+    goto fail;
+
+  P_dim = PyArray_DIMS(arr1);
+  U_dim = PyArray_DIMS(arr2);
+  u_dim = PyArray_DIMS(arr3);
+  nb = P_dim[0];
+  nc = P_dim[1];
+  nd = P_dim[2];
+  nk = U_dim[0];
+  nu = u_dim[0];
+  P = (double *)PyArray_DATA(arr1);
+  U = (double *)PyArray_DATA(arr2);
+  u = (double *)PyArray_DATA(arr3);
+
+  /* Create the return array */
+  dim[0] = nb;
+  dim[1] = n+1;
+  dim[2] = nu;
+  dim[3] = nd;
+  ret = PyArray_SimpleNew(4,dim, NPY_DOUBLE);
+  pnt = (double *)PyArray_DATA(ret);
+
+  /* Compute */
+  curves_derivs(n, P, nb, nc, nd, U, nk, u, nu, pnt);
+
+  /* Clean up and return */
+  Py_DECREF(arr1);
+  Py_DECREF(arr2);
+  Py_DECREF(arr3);
+  return ret;
+
+ fail:
+  Py_XDECREF(arr1);
+  Py_XDECREF(arr2);
+  Py_XDECREF(arr3);
+  return NULL;
+}
+
+
+static char surfacesPoints_doc[] =
+"Compute points on multiple B-spline surfaces with the same knot vectors.\n\
+\n\
+Input:\n\
+\n\
+- P: control points P(nb,ns,nt,nd)\n\
+- U: knot sequence: U[0] .. U[m]\n\
+- V: knot sequence: V[0] .. V[n]\n\
+- u: parametric values (nu,2): U[0] <= ui[0] <= U[m], V[0] <= ui[1] <= V[m]\n\
+\n\
+Output:\n\
+- pnt: (nb,nu,nd) points on the B-spline surfaces\n\
+\n\
+The basis functions are computed only once for all surfaces.\n\
+";
+
+static PyObject * surfacesPoints(PyObject *self, PyObject *args)
+{
+  int nb,ns,nt,nd,nU,nV,nu;
+  npy_intp *P_dim, *U_dim, *V_dim, *u_dim, dim[3];
+  double *P, *U, *V, *u, *pnt;
+  PyObject *a1, *a2, *a3, *a4;
+  PyObject *arr1=NULL, *arr2=NULL, *arr3=NULL, *arr4=NULL, *ret=NULL;
+
+  if (!PyArg_ParseTuple(args, "OOOO", &a1, &a2, &a3, &a4))
+    return NULL;
+  arr1 = PyArray_FROM_OTF(a1, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr1 == NULL)
+    return NULL;
+  arr2 = PyArray_FROM_OTF(a2, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr2 == NULL)
+    goto fail;
+  arr3 = PyArray_FROM_OTF(a3, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr3 == NULL)
+    goto fail;
+  arr4 = PyArray_FROM_OTF(a4, NPY_DOUBLE, NPY_IN_ARRAY);
+  if(arr4 == NULL)
+    goto fail;
+
+  P_dim = PyArray_DIMS(arr1);
+  U_dim = PyArray_DIMS(arr2);
+  V_dim = PyArray_DIMS(arr3);
+  u_dim = PyArray_DIMS(arr4);
+  nb = P_dim[0];
+  ns = P_dim[1];
+  nt = P_dim[2];
+  nd = P_dim[3];
+  nU = U_dim[0];
+  nV = V_dim[0];
+  nu = u_dim[0];
+  P = (double *)PyArray_DATA(arr1);
+  U = (double *)PyArray_DATA(arr2);
+  V = (double *)PyArray_DATA(arr3);
+  u = (double *)PyArray_DATA(arr4);
+
+  /* Create the return array */
+  dim[0] = nb;
+  dim[1] = nu;
+  dim[2] = nd;
+  ret = PyArray_SimpleNew(3,dim, NPY_DOUBLE);
+  pnt = (double *)PyArray_DATA(ret);
+
+  /* Compute */
+  surfaces_points(P,nb,ns,nt,nd,U,nU,V,nV,u,nu,pnt);
+
+  /* Clean up and return */
+  Py_DECREF(arr1);
+  Py_DECREF(arr2);
+  Py_DECREF(arr3);
+  Py_DECREF(arr4);
+  return ret;
+
+ fail:
+  Py_XDECREF(arr1);
+  Py_XDECREF(arr2);
+  Py_XDECREF(arr3);
+  Py_XDECREF(arr4);
+  return NULL;
+}
+
+
 static PyMethodDef _methods_[] =
 {
 	{"binomial", binomial, METH_VARARGS, binomial_doc},
@@ -2179,6 +2580,9 @@ static PyMethodDef _methods_[] =
 	{"curveGlobalInterpolationMatrix", curveGlobalInterpolationMatrix, METH_VARARGS, curveGlobalInterpolationMatrix_doc},
 	{"surfacePoints", surfacePoints, METH_VARARGS, surfacePoints_doc},
 	{"surfaceDerivs", surfaceDerivs, METH_VARARGS, surfaceDerivs_doc},
+	{"curvesPoints", curvesPoints, METH_VARARGS, curvesPoints_doc},
+	{"curvesDerivs", curvesDerivs, METH_VARARGS, curvesDerivs_doc},
+	{"surfacesPoints", surfacesPoints, METH_VARARGS, surfacesPoints_doc},
 	{NULL, NULL}
 };
 
@@ -33,7 +33,8 @@ startup script.
 from __future__ import print_function
 import pyformex as pf
 
-import sys,os
+import sys,os,time
+_startup_time = time.time()
 startup_warnings = ''
 startup_messages = ''
 
@@ -123,6 +124,66 @@ Your Python version is %s, but pyFormex has only been tested with Python <= %s.
 
 from config import Config
 
+###########################  startup profiling  ######################
+
+_startup_marks = None
+_startup_imports = None
+
+def _profiledImport(name,*args,**kargs):
+    """Replacement for __import__ recording the time of first imports."""
+    if not name or name in sys.modules:
+        return _builtin_import(name,*args,**kargs)
+    t = time.time()
+    try:
+        return _builtin_import(name,*args,**kargs)
+    finally:
+        _startup_imports.append((time.time()-t,name))
+
+
+def startProfile():
+    """Start profiling the pyFormex startup.
+
+    This records the time spent in the first import of every module.
+    Use :func:`startupMark` to record the time of the startup phases and
+    :func:`reportStartup` to print the results.
+    """
+    global _startup_marks,_startup_imports,_builtin_import
+    import __builtin__
+    _startup_marks = []
+    _startup_imports = []
+    _builtin_import = __builtin__.__import__
+    __builtin__.__import__ = _profiledImport
+
+
+def startupMark(phase):
+    """Record the end of a startup phase, if profiling is active."""
+    if _startup_marks is not None:
+        _startup_marks.append((time.time(),phase))
+
+
+def reportStartup(nimports=20):
+    """Print the startup profile and stop profiling.
+
+    Prints the time spent in each of the startup phases and the
+    `nimports` slowest module imports. Import times include the time
+    for importing the modules they import themselves.
+    """
+    global _startup_marks
+    if _startup_marks is None:
+        return
+    import __builtin__
+    __builtin__.__import__ = _builtin_import
+    print("pyFormex startup profile")
+    t0 = _startup_time
+    for t,phase in _startup_marks:
+        print("  %8.4f  %8.4f  %s" % (t-_startup_time,t-t0,phase))
+        t0 = t
+    print("Slowest module imports")
+    for t,name in sorted(_startup_imports,reverse=True)[:nimports]:
+        print("  %8.4f  %s" % (t,name))
+    _startup_marks = None
+
+
 ###########################  main  ################################
 
 def filterWarnings():
@@ -336,6 +397,11 @@ def run(argv=[]):
     read config file. Changed settings are those that differ from the settings
     in all but the last one.
     """
+    # Start profiling as early as possible
+    if '--profilestartup' in argv:
+        startProfile()
+        startupMark('main module loaded')
+
     # Create a config instance
     pf.cfg = Config()
     # Fill in the pyformexdir and homedir variables
@@ -462,6 +528,10 @@ def run(argv=[]):
            action="store_true", dest="search", default=False,
            help="Search the pyformex source for a specified pattern and exit. This can optionally be followed by -- followed by options for the grep command and/or '-a' to search all files in the extended search path. The final argument is the pattern to search. '-e' before the pattern will interprete this as an extended regular expression. '-l' option only lists the names of the matching files.",
            ),
+        MO("--bench",
+           action="store_true", dest="bench", default=False,
+           help="Run the benchmark suite and exit. This can optionally be followed by -- followed by options for the benchmarks and the names of the benchmarks to run. Use '-- --help' for the available options.",
+           ),
         MO("--remove",
            action="store_true", dest="remove", default=False,
            help="Remove the pyFormex installation and exit. This option only works when pyFormex was installed from a tarball release using the supplied install procedure. If you install from a distribution package (e.g. Debian), you should use your distribution's package tools to remove pyFormex. If you run pyFormex directly from SVN sources, you should just remove the whole checked out source tree.",
@@ -470,9 +540,17 @@ def run(argv=[]):
            action="store_true", dest="whereami", default=False,
            help="Show where the pyformex package is installed and exit",
            ),
+        MO("--profilestartup",
+           action="store_true", dest="profilestartup", default=False,
+           help="Print the time spent in the startup phases and the slowest module imports. This is only for developers.",
+           ),
+        MO("--timings",
+           action="store_true", dest="timings", default=False,
+           help="Print a report of the calls and execution times of the instrumented functions at exit. The instrumentation of a subsystem is switched on by the corresponding debug level, e.g. '--debug mesh,file,draw'.",
+           ),
         MO("--detect",
            action="store_true", dest="detect", default=False,
-           help="Show detected helper software and exit",
+           help="Detect the installed helper software anew, show it and exit. This also refreshes the cache of detected software that is used to speed up the startup.",
            ),
         ])
     pf.options, args = parser.parse_args(argv)
@@ -482,6 +560,10 @@ def run(argv=[]):
     if pf.options.debug and not pf.options.debuglevel:
         pf.options.debuglevel = pf.debugLevel(pf.options.debug.split(','))
 
+    if pf.options.timings:
+        import atexit,instrument
+        atexit.register(instrument.printReport)
+
     # process options
     if pf.options.nodefaultconfig and not pf.options.config:
         print("\nInvalid options: --nodefaultconfig but no --config option\nDo pyformex --help for help on options.\n")
@@ -489,6 +571,7 @@ def run(argv=[]):
 
 
     pf.debug("Options: %s" % pf.options,pf.DEBUG.ALL)
+    startupMark('options parsed')
 
     ########## Process special options which will not start pyFormex #######
 
@@ -510,7 +593,7 @@ def run(argv=[]):
 
     if pf.options.detect:
         print("Detecting installed helper software")
-        utils.checkExternal()
+        utils.refreshDetected()
         print(utils.reportDetected())
 
     if pf.options.whereami or pf.options.detect :
@@ -562,6 +645,7 @@ def run(argv=[]):
 
     # Create an empty one for the session settings
     pf.cfg = Config(default=prefLookup)
+    startupMark('config files read')
 
     ####################################################################
     ## Post config initialization ##
@@ -589,6 +673,10 @@ def run(argv=[]):
                 os.system(cmd)
         return
 
+    if pf.options.bench:
+        import bench
+        return bench.main(args)
+
 
     # process other options dependent on config
     if pf.options.pyside is None:
@@ -666,10 +754,13 @@ pyFormex Warning
 
     utils.setSaneLocale()
 
-    # Set application paths
-    pf.debug("Loading AppDirs",pf.DEBUG.INFO)
-    import apps
-    apps.setAppDirs()
+    # Set application paths. Without GUI, this is delayed until an
+    # application is loaded (see apps.checkAppDirs).
+    if pf.options.gui:
+        pf.debug("Loading AppDirs",pf.DEBUG.INFO)
+        import apps
+        apps.setAppDirs()
+    startupMark('project and appdirs set')
 
     # Start the GUI if needed
     # Importing the gui should be done after the config is set !!
@@ -680,6 +771,7 @@ pyFormex Warning
         if res != 0:
             print("Could not start the pyFormex GUI: %s" % res)
             return res # EXIT
+        startupMark('GUI started')
 
     # Display the startup warnings and messages
     if startup_warnings:
@@ -716,6 +808,8 @@ pyFormex Warning
     if args:
         pf.debug("Remaining args: %s" % args,pf.DEBUG.INFO)
         from script import processArgs
+        startupMark('script module loaded')
+        reportStartup()
         res = processArgs(args)
 
         if res:
@@ -732,6 +826,8 @@ pyFormex Warning
         #playScript(sys.stdin)
 
 
+    reportStartup()
+
     # after processing all args, go into interactive mode
     if pf.options.gui and pf.app:
         res = guimain.runGUI()
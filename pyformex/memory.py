@@ -0,0 +1,188 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+"""Memory budget for operations creating large temporary arrays.
+
+Some operations create temporary arrays that are many times larger than
+their input. Before doing so, such operations estimate the size of their
+temporary data and consult the memory budget with :func:`chunksize` or
+:func:`require`. If the estimate exceeds the budget, the operation is
+either done in chunks of rows that fit in the budget, or it is refused
+with a :class:`BudgetError`, rather than letting the machine run out of
+memory.
+
+The budget is set by the configuration variables 'memory/budget' (in MiB)
+or, if that is zero, 'memory/fraction' of the memory available at the
+time of the request. Operations needing less than 16 MiB are not checked.
+All decisions are kept in a log (see
+:func:`decisions`) and are shown as debug messages with the MEM debug
+level, to help tuning the budget.
+"""
+from __future__ import print_function
+
+import pyformex as pf
+from collections import deque
+
+
+class BudgetError(MemoryError):
+    """Exception raised when an operation would exceed the memory budget."""
+    pass
+
+
+_MiB = 1024*1024
+
+# Operations needing less temporary memory are not checked nor logged
+_minsize = 16*_MiB
+
+# The log of the budget decisions
+_log = deque(maxlen=100)
+
+
+def meminfo():
+    """Return the system memory information.
+
+    Returns a dict with the values (in KiB) from /proc/meminfo, or an
+    empty dict if that file can not be read.
+    """
+    res = {}
+    try:
+        with open('/proc/meminfo') as fil:
+            for line in fil:
+                k,v = line.split(':')
+                res[k.strip()] = int(v.replace('kB','').strip())
+    except (IOError,ValueError):
+        pass
+    return res
+
+
+def available():
+    """Return the available memory in bytes.
+
+    Returns None if the available memory can not be determined.
+    """
+    info = meminfo()
+    if 'MemAvailable' in info:
+        return info['MemAvailable'] * 1024
+    try:
+        return (info['MemFree'] + info['Buffers'] + info['Cached']) * 1024
+    except KeyError:
+        return None
+
+
+def budget():
+    """Return the current memory budget in bytes.
+
+    Returns None if there is no budget, i.e. if 'memory/budget' is zero
+    and the available memory can not be determined.
+    """
+    size = pf.cfg.get('memory/budget',0)
+    if size > 0:
+        return int(size * _MiB)
+    avail = available()
+    if avail is None:
+        return None
+    return int(pf.cfg.get('memory/fraction',0.5) * avail)
+
+
+def _mib(nbytes):
+    """Format a number of bytes as MiB."""
+    return "%.1f MiB" % (float(nbytes) / _MiB)
+
+
+def _decide(name,nbytes,limit,decision):
+    """Log a budget decision."""
+    _log.append((name,nbytes,limit,decision))
+    pf.debug("Memory budget: %s needs %s of %s: %s" % (name,_mib(nbytes),'unlimited' if limit is None else _mib(limit),decision),pf.DEBUG.MEM)
+
+
+def decisions():
+    """Return the log of the latest budget decisions.
+
+    Returns a list of tuples (name,nbytes,budget,decision), where `name`
+    is the name of the operation, `nbytes` the estimated size of the
+    temporary data, `budget` the budget in bytes at the time (or None)
+    and `decision` a string describing the decision.
+    """
+    return list(_log)
+
+
+def _refuse(name,nbytes,limit):
+    """Log and raise a refusal of an operation."""
+    _decide(name,nbytes,limit,'refused')
+    raise BudgetError("%s needs about %s of temporary memory, which exceeds the memory budget of %s. You can raise the budget with the configuration variables 'memory/budget' or 'memory/fraction'." % (name,_mib(nbytes),_mib(limit)))
+
+
+def require(name,nbytes):
+    """Check that an operation fits in the memory budget.
+
+    Parameters:
+
+    - `name`: the name of the operation, used in the log and messages.
+    - `nbytes`: the estimated size in bytes of the temporary data
+      created by the operation.
+
+    Raises a :class:`BudgetError` if `nbytes` exceeds the budget.
+    """
+    if nbytes < _minsize:
+        return
+    limit = budget()
+    if limit is not None and nbytes > limit:
+        _refuse(name,nbytes,limit)
+    _decide(name,nbytes,limit,'accepted')
+
+
+def chunksize(name,nbytes,nrows,minrows=1):
+    """Return the number of rows to process at once within the budget.
+
+    This is used by operations that can process their data in chunks
+    of rows, with the temporary data size proportional to the number of
+    rows.
+
+    Parameters:
+
+    - `name`: the name of the operation, used in the log and messages.
+    - `nbytes`: the estimated size in bytes of the temporary data
+      created by processing all rows at once.
+    - `nrows`: the total number of rows.
+    - `minrows`: the minimum number of rows in a chunk.
+
+    Returns the number of rows per chunk. This is equal to `nrows` if the
+    whole operation fits in the budget.
+    Raises a :class:`BudgetError` if even a chunk of `minrows` rows does
+    not fit in the budget.
+    """
+    if nbytes < _minsize:
+        return max(nrows,1)
+    limit = budget()
+    if limit is None or nbytes <= limit:
+        _decide(name,nbytes,limit,'accepted')
+        return max(nrows,1)
+    rows = int(limit * nrows // nbytes)
+    if rows < minrows:
+        _refuse(name,nbytes,limit)
+    _decide(name,nbytes,limit,'chunks of %s of %s rows' % (rows,nrows))
+    return rows
+
+
+# End
@@ -42,7 +42,7 @@ from __future__ import print_function
 
 from coords import *
 from formex import Formex
-from connectivity import Connectivity
+from connectivity import Connectivity,Adjacency
 from elements import elementType
 from geometry import Geometry
 from simple import regularGrid
@@ -193,6 +193,21 @@ class Mesh(Geometry):
             raise ValueError,"Invalid reinitialization of %s coords" % self.__class__
 
 
+    def _deferred_copy(self,elems=None):
+        """Return a Mesh sharing the stored coords of the current.
+
+        The returned Mesh (or subclass) has the same stored coords and
+        deferred transformation (see :meth:`Geometry.deferred`) as the
+        current. If `elems` is specified, it replaces the current elems.
+        """
+        if elems is None:
+            elems = self.elems
+        M = self.__class__(self._coords,elems,prop=self.prop,eltype=self.elType())
+        M._trf = self.pendingTransform()
+        M._deferred = self._deferred
+        return M
+
+
     def setType(self,eltype=None):
         """Set the eltype from a character string.
 
@@ -331,6 +346,9 @@ class Mesh(Geometry):
                     elems.eltype = elementType(nplex=elems.nplex())
                 except:
                     raise ValueError,"I can not restore a Mesh without eltype"
+        if 'coords' in state:
+            state['_coords'] = state['coords']
+            del state['coords']
         self.__dict__.update(state)
 
 
@@ -907,6 +925,46 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
             return [ self ]
 
 
+    def partitionByGraph(self,nparts,level=None,ubfactor=1.03):
+        """Partition the Mesh in parts with a minimal interface.
+
+        The elements are divided over `nparts` parts with (nearly) equal
+        numbers of elements, while minimizing the number of connections
+        between elements of different parts. This is done with a
+        multilevel graph partitioner (see :mod:`graphpart`) on the element
+        adjacency graph.
+
+        Parameters:
+
+        - `nparts`: int: number of parts.
+        - `level`: hierarchy of the connection between elements (see
+          :meth:`adjacency`). The default is the level of the element
+          borders, i.e. faces for volume elements and edges for surface
+          elements.
+        - `ubfactor`: float: allowed imbalance factor of the parts.
+
+        Returns an int array with the part number of each element.
+        Parts are useful for parallel processing of a Mesh, or as domains
+        for a finite element solver.
+        """
+        from graphpart import partitionGraph
+        if level is None:
+            level = max(self.level()-1,0)
+        adj = self.adjacency(level)
+        return partitionGraph(self.nelems(),adj.pairs(),nparts,ubfactor=ubfactor)
+
+
+    def splitByGraph(self,nparts,level=None,compact=True,ubfactor=1.03):
+        """Split the Mesh into parts with a minimal interface.
+
+        Returns a list of `nparts` Meshes, obtained from
+        :meth:`partitionByGraph` with the given `level` and `ubfactor`.
+        By default, the Meshes are compacted.
+        """
+        p = self.partitionByGraph(nparts,level,ubfactor)
+        return [ self.select(p==i,compact=compact) for i in range(nparts) ]
+
+
     def largestByConnection(self,level=0):
         """Return the largest connected part of the Mesh.
 
@@ -1453,7 +1511,7 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
             else:
                 elsel = elsel[:,::-1]
             elems[sel] = elsel
-        return self.__class__(self.coords,elems,prop=self.prop,eltype=self.elType())
+        return self._deferred_copy(elems)
 
 
     def reflect(self,dir=0,pos=0.0,reverse=True,**kargs):
@@ -1598,9 +1656,13 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         Returns a Mesh where each element is replaced by a number of
         smaller elements of the same type.
 
+        A :class:`memory.BudgetError` is raised if the result would
+        exceed the memory budget.
+
         .. note:: This is currently only implemented for Meshes of type 'tri3'
           and 'quad4' and for the derived class 'TriSurface'.
         """
+        import memory
         elname = self.elName()
         try:
             mesh_wts = globals()[elname+'_wts']
@@ -1610,9 +1672,12 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
 
         wts = mesh_wts(*ndiv)
         els = mesh_els(*ndiv)
+        # the unfused points are created and copied several times
+        nbytes = self.nelems() * (4*wts.shape[0]*3*self.coords.dtype.itemsize + 2*els.nbytes)
+        memory.require('Mesh.subdivide',nbytes)
         X = self.coords[self.elems]
         U = dot(wts,X).transpose([1,0,2]).reshape(-1,3)
-        e = concatenate([els+i*wts.shape[0] for i in range(self.nelems())])
+        e = (els + arange(self.nelems()).reshape(-1,1,1)*wts.shape[0]).reshape(-1,els.shape[1])
         M = self.__class__(U,e,eltype=self.elType())
         if kargs.get('fuse',True):
             M = M.fuse()
@@ -1756,6 +1821,14 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
           Mesh connectivity.
         - 'random': the nodes are numbered randomly.
         - 'front': the nodes are numbered in order of their frontwalk.
+        - 'rcm': the nodes are numbered in reverse Cuthill-McKee order.
+          This minimizes the bandwidth and profile of the finite element
+          matrices (see :meth:`bandwidth`).
+        - 'morton', 'hilbert': the nodes are numbered along a space filling
+          curve through their coordinates. This keeps nodes that are
+          close in space mostly close in the numbering.
+
+        Unused nodes are kept, unless order is 'elems'.
         """
         if order == 'elems':
             order = renumberIndex(self.elems)
@@ -1766,10 +1839,28 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
             adj = self.elems.adjacency('n')
             p = adj.frontWalk()
             order = p.argsort()
+        elif order == 'rcm':
+            adj = self.elems.adjacency('n')
+            if adj.shape[0] < self.ncoords():
+                # Add the unused nodes
+                adj = concatenate([adj,-ones((self.ncoords()-adj.shape[0],adj.shape[1]),dtype=adj.dtype)])
+                adj = Adjacency(adj,normalize=False)
+            order = adj.cuthillMcKee()
+        elif order in ['morton','hilbert']:
+            order = self.coords.spaceOrder(order)
         newnrs = inverseUniqueIndex(order)
         return self.__class__(self.coords[order],newnrs[self.elems],prop=self.prop,eltype=self.elType())
 
 
+    def bandwidth(self):
+        """Return the bandwidth and profile of the node numbering.
+
+        See :meth:`Connectivity.bandwidth`. Renumbering the nodes with
+        ``renumber('rcm')`` will usually reduce both values.
+        """
+        return self.elems.bandwidth()
+
+
     def reorder(self,order='nodes'):
         """Reorder the elements of a Mesh.
 
@@ -1782,12 +1873,17 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
           - 'nodes': order the elements in increasing node number order.
           - 'random': number the elements in a random order.
           - 'reverse': number the elements in reverse order.
+          - 'rcm': reverse Cuthill-McKee order of the element adjacency.
+          - 'morton', 'hilbert': order the elements along a space filling
+            curve through their centroids.
 
         Returns a Mesh equivalent with self but with the elements ordered as
         specified.
 
         See also: :meth:`Connectivity.reorder`
         """
+        if isinstance(order,basestring) and order in ['morton','hilbert']:
+            order = self.centroids().spaceOrder(order)
         order = self.elems.reorder(order)
         if self.prop is None:
             prop = None
@@ -1977,7 +2073,101 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         return self.connect(seq,eltype=eltype)
 
 
-    def smooth(self, iterations=1, lamb=0.5, k=0.1, edg=True, exclnod=[], exclelem=[],weight=None):
+    def sweepChunks(self,path,chunksize=100,eltype=None,**kargs):
+        """Sweep a mesh along a path, yielding the extrusion in chunks.
+
+        This is a generator version of :meth:`sweep`. Instead of
+        returning a single Mesh, it yields consecutive Meshes, each
+        covering (at most) `chunksize` segments of the path.
+        Only the cross sections of the current chunk are kept in memory.
+
+        Two consecutive chunks share the cross section at their seam:
+        the last node plane of a chunk is the exact same Coords as the
+        first node plane of the next one. Concatenating the chunks and
+        fusing the nodes therefore restores the Mesh returned by
+        :meth:`sweep`. Other arguments are like in :meth:`sweep`.
+        """
+        if chunksize < 1:
+            raise ValueError,"chunksize should be at least 1"
+        seq = []
+        for x in iterSweepCoords(self.coords,path,**kargs):
+            seq.append(x)
+            if len(seq) > chunksize:
+                yield self.connect(seq,eltype=eltype)
+                seq = seq[-1:]
+        if len(seq) > 1:
+            yield self.connect(seq,eltype=eltype)
+
+
+    def sweepToFile(self,fil,path,name=None,sep=None,chunksize=100,**kargs):
+        """Sweep a mesh along a path, writing the result to a geometry file.
+
+        This produces the same Mesh as :meth:`sweep` (without `eltype`
+        conversion), but writes it directly to a pyFormex geometry file,
+        without ever constructing the full Mesh in memory.
+        The nodes at the seams between chunks are shared, so the
+        file contains a single Mesh with the same numbering as the
+        result of :meth:`sweep`.
+
+        - `fil`: a :class:`geomfile.GeometryFile` opened for writing,
+          or a file name. In the latter case, a new file is created
+          and closed after writing.
+        - `path`: the sweep path, as in :meth:`sweep`.
+        - `name`: optional name of the object in the file.
+        - `sep`: separator for the data block, as in
+          :meth:`geomfile.GeometryFile.write`.
+        - `chunksize`: number of path points swept at a time.
+
+        Other arguments are passed to :func:`coords.iterSweepCoords`.
+        Returns the number of nodes and elements written.
+        """
+        from geomfile import GeometryFile
+        if chunksize < 1:
+            raise ValueError,"chunksize should be at least 1"
+        npts = path.coords.shape[0]
+        if npts < 2:
+            raise ValueError,"The path should have at least 2 points"
+        nnod = self.ncoords()
+        e = extrudeConnectivity(self.elems,nnod,1)
+        ncoords = npts*nnod
+        nelems = (npts-1)*e.shape[0]
+        eltype = self.elType().extruded[1][0].name()
+
+        def coords():
+            seq = iterSweepCoords(self.coords,path,**kargs)
+            while True:
+                x = [ c.reshape(-1,3) for i,c in zip(range(chunksize),seq) ]
+                if not x:
+                    break
+                yield concatenate(x).astype(Float)
+
+        def elems():
+            for i in range(0,npts-1,chunksize):
+                n = min(chunksize,npts-1-i)
+                yield concatenate([ e+(i+k)*nnod for k in range(n) ])
+
+        def props():
+            p = resize(self.prop,(e.shape[0],))
+            for i in range(0,npts-1,chunksize):
+                yield resize(p,(min(chunksize,npts-1-i)*e.shape[0],))
+
+        if self.prop is None:
+            prop = None
+        else:
+            prop = props()
+
+        isname = type(fil) is str
+        if isname:
+            fil = GeometryFile(fil,'w')
+        try:
+            fil.writeMeshChunks(ncoords,nelems,e.shape[1],eltype,coords(),elems(),prop,name=name,sep=sep)
+        finally:
+            if isname:
+                fil.close()
+        return ncoords,nelems
+
+
+    def smooth(self, iterations=1, lamb=0.5, k=0.1, edg=True, exclnod=[], exclelem=[],weight=None,method='lowpass',alpha=0.,beta=0.2):
         """Return a smoothed mesh.
 
         Smoothing algorithm based on lowpass filters.
@@ -1999,7 +2189,16 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
           The nodes of these elements will not take part to the smoothing.
           If exclnod and exclelem are used at the same time the union of them
           will be exluded from smoothing.
+
+        - `weight`: the weights of the neighbours of a node: None (uniform),
+          'inversedistance', 'distance' or 'cotangent' (only for triangle
+          meshes). See :func:`smoothing.edgeWeights`.
+
+        - `method`: 'lowpass' (Taubin's lambda/mu filter) or 'laplace'
+          (Laplacian smoothing with HC shrinkage compensation, using
+          `lamb`, `alpha` and `beta`). See :class:`smoothing.Laplacian`.
         """
+        from smoothing import Laplacian,edgeWeights
         if iterations < 1:
             return self
 
@@ -2007,9 +2206,6 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
             raise ValueError,"Cannot assign values of lamb and k which result in lamb*k==1"
 
         mu = -lamb/(1-k*lamb)
-        adj = self.getEdges().adjacency(kind='n')
-        incl = resize(True, self.ncoords())
-
         if exclnod == 'border':
             exclnod = unique(self.getBorder())
             k = 0. #k can be zero because it cannot shrink
@@ -2019,37 +2215,23 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         exclelemnod = unique(self.elems[exclelem])
         exclude=array(unique(concatenate([exclnod, exclelemnod])), dtype = int)
 
-        incl[exclude] = False
-
+        border = None
         if edg:
-            externals = resize(False,self.ncoords())
             expoints = unique(self.getFreeEntities())
             if len(expoints) != self.ncoords():
-                externals[expoints] = True
-                a = adj[externals].ravel()
-                inpoints = delete(range(self.ncoords()), expoints)
-                for i in range(len(a)):
-                    if a[i] in inpoints:
-                        a[i]=-2
-                adj[externals] = a.reshape(adj[externals].shape)
+                border = zeros(self.ncoords(),dtype=bool)
+                border[expoints] = True
             else:
                 message('Failed to recognize external points.\nShrinkage may be considerable.')
-        w = ones(adj.shape,dtype=float)
-
-        if weight == 'inversedistance':
-            dist = length(self.coords[adj]-self.coords.reshape(-1,1,3))
-            w[dist!=0] /= dist[dist!=0]
-
-        if weight == 'distance':
-            w = length(self.coords[adj]-self.coords.reshape(-1,1,3))
-
-        w[adj<0] = 0.
-        w /= w.sum(-1).reshape(-1,1)
-        w = w.reshape(adj.shape[0],adj.shape[1],1)
-        c = self.coords.copy()
-        for i in range(iterations):
-            c[incl] = (1.-lamb)*c[incl] + lamb*(w[incl]*c[adj][incl]).sum(1)
-            c[incl] = (1.-mu)*c[incl] + mu*(w[incl]*c[adj][incl]).sum(1)
+
+        edges = self.getEdges()
+        elems = self.elems if self.elName() == 'tri3' else None
+        w = edgeWeights(self.coords,edges,weight,elems)
+        L = Laplacian(edges,self.ncoords(),w,border=border,fixed=exclude)
+        if method == 'laplace':
+            c = L.hc(self.coords,iterations,lamb,alpha,beta)
+        else:
+            c = L.lowpass(self.coords,iterations,lamb,mu)
         return self.__class__(c, self.elems, prop=self.prop, eltype=self.elType())
 
 
@@ -2086,12 +2268,6 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
 
           Mesh.concatenate([mesh0,mesh1,mesh2])
         """
-        def _force_prop(m):
-            if m.prop is None:
-                return zeros(m.nelems(),dtype=Int)
-            else:
-                return m.prop
-
         meshes = [ m for m in meshes if m.nplex() > 0 ]
         nplex = set([ m.nplex() for m in meshes ])
         if len(nplex) > 1:
@@ -2100,18 +2276,10 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         if len(eltype) > 1:
             raise ValueError,"Cannot concatenate meshes with different eltype: %s" % [ m.elName() for m in meshes ]
 
-        # Keep the available props
-        prop = [m.prop for m in meshes if m.prop is not None]
-        if len(prop) == 0:
-            prop = None
-        elif len(prop) < len(meshes):
-            prop = concatenate([_force_prop(m) for m in meshes])
-        else:
-            prop = concatenate(prop)
-
-        coords,elems = mergeMeshes(meshes,**kargs)
-        elems = concatenate(elems,axis=0)
-        return clas(coords,elems,prop=prop,eltype=eltype.pop())
+        B = MeshBuilder(clas=clas)
+        for m in meshes:
+            B.add(m)
+        return B.mesh(**kargs)
 
 
     # Test and clipping functions
@@ -2214,7 +2382,7 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         return self.clip(self.test(nodes=nodes,dir=n,min=p))
 
 
-    def levelVolumes(self):
+    def levelVolumes(self,nproc=None,blocksize=None):
         """Return the level volumes of all elements in a Mesh.
 
         The level volume of an element is defined as:
@@ -2236,8 +2404,13 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
 
         Note that for level-3 Meshes, negative volumes will be returned
         for elements having a reversed node ordering.
+
+        `nproc` and `blocksize` can be specified to compute the volumes
+        block-wise, possibly in parallel. This avoids creating the full
+        coordinate array of the elements. See :func:`multi.blockwise`.
         """
         from geomtools import levelVolumes
+        import multi
 
         base_elem = {
             1:'line2',
@@ -2259,13 +2432,13 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
             except:
                 return None
 
-        V = levelVolumes(M.coords[M.elems])
+        V = multi.blockwise(lambda e,x: levelVolumes(x[e]),M.elems,(M.coords,),nproc,blocksize)
         if V is not None and M != self:
-            V = array([ V[where(M.prop==i)[0]].sum() for i in arange(self.nelems()) ])
+            V = bincount(M.prop,weights=V,minlength=self.nelems()).astype(V.dtype)
 
         return V
 
-    def lengths(self):
+    def lengths(self,nproc=None,blocksize=None):
         """Return the length of all elements in a level-1 Mesh.
 
         For a Mesh with eltype 'line2', the lengths are exact. For other
@@ -2276,14 +2449,16 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         If succesful, returns an (nelems,) float array with the lengths.
         Returns None if the Mesh level is not 1, or the conversion to 'line2'
         does not succeed.
+
+        `nproc` and `blocksize` are passed to :meth:`levelVolumes`.
         """
         if self.level() == 1:
-            return self.levelVolumes()
+            return self.levelVolumes(nproc,blocksize)
         else:
             return None
 
 
-    def areas(self):
+    def areas(self,nproc=None,blocksize=None):
         """Return the area of all elements in a level-2 Mesh.
 
         For a Mesh with eltype 'tri3', the areas are exact. For other
@@ -2294,14 +2469,16 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         If succesful, returns an (nelems,) float array with the areas.
         Returns None if the Mesh level is not 2, or the conversion to 'tri3'
         does not succeed.
+
+        `nproc` and `blocksize` are passed to :meth:`levelVolumes`.
         """
         if self.level() == 2:
-            return self.levelVolumes()
+            return self.levelVolumes(nproc,blocksize)
         else:
             return None
 
 
-    def volumes(self):
+    def volumes(self,nproc=None,blocksize=None):
         """Return the signed volume of all the mesh elements
 
         For a 'tet4' tetraeder Mesh, the volume of the elements is calculated
@@ -2314,9 +2491,11 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
         number of elements.
         If the Mesh conversion to tetraeder does not succeed, the return
         value is None.
+
+        `nproc` and `blocksize` are passed to :meth:`levelVolumes`.
         """
         if self.level() == 3:
-            return self.levelVolumes()
+            return self.levelVolumes(nproc,blocksize)
         else:
             return None
 
@@ -2435,6 +2614,113 @@ Mesh: %s nodes, %s elems, plexitude %s, ndim %s, eltype: %s
     ##     extremeAngles= [ (eangMax-qe)/(180.-qe), (qe-eangmin)/qe ]
     ##     return array(extremeAngles).max(axis=0)
 
+
+class MeshBuilder(object):
+    """Accumulate Meshes to build a single Mesh.
+
+    A MeshBuilder collects the nodes, elements and property numbers of
+    many Meshes in buffers that grow by doubling their size. The node
+    numbers of the added elements are offset on the fly to refer to the
+    accumulated nodes. Building a Mesh from n parts thus takes a time
+    linear in the total size, while a loop doing ``M = M + N`` merges all
+    the previous nodes at every step. Coincident nodes are only fused once,
+    when the final Mesh is created.
+
+    Parameters:
+
+    - `eltype`: the element type of the resulting Mesh. If not specified,
+      it is set from the first nonempty Mesh that is added. All added
+      Meshes should have this element type.
+    - `clas`: the class of the resulting Mesh. If not specified, it is the
+      class of the first nonempty Mesh that is added.
+
+    If any of the added Meshes has property numbers, the resulting Mesh will
+    have properties, and the Meshes without properties get property 0.
+
+    Example:
+
+    >>> B = MeshBuilder()
+    >>> for i in range(3):
+    ...     B += Mesh(eltype='quad4').trl(0,float(i))
+    >>> M = B.mesh()
+    >>> print(M.ncoords(),M.nelems())
+    8 3
+    >>> print(M.elems)
+    [[0 2 3 1]
+     [2 4 5 3]
+     [4 6 7 5]]
+    """
+
+    def __init__(self,eltype=None,clas=None):
+        """Create a new empty MeshBuilder."""
+        self.eltype = eltype
+        self.clas = clas
+        self.ncoords = self.nelems = 0
+        self.coords = self.elems = self.prop = None
+
+
+    def add(self,M,prop=None):
+        """Add the nodes and elements of a Mesh.
+
+        - `M`: a Mesh. Meshes with plexitude 0 are ignored.
+        - `prop`: property numbers for the elements. The default is to use
+          the property numbers of `M`, if any.
+
+        Returns the builder itself, so that calls can be chained. A
+        MeshBuilder `B` can also be extended with ``B += M``.
+        """
+        if M.nplex() == 0:
+            return self
+        if prop is None:
+            prop = M.prop
+        if self.eltype is None:
+            self.eltype = M.elType()
+        elif M.elType() != self.eltype:
+            raise ValueError,"Can not add a Mesh of type %s to a MeshBuilder of type %s" % (M.elName(),self.eltype.name())
+        if self.clas is None:
+            self.clas = M.__class__
+        if self.coords is None:
+            self.coords = zeros((0,3),dtype=Float)
+            self.elems = zeros((0,M.nplex()),dtype=Int)
+        nc,ne = self.ncoords+M.ncoords(),self.nelems+M.nelems()
+        self.coords = growBuffer(self.coords,self.ncoords,nc)
+        self.coords[self.ncoords:nc] = M.coords
+        self.elems = growBuffer(self.elems,self.nelems,ne)
+        self.elems[self.nelems:ne] = M.elems + self.ncoords
+        if prop is not None or self.prop is not None:
+            if self.prop is None:
+                self.prop = zeros(self.elems.shape[:1],dtype=Int)
+            self.prop = growBuffer(self.prop,self.nelems,self.elems.shape[0])
+            if prop is None:
+                self.prop[self.nelems:ne] = 0
+            else:
+                self.prop[self.nelems:ne] = resize(asarray(prop,dtype=Int),(M.nelems(),))
+        self.ncoords,self.nelems = nc,ne
+        return self
+
+    __iadd__ = add
+
+
+    def mesh(self,fuse=True,**kargs):
+        """Return the Mesh with all the added nodes and elements.
+
+        - `fuse`: bool: if True (default), coincident (or very close) nodes
+          are fused to a single node.
+        - `**kargs`: keyword arguments that are passed to
+          :meth:`Coords.fuse`.
+        """
+        clas = Mesh if self.clas is None else self.clas
+        if self.coords is None:
+            return clas()
+        coords = Coords(self.coords[:self.ncoords])
+        elems = self.elems[:self.nelems]
+        if fuse:
+            coords,index = coords.fuse(**kargs)
+            elems = index[elems]
+        prop = None if self.prop is None else self.prop[:self.nelems]
+        return clas(coords,elems,prop=prop,eltype=self.eltype)
+
+
 ######################## Functions #####################
 
 # BV: THESE SHOULD GO TO connectivity MODULE
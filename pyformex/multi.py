@@ -28,49 +28,400 @@
 This module contains some functions to perform multiprocessing inside
 pyFormex in a unified way.
 
+The tasks are executed by a pool of worker processes, which is created
+on first use and then kept alive for the rest of the session, so that
+the cost of starting the processes is only paid once. The size of the
+pool is set by the configuration variable 'multi/nproc'.
+
+Large numpy arrays passed to or returned from the tasks are not pickled
+through the pipes connecting the processes, but transported through
+memory mapped files (see :class:`SharedArray`).
 """
 from __future__ import print_function
 
 import pyformex as pf
 from arraytools import splitar
-from multiprocessing import Pool,cpu_count
+from multiprocessing import Pool,Process,Queue,cpu_count
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import os,tempfile,traceback,atexit
+
+
+class TaskError(RuntimeError):
+    """Exception raised when a task failed in a subprocess.
+
+    The message contains the traceback from the subprocess.
+    """
+    pass
+
+
+########################## Shared arrays ###########################
+
+def sharedDir():
+    """Return the directory for the files of shared arrays.
+
+    This is /dev/shm if it exists (so that the files live in memory),
+    else the default directory for temporary files.
+    """
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class SharedArray(object):
+    """A numpy array shared between processes.
+
+    The data of a SharedArray are stored in a memory mapped file.
+    Only the file name, shape and dtype are pickled when a SharedArray
+    is passed to another process, and all the processes access the same
+    data. This makes SharedArrays suited both for passing large input
+    arrays to subprocesses and for collecting their results.
+
+    Parameters:
+
+    - `shape`: tuple: the shape of the array.
+    - `dtype`: the data type of the array.
+    - `filename`: name of an existing file holding the data. The default
+      creates a new (zero filled) file in :func:`sharedDir`.
+
+    Use :func:`shareArray` to create a SharedArray holding a copy of an
+    existing array. The file is not removed automatically: use
+    :meth:`unlink` when the data are no longer needed in other processes.
+    """
+
+    def __init__(self,shape,dtype,filename=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        if filename is None:
+            fd,filename = tempfile.mkstemp(prefix='pyformex-',dir=sharedDir())
+            os.close(fd)
+            if self.size() > 0:
+                np.memmap(filename,self.dtype,'w+',shape=self.shape).flush()
+        self.filename = filename
+        self._array = None
+
+
+    def size(self):
+        """Return the number of items in the array."""
+        return int(np.prod(self.shape))
+
+
+    def array(self):
+        """Return the shared data as a numpy array.
+
+        Changes to the array are seen by all processes sharing it.
+        """
+        if self._array is None:
+            if self.size() > 0:
+                mm = np.memmap(self.filename,self.dtype,'r+',shape=self.shape)
+                self._array = np.asarray(mm)
+            else:
+                self._array = np.zeros(self.shape,dtype=self.dtype)
+        return self._array
+
+
+    def unlink(self):
+        """Remove the file holding the data.
+
+        Processes that already accessed the :meth:`array` can continue to
+        use it, but it can no longer be accessed by other processes.
+        """
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+    def __getstate__(self):
+        """Only pickle the file name, shape and dtype."""
+        d = self.__dict__.copy()
+        d['_array'] = None
+        return d
+
+
+def shareArray(a):
+    """Return a SharedArray holding a copy of an array."""
+    a = np.asarray(a)
+    S = SharedArray(a.shape,a.dtype)
+    S.array()[...] = a
+    return S
+
+
+def _shareSize():
+    """Return the minimal size in bytes of arrays passed as SharedArray."""
+    return pf.cfg.get('multi/sharesize',1<<20)
+
+
+def _share(a,minsize,transient=False):
+    """Return a SharedArray copy of a if it is a large array.
+
+    If transient is True, the SharedArray is removed by the first
+    process calling :func:`_unshare` on it.
+    """
+    if isinstance(a,np.ndarray) and not a.dtype.hasobject and a.nbytes >= minsize:
+        S = shareArray(a)
+        S.transient = transient
+        return S
+    return a
+
+
+def _unshare(a):
+    """Return the array of a SharedArray, removing it if it was transient."""
+    if isinstance(a,SharedArray):
+        x = a.array()
+        if getattr(a,'transient',False):
+            a.unlink()
+        return x
+    return a
+
+
+########################## Worker pool ###########################
+
+_pool = None
+_pool_size = 0
+
+
+def defaultProcs():
+    """Return the default number of worker processes.
+
+    This is the configuration variable 'multi/nproc', or the number of
+    processors if that is not set or <= 0.
+    """
+    nproc = pf.cfg.get('multi/nproc',0)
+    if not nproc or nproc < 1:
+        nproc = cpu_count()
+    return nproc
+
+
+def pool(nproc=-1):
+    """Return the pool of worker processes.
+
+    The pool is created on first use, and reused in later calls, unless
+    a different number of processes is requested. The default number
+    of processes is given by :func:`defaultProcs`.
+    """
+    global _pool,_pool_size
+    if nproc < 1:
+        nproc = defaultProcs()
+    if _pool is not None and _pool_size != nproc:
+        closePool()
+    if _pool is None:
+        pf.debug("Starting a pool of %s worker processes" % nproc,pf.DEBUG.MULTI)
+        _pool = Pool(nproc)
+        _pool_size = nproc
+    return _pool
+
+
+def closePool():
+    """Stop the pool of worker processes.
+
+    A new pool will be started on the next call of :func:`pool`.
+    This is called automatically at exit.
+    """
+    global _pool,_pool_size
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+        _pool_size = 0
+
+atexit.register(closePool)
 
 
 def dofunc(arg):
     """Helper function for the multitask function.
 
-    It expects a tuple with (function,args) as single argument.
+    It expects a tuple with (function,args,minsize) as single argument.
+    Shared array arguments are converted to numpy arrays, and large
+    array results are returned as a SharedArray.
+    If the function raises an exception, the formatted traceback is
+    returned as a :class:`TaskError`.
     """
-    func,args = arg
-    return func(*args)
+    func,args,minsize = arg
+    try:
+        res = func(*[ _unshare(a) for a in args ])
+        if isinstance(res,tuple):
+            res = tuple([ _share(r,minsize,True) for r in res ])
+        else:
+            res = _share(res,minsize,True)
+        return res
+    except Exception:
+        return TaskError(traceback.format_exc())
 
 
-def multitask(tasks,nproc=-1):
+def multitask(tasks,nproc=-1,chunksize=1):
     """Perform tasks in parallel.
 
-    Runs a number of tasks in parallel over a number of subprocesses.
+    Runs a number of tasks in parallel over the pool of worker processes.
 
     Parameters:
 
     - `tasks` : a list of (function,args) tuples, where function is a
       callable and args is a tuple with the arguments to be passed to the
       function.
-    - ` nproc`: the number of subprocesses to be started. This may be
-      different from the number of tasks to run: processes finishing a
-      task will pick up a next one. There is no benefit in starting more
-      processes than the number of tasks or the number of processing units
-      available. The default will set `nproc` to the minimum of these two
-      values.
+    - ` nproc`: the number of worker processes to use. Processes finishing
+      a task will pick up a next one. The default uses the pool with
+      :func:`defaultProcs` processes. If `nproc` is 1, the tasks are
+      executed sequentially in the current process.
+    - `chunksize`: the number of tasks sent to a worker at once.
+
+    Numpy arrays arguments and results (or items of a tuple of results)
+    having at least 'multi/sharesize' bytes are transported through shared
+    memory. An array that is passed to multiple tasks is only copied once.
+
+    Returns a list with the results of the tasks, in order.
+    If any of the tasks raises an exception, a :class:`TaskError` is
+    raised, with the traceback from the subprocess.
     """
-    if nproc < 0:
-        nproc = min(len(tasks),cpu_count())
+    if nproc < 1:
+        nproc = defaultProcs()
+    if nproc == 1 or len(tasks) <= 1:
+        return [ func(*args) for func,args in tasks ]
 
     pf.debug("Multiprocessing using %s processors" % nproc,pf.DEBUG.MULTI)
-    pool = Pool(nproc)
-    res = pool.map(dofunc,tasks)
+    minsize = _shareSize()
+    shared = {}
+    def share(a):
+        if id(a) not in shared:
+            shared[id(a)] = _share(a,minsize)
+        return shared[id(a)]
+    try:
+        tasks = [ (func,tuple([share(a) for a in args]),minsize) for func,args in tasks ]
+        res = pool(nproc).map(dofunc,tasks,chunksize)
+    finally:
+        for a in shared.values():
+            if isinstance(a,SharedArray):
+                a.unlink()
+
+    res = [ tuple([ _unshare(ri) for ri in r ]) if isinstance(r,tuple) else _unshare(r) for r in res ]
+    for r in res:
+        if isinstance(r,TaskError):
+            raise TaskError,"A task failed in a subprocess:\n%s" % r
     return res
 
 
+def multimap(func,seq,nproc=-1,chunksize=None):
+    """Apply a function to all items of a sequence in parallel.
+
+    This is the parallel equivalent of ``map(func,seq)``: it returns a list
+    with the results of `func(item)` for all the items in `seq`.
+    The items are sent to the workers in chunks of `chunksize` items.
+    The default chunksize divides the items in about four chunks per
+    process. Other parameters are like in :func:`multitask`.
+    """
+    if nproc < 1:
+        nproc = defaultProcs()
+    if chunksize is None:
+        chunksize = max(1,len(seq) // (4*nproc))
+    return multitask([ (func,(item,)) for item in seq ],nproc,chunksize)
+
+
+########################## Block-wise execution ###########################
+
+_threadpool = None
+_threadpool_size = 0
+
+# Minimal number of rows in a block if the block size is not specified
+_minblock = 4096
+
+
+def threadPool(nproc=-1):
+    """Return the pool of worker threads.
+
+    This is like :func:`pool`, but returns a pool of threads in the
+    current process. Threads are suited for tasks spending most of their
+    time inside numpy functions that release the GIL.
+    """
+    global _threadpool,_threadpool_size
+    if nproc < 1:
+        nproc = defaultProcs()
+    if _threadpool is not None and _threadpool_size != nproc:
+        closeThreadPool()
+    if _threadpool is None:
+        _threadpool = ThreadPool(nproc)
+        _threadpool_size = nproc
+    return _threadpool
+
+
+def closeThreadPool():
+    """Stop the pool of worker threads."""
+    global _threadpool,_threadpool_size
+    if _threadpool is not None:
+        _threadpool.close()
+        _threadpool.join()
+        _threadpool = None
+        _threadpool_size = 0
+
+atexit.register(closeThreadPool)
+
+
+def blocking(nproc=None,blocksize=None):
+    """Check whether block-wise execution is requested.
+
+    Returns True if `blocksize` is nonzero or `nproc` is specified and
+    not equal to 1. If `blocksize` is None, the configuration variable
+    'multi/blocksize' is used.
+    """
+    if blocksize is None:
+        blocksize = pf.cfg.get('multi/blocksize',0)
+    return bool(blocksize) or (nproc is not None and nproc != 1)
+
+
+def blockwise(func,a,args=(),nproc=None,blocksize=None):
+    """Apply a row-wise function to an array in blocks.
+
+    Computes ``func(a,*args)``, where `func` is a function that operates
+    independently on every row of the array `a` (the items along its
+    first axis). The array is split in blocks of rows, which are processed
+    by :func:`threadPool`, and the results are concatenated.
+    Besides using multiple processors, this also limits the size of the
+    temporary arrays created by `func`.
+
+    Parameters:
+
+    - `func`: a function taking an array as first argument and returning
+      an array or a tuple of arrays with the same length as the input.
+    - `a`: the array to be split in blocks of rows.
+    - `args`: a tuple of extra arguments to be passed to `func`.
+    - `nproc`: the number of threads to use. If 1, the blocks are
+      processed sequentially. If < 1, the default :func:`defaultProcs`
+      is used. If None, this default is used if `blocksize` is nonzero,
+      else block-wise execution is not done.
+    - `blocksize`: the maximum number of rows in a block. If None, the
+      configuration variable 'multi/blocksize' is used. If zero, the array
+      is divided in four blocks per thread.
+
+    If neither `nproc` nor `blocksize` request block-wise execution
+    (see :func:`blocking`), this simply returns ``func(a,*args)``.
+
+    Example:
+
+      >>> a = np.arange(10.).reshape(5,2)
+      >>> print(blockwise(np.sum,a,(-1,),nproc=2,blocksize=2))
+      [  1.   5.   9.  13.  17.]
+    """
+    if blocksize is None:
+        blocksize = pf.cfg.get('multi/blocksize',0)
+    if not blocking(nproc,blocksize):
+        return func(a,*args)
+    if nproc is None or nproc < 1:
+        nproc = defaultProcs()
+    n = len(a)
+    if not blocksize:
+        blocksize = max(_minblock,-(-n // (4*nproc)))
+    if n <= blocksize:
+        return func(a,*args)
+
+    blocks = [ a[i:i+blocksize] for i in range(0,n,blocksize) ]
+    if nproc == 1:
+        res = [ func(b,*args) for b in blocks ]
+    else:
+        res = threadPool(nproc).map(lambda b: func(b,*args),blocks)
+    if isinstance(res[0],tuple):
+        return tuple([ np.concatenate(r) for r in zip(*res) ])
+    else:
+        return np.concatenate(res)
+
+
 ### Following is an alternative using Queues
 
 def worker(input, output):
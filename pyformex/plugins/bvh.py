@@ -0,0 +1,166 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+#
+#
+"""Bounding volume hierarchies.
+
+This module defines a bounding volume hierarchy of axis aligned boxes.
+It can be used to quickly find the pairs of items with overlapping
+bounding boxes in two large sets of geometric items, such as the
+candidate pairs of intersecting triangles of two surfaces.
+"""
+from __future__ import print_function
+
+from arraytools import *
+
+
+class BVH(object):
+    """A bounding volume hierarchy of axis aligned boxes.
+
+    The hierarchy is a complete binary tree. At each level, the items
+    of a node are sorted along the longest direction of the bounding box
+    of their centers, and split in two halves. The nodes are not
+    stored explicitely: at level `l`, node `k` holds the items
+    ``order[start:end]``, with start and end given by :meth:`starts`.
+
+    Parameters:
+
+    - `bmin`: (nitems,3) float array: lower corners of the item boxes.
+    - `bmax`: (nitems,3) float array: upper corners of the item boxes.
+    - `leafsize`: int: maximum number of items in a leaf node.
+
+    Example:
+
+      >>> B = BVH([[0.,0.,0.],[2.,0.,0.]],[[1.,1.,1.],[3.,1.,1.]])
+      >>> C = BVH([[0.5,0.5,0.5]],[[2.5,0.6,0.6]])
+      >>> print(B.overlap(C))
+      (array([0, 1]), array([0, 0]))
+    """
+
+    def __init__(self,bmin,bmax,leafsize=4):
+        """Create the hierarchy."""
+        self.bmin = bmin = asarray(bmin,dtype=float64).reshape(-1,3)
+        self.bmax = bmax = asarray(bmax,dtype=float64).reshape(-1,3)
+        self.n = n = bmin.shape[0]
+        nlevels = 1
+        while n > leafsize * 2**(nlevels-1):
+            nlevels += 1
+        self.nlevels = nlevels
+
+        ctr = 0.5 * (bmin+bmax)
+        order = arange(n)
+        for l in range(nlevels-1):
+            start = self.starts(l)
+            node = repeat(arange(start.shape[0]-1),start[1:]-start[:-1])
+            c = ctr[order]
+            lo = minimum.reduceat(c,start[:-1])
+            hi = maximum.reduceat(c,start[:-1])
+            size = hi-lo
+            axis = size.argmax(axis=-1)
+            ext = size[arange(axis.size),axis]
+            ext[ext == 0.] = 1.
+            # Sort on the node number plus the relative position in the node
+            key = (c[arange(n),axis[node]] - lo[node,axis[node]]) / ext[node]
+            order = order[(node + 0.5*key).argsort(kind='mergesort')]
+        self.order = order
+
+        bmin,bmax = bmin[order],bmax[order]
+        self.lo = []
+        self.hi = []
+        for l in range(nlevels):
+            start = self.starts(l)[:-1]
+            self.lo.append(minimum.reduceat(bmin,start))
+            self.hi.append(maximum.reduceat(bmax,start))
+
+
+    def starts(self,level):
+        """Return the start positions of the nodes at the given level.
+
+        Returns an int array with length 2**level + 1. Node `k` holds
+        the items ``order[start[k]:start[k+1]]``.
+        """
+        nodes = 2**level
+        return (arange(nodes+1) * self.n) // nodes
+
+
+    def overlap(self,other,atol=0.):
+        """Find the pairs of overlapping boxes of two hierarchies.
+
+        - `other`: another BVH.
+        - `atol`: float: boxes are considered overlapping if their
+          distance is not larger than this value.
+
+        Returns a tuple of two int arrays (i,j) with the numbers of the
+        items in self and other whose boxes overlap.
+        """
+        la = lb = 0
+        ia = ib = zeros(1,dtype=Int)
+        if self.n == 0 or other.n == 0:
+            return ia[:0],ib[:0]
+        while True:
+            ok = ((self.lo[la][ia] <= other.hi[lb][ib]+atol) &
+                  (other.lo[lb][ib] <= self.hi[la][ia]+atol)).all(axis=-1)
+            ia,ib = ia[ok],ib[ok]
+            da = la < self.nlevels-1
+            db = lb < other.nlevels-1
+            if not (da or db) or ia.size == 0:
+                break
+            if da:
+                ia = concatenate([2*ia,2*ia+1])
+                ib = concatenate([ib,ib])
+                la += 1
+            if db:
+                ib = concatenate([2*ib,2*ib+1])
+                ia = concatenate([ia,ia])
+                lb += 1
+
+        # Expand the leaf pairs to item pairs
+        sa,sb = self.starts(la),other.starts(lb)
+        na = sa[ia+1] - sa[ia]
+        nb = sb[ib+1] - sb[ib]
+        npair = na*nb
+        p = repeat(arange(ia.size),npair)
+        loc = arange(npair.sum()) - repeat(cumsum(npair)-npair,npair)
+        i = self.order[sa[ia][p] + loc // nb[p]]
+        j = other.order[sb[ib][p] + loc % nb[p]]
+        ok = ((self.bmin[i] <= other.bmax[j]+atol) &
+              (other.bmin[j] <= self.bmax[i]+atol)).all(axis=-1)
+        i,j = i[ok],j[ok]
+        srt = lexsort((j,i))
+        return i[srt],j[srt]
+
+
+def elementBVH(x,leafsize=4):
+    """Create a BVH for the elements of a Formex-like coordinate array.
+
+    - `x`: (nelems,nplex,3) float array with the element coordinates.
+
+    Returns a :class:`BVH` over the bounding boxes of the elements.
+    """
+    x = asarray(x)
+    return BVH(x.min(axis=1),x.max(axis=1),leafsize)
+
+
+# End
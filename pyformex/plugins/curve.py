@@ -74,10 +74,25 @@ class Curve(Geometry):
 
     :sub_points_2:
     :sub_directions_2:
-
+    :sub_derivs_2(t,j,d): returns the d-th derivative at values,parts
+       given by zip(t,j)
+
+    These evaluate any number of (value,part) pairs in a single batch.
+    If a curve defines `sub_derivs_2`, the default `sub_points_2`,
+    `sub_directions_2` and `sub_curvature_2` methods are derived from it.
+    Such curves also automatically get the arc length methods :meth:`lengths`,
+    :meth:`cumLengths` and :meth:`atLength`. These integrate the length of
+    the first derivative with a vectorized adaptive Gauss-Legendre rule.
+    The integration is controlled by the class attributes `N_gauss`
+    (number of Gauss points per interval), `gauss_tol` (relative
+    tolerance per interval) and `gauss_maxlevel` (maximum number of
+    interval subdivisions).
     """
 
     N_approx = 10
+    N_gauss = 8
+    gauss_tol = 1.e-7
+    gauss_maxlevel = 12
 
     def __init__(self):
         Geometry.__init__(self)
@@ -118,7 +133,7 @@ class Curve(Geometry):
 
         t and j can both be arrays, but should have the same length.
         """
-        raise NotImplementedError
+        return self.sub_derivs_2(t,j,0)
 
     def sub_directions(self,t,j):
         """Return the directions at values t in part j
@@ -132,10 +147,144 @@ class Curve(Geometry):
 
         t and j can both be arrays, but should have the same length.
         """
+        return normalize(self.sub_derivs_2(t,j,1))
+
+    def sub_derivs_2(self,t,j,d=1):
+        """Return the d-th derivative at values,parts given by zip(t,j)
+
+        t and j can both be arrays, but should have the same length.
+        The derivatives are not normalized.
+        """
         raise NotImplementedError
 
+
+    def sub_curvature_2(self,t,j):
+        """Return the curvature at values,parts given by zip(t,j)
+
+        t and j can both be arrays, but should have the same length.
+        """
+        T1 = self.sub_derivs_2(t,j,1)
+        T2 = self.sub_derivs_2(t,j,2)
+        return length(cross(T1,T2)) / length(T1)**3
+
+
+    def _arcLengths(self,t0,t1,j):
+        """Return the arc lengths between parameter values t0 and t1 in part j.
+
+        t0, t1 and j are arrays of the same length (or scalars that will
+        be broadcast). The length of the first derivative is integrated
+        over all intervals at once, using a Gauss-Legendre rule with
+        `N_gauss` points. Each interval is compared with the sum over its
+        two halves, and only the intervals that do not meet the relative
+        tolerance `gauss_tol` are subdivided further.
+
+        The computation is done in double precision.
+        Returns an array with the arc lengths.
+        """
+        t0,t1,j = broadcast_arrays(asarray(t0,dtype=float64).ravel(),
+                                   asarray(t1,dtype=float64).ravel(),
+                                   asarray(j,dtype=Int).ravel())
+        n = len(j)
+        u,w = gaussLegendre(self.N_gauss)
+        u3 = concatenate([u,0.5*u,0.5+0.5*u])
+        L = zeros(n)
+        ind,a,b,j = arange(n),t0,t1,j
+        for level in range(self.gauss_maxlevel+1):
+            if len(ind) == 0:
+                break
+            h = b-a
+            t = a.reshape(-1,1) + h.reshape(-1,1) * u3
+            jt = repeat(j,len(u3))
+            v = length(self.sub_derivs_2(t.ravel(),jt)).reshape(-1,3,len(u))
+            I = dot(v,w) * h.reshape(-1,1)
+            coarse = I[:,0]
+            fine = 0.5 * (I[:,1]+I[:,2])
+            ok = abs(fine-coarse) <= self.gauss_tol * abs(fine)
+            if level == self.gauss_maxlevel:
+                ok[:] = True
+            L += bincount(ind[ok],weights=fine[ok],minlength=n)
+            nok = ~ok
+            m = 0.5*(a[nok]+b[nok])
+            ind = concatenate([ind[nok],ind[nok]])
+            a,b = concatenate([a[nok],m]),concatenate([m,b[nok]])
+            j = concatenate([j[nok],j[nok]])
+        return L
+
+
     def lengths(self):
-        raise NotImplementedError
+        """Return the length of the parts of the curve.
+
+        This is only available for curves that implement the
+        `sub_derivs_2` method, or override this method.
+        """
+        n = self.nparts
+        return self._arcLengths(zeros(n),ones(n),arange(n))
+
+
+    def cumLengths(self):
+        """Return the cumulative length of the curve at the part ends.
+
+        Returns an array with `nparts+1` values: the curve length from the
+        start of the curve up to the start of each part, and the total
+        length of the curve as last value.
+
+        The table is cached and reused as long as the coords of the curve
+        are not replaced.
+        """
+        cache = getattr(self,'_cumlengths',None)
+        if cache is None or cache[0] is not self.coords or len(cache[1]) != self.nparts+1:
+            L = concatenate([[0.],self.lengths().cumsum()])
+            self._cumlengths = (self.coords,L)
+        return self._cumlengths[1]
+
+
+    def atLength(self,div):
+        """Returns the parameter values at given relative curve length.
+
+        ``div`` is a list of relative curve lengths (from 0.0 to 1.0).
+        As a convenience, a single integer value may be specified,
+        in which case the relative curve lengths are found by dividing
+        the interval [0.0,1.0] in the specified number of subintervals.
+
+        The function returns a list with the parameter values for the points
+        at the specified relative lengths.
+
+        The part containing each point is found from the cached
+        :meth:`cumLengths` table. Inside the part, the parameter value is
+        found by a few Newton iterations on the arc length, computed for
+        all points at once.
+        """
+        cum = self.cumLengths()
+        if isInt(div):
+            div = arange(div+1) / float(div)
+        else:
+            div = asarray(div,dtype=float64).ravel()
+        s = div * cum[-1]
+        j = (cum.searchsorted(s,side='right')-1).clip(0,self.nparts-1)
+        s -= cum[j]
+        L = cum[j+1] - cum[j]
+        t = (s / where(L>0.,L,1.)).clip(0.,1.)
+        tol = self.gauss_tol * cum[-1]
+        for it in range(20):
+            f = self._arcLengths(0.,t,j) - s
+            if abs(f).max() <= tol:
+                break
+            d = length(self.sub_derivs_2(t,j))
+            t = (t - f / where(d>0.,d,1.)).clip(0.,1.)
+        return j + t
+
+
+    def _partParams(self,t):
+        """Split parameter values t into local values and part numbers.
+
+        Returns a tuple of two arrays: the local parameter values and
+        the part numbers.
+        """
+        # Do not use asarray here! We change it, so need a copy!
+        t = array(t,dtype=float64).ravel()
+        ti = floor(t).clip(min=0,max=self.nparts-1)
+        t -= ti
+        return t,ti.astype(Int)
 
 
     def pointsAt(self,t):
@@ -145,14 +294,10 @@ class Curve(Geometry):
         is interpreted as the curve segment number, and the decimal part
         goes from 0 to 1 over the segment.
         """
-        # Do not use asarray here! We change it, so need a copy!
-        t = array(t).ravel()
-        ti = floor(t).clip(min=0,max=self.nparts-1)
-        t -= ti
-        i = ti.astype(Int)
+        t,i = self._partParams(t)
         try:
             allX = self.sub_points_2(t,i)
-        except:
+        except NotImplementedError:
             allX = concatenate([ self.sub_points(tj,ij) for tj,ij in zip(t,i)])
         return Coords(allX)
 
@@ -164,17 +309,37 @@ class Curve(Geometry):
         is interpreted as the curve segment number, and the decimal part
         goes from 0 to 1 over the segment.
         """
-        t = array(t).ravel()
-        ti = floor(t).clip(min=0,max=self.nparts-1)
-        t -= ti
-        i = ti.astype(Int)
+        t,i = self._partParams(t)
         try:
             allX = self.sub_directions_2(t,i)
-        except:
+        except NotImplementedError:
             allX = concatenate([ self.sub_directions(tj,ij) for tj,ij in zip(t,i)])
         return Coords(allX)
 
 
+    def derivsAt(self,t,d=1):
+        """Return the d-th derivatives at parameter values t.
+
+        Parameter values are interpreted as in :meth:`pointsAt`.
+        The derivatives are taken with respect to the local parameter
+        of each part and are not normalized.
+        This is only available for curves that implement `sub_derivs_2`.
+        """
+        t,i = self._partParams(t)
+        return Coords(self.sub_derivs_2(t,i,d))
+
+
+    def curvatureAt(self,t):
+        """Return the curvature at parameter values t.
+
+        Parameter values are interpreted as in :meth:`pointsAt`.
+        This is only available for curves that implement `sub_curvature_2`
+        or `sub_derivs_2`.
+        """
+        t,i = self._partParams(t)
+        return self.sub_curvature_2(t,i)
+
+
     def subPoints(self,div=10,extend=[0., 0.]):
         """Return a sequence of points on the Curve.
 
@@ -250,7 +415,7 @@ class Curve(Geometry):
         This is only available for curves that implement the 'lengths'
         method.
         """
-        return self.lengths().sum()
+        return self.cumLengths()[-1]
 
 
     def approx(self,ndiv=None,ntot=None):
@@ -271,16 +436,25 @@ class Curve(Geometry):
         over the total length of the curve. This produces more equally
         sized segments, but the internal end points of the curve parts may
         not be on the approximating Polyline.
+
+        If the curve implements the arc length methods, the points of
+        `C.approx(ntot=n)` are found directly on the curve. Else, they are
+        found on the approximation with `ndiv` segments per part.
         """
         if ndiv is None:
             ndiv = self.N_approx
-        PL = PolyLine(self.subPoints(ndiv),closed=self.closed)
         if ntot is not None:
-            at = PL.atLength(ntot)
+            try:
+                at = self.atLength(ntot)
+                S = self
+            except NotImplementedError:
+                S = PolyLine(self.subPoints(ndiv),closed=self.closed)
+                at = S.atLength(ntot)
             if self.closed:
                 at = at[:-1]
-            X = PL.pointsAt(at)
-            PL = PolyLine(X,closed=PL.closed)
+            PL = PolyLine(S.pointsAt(at),closed=self.closed)
+        else:
+            PL = PolyLine(self.subPoints(ndiv),closed=self.closed)
         return PL.setProp(self.prop)
 
 
@@ -337,16 +511,21 @@ class Curve(Geometry):
         - `equidistant`: if True (default) the points are spaced almost
           equidistantly over the curve. If False, the points are spread
           equally over the parameter space.
-        - `npre`: only used when `equidistant` is True: number of segments
-          per part of the curve used in the pre-approximation. This pre-
-          approximation is currently required to compute curve lengths.
+        - `npre`: only used when `equidistant` is True and the curve does
+          not implement the arc length methods: number of segments
+          per part of the curve used in a pre-approximation to compute
+          the curve lengths.
 
         .. note:: This is an alternative for Curve.approx, and may replace it
            in future.
         """
         if equidistant:
-            S = self.approximate(npre,equidistant=False)
-            at = S.atLength(nseg)
+            try:
+                at = self.atLength(nseg)
+                S = self
+            except NotImplementedError:
+                S = self.approximate(npre,equidistant=False)
+                at = S.atLength(nseg)
         else:
             S = self
             at = arange(nseg+1) * float(S.nparts) / nseg
@@ -498,7 +677,7 @@ class PolyLine(Curve):
 
     def sub_points_2(self,t,j):
         """Return the points at value,part pairs (t,j)"""
-        j = int(j)
+        j = asarray(j).ravel()
         t = asarray(t).reshape(-1,1)
         n = self.coords.shape[0]
         X0 = self.coords[j % n]
@@ -507,6 +686,24 @@ class PolyLine(Curve):
         return X
 
 
+    def sub_derivs_2(self,t,j,d=1):
+        """Return the d-th derivatives at value,part pairs (t,j)"""
+        if d == 0:
+            return self.sub_points_2(t,j)
+        j = asarray(j).ravel()
+        if d == 1:
+            n = self.coords.shape[0]
+            return self.coords[(j+1) % n] - self.coords[j % n]
+        else:
+            return zeros((len(j),3))
+
+
+    def sub_directions_2(self,t,j):
+        """Return the unit direction vectors at value,part pairs (t,j)"""
+        j = asarray(j).ravel()
+        return self.directions()[j]
+
+
     def sub_directions(self,t,j):
         """Return the unit direction vectors at values t in part j."""
         j = int(j)
@@ -1257,6 +1454,28 @@ class BezierSpline(Curve):
         return self.coords[start:end]
 
 
+    def partCoeffs(self):
+        """Return the polynomial coefficients of all parts of the curve.
+
+        Returns a (nparts,degree+1,3) shaped double precision array A such
+        that the points of part j are given by sum(A[j,k] * t**k).
+        """
+        i = self.degree * arange(self.nparts).reshape(-1,1) + arange(self.degree+1)
+        P = asarray(self.coords[i],dtype=float64)
+        C = asarray(self.coeffs)
+        return (C[newaxis,:,:,newaxis] * P[:,newaxis,:,:]).sum(axis=2)
+
+
+    def sub_derivs_2(self,t,j,d=1):
+        """Return the d-th derivative at values,parts given by zip(t,j)
+
+        t and j can both be arrays, but should have the same length.
+        All parts are evaluated in a single batch of array operations.
+        With d=0, the points are returned.
+        """
+        return polyDerivs(self.partCoeffs(),t,j,d)
+
+
     def sub_points(self,t,j):
         """Return the points at values t in part j."""
         P = self.part(j)
@@ -1292,31 +1511,6 @@ class BezierSpline(Curve):
         return K
 
 
-    def length_intgrnd(self,t,j):
-        """Return the arc length integrand at value t in part j."""
-        P = self.part(j)
-        C = self.coeffs * P
-        U = [ d*(t**(d-1)) if d >= 1 else 0. for d in range(0,self.degree+1) ]
-        U = array(U)
-        T = dot(U,C)
-        T = array(T).reshape(3)
-        return length(T)
-
-
-    def lengths(self):
-        """Return the length of the parts of the curve."""
-        try:
-            from scipy.integrate import quad
-        except:
-            pf.warning("""..
-
-**The **lengths** function is not available.
-Most likely because 'python-scipy' is not installed on your system.""")
-            return
-        L = [ quad(self.length_intgrnd,0.,1.,args=(j,))[0] for j in range(self.nparts) ]
-        return array(L)
-
-
     def parts(self,j,k):
         """Return a curve containing only parts j to k (k not included).
 
@@ -1501,11 +1695,31 @@ class CardinalSpline2(Curve):
         return X
 
 
+    def partCoeffs(self):
+        """Return the polynomial coefficients of all parts of the curve.
+
+        Returns a (nparts,4,3) shaped double precision array A such
+        that the points of part j are given by sum(A[j,k] * t**k).
+        """
+        n = self.coords.shape[0]
+        i = (arange(self.nparts).reshape(-1,1) + arange(4)) % n
+        P = asarray(self.coords[i],dtype=float64)
+        C = asarray(self.coeffs)[::-1]
+        return (C[newaxis,:,:,newaxis] * P[:,newaxis,:,:]).sum(axis=2)
+
+
+    def sub_derivs_2(self,t,j,d=1):
+        """Return the d-th derivative at values,parts given by zip(t,j)"""
+        return polyDerivs(self.partCoeffs(),t,j,d)
+
+
 ##############################################################################
 
 class NaturalSpline(Curve):
     """A class representing a natural spline."""
 
+    _deferrable = False   # coefficients are computed from the coords
+
     def __init__(self,coords,closed=False,endzerocurv=False):
         """Create a natural spline through the given points.
 
@@ -1600,6 +1814,11 @@ class NaturalSpline(Curve):
         X = dot(U,C)
         return X
 
+
+    def sub_derivs_2(self,t,j,d=1):
+        """Return the d-th derivative at values,parts given by zip(t,j)"""
+        return polyDerivs(self.coeffs[:,::-1],t,j,d)
+
 ##############################################################################
 
 
@@ -1618,6 +1837,9 @@ def circle():
 
 class Arc3(Curve):
     """A class representing a circular arc."""
+
+    _deferrable = False   # center and radius are computed from the coords
+
     ##approx returns a PolyLine that does not start from coords[0]. Why?
     def __init__(self,coords):
         """Create a circular arc.
@@ -1663,6 +1885,8 @@ class Arc(Curve):
     plane will be parallel to the z-axis.
     """
 
+    _deferrable = False   # center and radius are computed from the coords
+
     def __init__(self,coords=None,center=None,radius=None,angles=None,angle_spec=DEG):
         """Create a circular arc."""
         # Internally, we store the coords
@@ -1752,6 +1976,31 @@ class Arc(Curve):
         return X
 
 
+    def sub_derivs_2(self,t,j,d=1):
+        """Return the d-th derivative at values,parts given by zip(t,j)
+
+        As the Arc has only one part, j is ignored.
+        """
+        t = asarray(t).ravel()
+        da = self._angles[-1]-self._angles[0]
+        a = self._angles[0] + t*da + d*pi/2
+        X = self.radius * da**d * column_stack([cos(a),sin(a),zeros_like(a)])
+        X = dot(X,vectorRotation([0.,0.,1.],self.normal))
+        if d == 0:
+            X += self._center
+        return X
+
+
+    def sub_curvature_2(self,t,j):
+        """Return the curvature at values,parts given by zip(t,j)"""
+        return resize(1./self.radius,asarray(t).shape)
+
+
+    def lengths(self):
+        """Return the length of the Arc."""
+        return array([self.radius * abs(self._angles[-1]-self._angles[0])])
+
+
     def approx(self,ndiv=None,chordal=0.001):
         """Return a PolyLine approximation of the Arc.
 
@@ -1775,20 +2024,116 @@ class Arc(Curve):
 
 
 class Spiral(Curve):
-    """A class representing a spiral curve."""
+    """A class representing a plane spiral curve.
+
+    The spiral turns `turns` times around the z-axis, while its distance
+    from the axis is given by `rfunc(u)`, where u runs from 0 to 1 over the
+    whole curve. The default `rfunc` is the identity, giving an
+    Archimedean spiral from the origin to the point (1,0,0).
+
+    Parameters:
+
+    - `turns`: float: number of turns around the axis.
+    - `nparts`: int: number of parts of the curve. Each part spans an equal
+      range of the parameter u.
+    - `rfunc`: callable taking and returning an array of floats. It should
+      be twice differentiable: the derivatives are computed numerically.
+
+    The coords of the Spiral hold the origin and the tips of the three
+    local axes. The curve is evaluated in the local axes, so that all
+    affine transformations of the coords apply to the curve.
+    """
 
     def __init__(self,turns=2.0,nparts=100,rfunc=None):
         Curve.__init__(self)
         if rfunc == None:
             rfunc = lambda x:x
-        self.coords = Coords([0.,0.,0.]).replic(npoints+1).hypercylindrical()
+        self.turns = float(turns)
+        self.rfunc = rfunc
+        self.coords = Coords([[0.,0.,0.],[1.,0.,0.],[0.,1.,0.],[0.,0.,1.]])
         self.nparts = nparts
         self.closed = False
 
 
+    def pointsOn(self):
+        return self.pointsAt(arange(self.nparts+1))
+
+
+    def endPoints(self):
+        """Return start and end points of the curve."""
+        return self.pointsAt([0.,self.nparts])
+
+
+    def sub_points(self,t,j):
+        return self.sub_derivs_2(t,resize(j,asarray(t).shape),0)
+
+
+    def sub_derivs_2(self,t,j,d=1):
+        """Return the d-th derivative at values,parts given by zip(t,j)
+
+        Derivatives up to the second order are available.
+        """
+        if d > 2:
+            raise ValueError,"Spiral derivatives are available up to order 2"
+        u = (asarray(j).ravel() + asarray(t).ravel()) / float(self.nparts)
+        h = 1.e-4
+        r0,rm,rp = [ asarray(self.rfunc(v),dtype=float64) for v in [u,u-h,u+h] ]
+        r = [ r0, (rp-rm)/(2*h), (rp-2*r0+rm)/h**2 ][:d+1]
+        w = 2*pi*self.turns
+        phi = w*u
+        # Leibniz rule on r(u) * (cos,sin)(w*u)
+        binom = [[1],[1,1],[1,2,1]][d]
+        X = zeros((len(u),3))
+        for k in range(d+1):
+            c = binom[k] * r[d-k] * w**k
+            X[:,0] += c * cos(phi+k*pi/2)
+            X[:,1] += c * sin(phi+k*pi/2)
+        X /= self.nparts**d
+        O = self.coords[0]
+        X = dot(X,self.coords[1:]-O)
+        if d == 0:
+            X += O
+        return X
+
+
 ##############################################################################
 # Other functions
 
+def polyDerivs(A,t,j,d=0):
+    """Evaluate derivatives of piecewise polynomial vector functions.
+
+    - `A`: (nparts,degree+1,3) shaped array with the coefficients of the
+      polynomials for each part, in order of increasing power.
+    - `t`: array of parameter values.
+    - `j`: int array of the same length as `t`: part numbers.
+    - `d`: int: order of the derivative. With d=0, the function values are
+      returned.
+
+    Returns a (npoints,3) array with the d-th derivatives at the value,part
+    pairs zip(t,j). All points are evaluated in a single batch.
+    """
+    t = asarray(t).ravel()
+    j = asarray(j,dtype=Int).ravel()
+    X = zeros((len(t),A.shape[-1]),dtype=A.dtype)
+    for k in range(d,A.shape[1]):
+        f = prod(arange(k-d+1,k+1))
+        X += (f * t**(k-d)).reshape(-1,1) * A[j,k]
+    return X
+
+
+def gaussLegendre(n):
+    """Return the points and weights of a Gauss-Legendre rule on [0,1].
+
+    - `n`: int: number of integration points.
+
+    Returns a tuple of two arrays with length `n`: the positions of the
+    integration points in the interval [0,1] and the corresponding weights.
+    The weights sum up to 1.
+    """
+    from numpy.polynomial.legendre import leggauss
+    x,w = leggauss(n)
+    return 0.5*(x+1.),0.5*w
+
 def convertFormexToCurve(self,closed=False):
     """Convert a Formex to a Curve.
 
@@ -45,6 +45,7 @@ class Model(Geometry):
     """Contains all FE model data."""
     
     _set_coords = Geometry._set_coords_inplace
+    _deferrable = False
     
     def __init__(self,coords=None,elems=None,meshes=None,fuse=True):
         """Create new model data.
@@ -219,6 +220,7 @@ class FEModel(Geometry):
     """
     
     _set_coords = Geometry._set_coords_inplace
+    _deferrable = False
     
     def __init__(self,meshes):
         """Create a new FEModel."""
@@ -56,6 +56,7 @@ from datetime import datetime
 import os,sys
 from utils import deprecation,removeDict
 from arraytools import isInt
+from instrument import instrumented
 
 ##################################################
 ## Some Abaqus .inp format output routines
@@ -2002,6 +2003,7 @@ class AbqData(object):
         self.out = out
 
 
+    @instrumented(pf.DEBUG.ABQ,'AbqData.write')
     def write(self,jobname=None,group_by_eset=True,group_by_group=False,header='',create_part=False):
         """Write an Abaqus input file.
 
@@ -993,7 +993,11 @@ def renumberMesh(order='elems'):
 
     meshes = [ named(n) for n in selection.names ]
     names = selection.names
+    for n,M in zip(names,meshes):
+        pf.message("Bandwidth and profile of %s before renumbering: %s, %s" % ((n,)+M.bandwidth()))
     meshes = [ M.renumber(order) for M in meshes ]
+    for n,M in zip(names,meshes):
+        pf.message("Bandwidth and profile of %s after renumbering: %s, %s" % ((n,)+M.bandwidth()))
     export2(names,meshes)
     selection.set(names)
     clear()
@@ -1014,6 +1018,20 @@ def renumberMeshFront():
     renumberMesh('front')
 
 
+def renumberMeshRCM():
+    """Renumber the nodes of the selected Meshes in reverse Cuthill-McKee order.
+
+    """
+    renumberMesh('rcm')
+
+
+def renumberMeshHilbert():
+    """Renumber the nodes of the selected Meshes along a Hilbert curve.
+
+    """
+    renumberMesh('hilbert')
+
+
 def getBorderMesh():
     """Create the border Meshes for the selected Meshes.
 
@@ -1166,6 +1184,8 @@ def create_menu():
                 ("In element order",renumberMesh),
                 ("In random order",renumberMeshRandom),
                 ("In frontal order",renumberMeshFront),
+                ("In reverse Cuthill-McKee order",renumberMeshRCM),
+                ("In Hilbert curve order",renumberMeshHilbert),
                 ]),
             ("&Get border mesh",getBorderMesh),
             ("&Peel off border",peelOffMesh),
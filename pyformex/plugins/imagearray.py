@@ -270,7 +270,7 @@ def imagefile2string(filename):
 # Import images using dicom
 _dicom_spacing = None
 
-if utils.checkModule('dicom'):
+if utils.hasModule('dicom'):
 
     def loadImage_dicom(filename):
         """Load a DICOM image into a numpy array.
@@ -300,7 +300,7 @@ if utils.checkModule('dicom'):
     readDicom = loadImage_dicom
 
 
-if utils.checkModule('gdcm'):
+if utils.hasModule('gdcm'):
 
 
     def loadImage_gdcm(filename):
@@ -34,48 +34,129 @@ http://paulbourke.net/geometry/polygonise/
 from __future__ import print_function
 
 import numpy as np
-from multi import multitask,cpu_count,splitar
+from multi import multitask,defaultProcs
 
 
 def isosurface(data,level,nproc=-1):
     """Create an isosurface through data at given level.
 
-    - `data`: (nx,ny,nz) shaped array of data values at points with
+    - `data`: (nz,ny,nx) shaped array of data values at points with
       coordinates equal to their indices. This defines a 3D volume
       [0,nx-1], [0,ny-1], [0,nz-1]
     - `level`: data value at which the isosurface is to be constructed
     - `nproc`: number of parallel processes to use. On multiprocessor machines
       this may be used to speed up the processing. If <= 0 , the number of
-      processes will be set equal to the number of processors, to achieve
-      a maximal speedup.
+      processes is given by :func:`multi.defaultProcs`, which is the
+      number of processors unless configured otherwise.
 
     Returns an (ntr,3,3) array defining the triangles of the isosurface.
     The result may be empty (if level is outside the data range).
+
+    This returns the triangles of :func:`isosurfaceIndexed` as separate
+    triangles, each holding its own copies of the vertices. Use
+    :func:`isosurfaceIndexed` or :func:`isoTriSurface` to avoid the
+    duplication of the vertices.
     """
+    coords,elems = isosurfaceIndexed(data,level,nproc)
+    return coords[elems]
+
+
+def isosurfaceIndexed(data,level,nproc=-1):
+    """Create a fused isosurface through data at given level.
+
+    Parameters are like in :func:`isosurface`.
+
+    Returns a tuple (coords,elems), where coords is a (nv,3) float array
+    with the vertices of the isosurface and elems is an (ntr,3) int array
+    with the vertex numbers of the triangles. Each vertex is stored only
+    once, so there is no need to fuse the result.
+    Triangles that have degenerated to a line or point (because the
+    isosurface passes through data points) are removed.
+
+    In the parallel case, the volume is split in 3D tiles, and each
+    process handles some of them. The data array is passed to the
+    subprocesses through shared memory. The vertices on the tile borders
+    are merged on their grid edge keys.
+    """
+    from lib import misc
+    data = np.asarray(data,dtype=np.float32)
+    level = np.float32(level)
     if nproc < 1:
-        nproc = cpu_count()
+        nproc = defaultProcs()
 
-    if nproc == 1:
+    if nproc == 1 or min(data.shape) < 2:
         # Perform single process isosurface (accelerated)
-        from lib import misc
-        data = data.astype(np.float32)
-        level = np.float32(level)
-        tri = misc.isosurface(data,level)
+        coords,elems,keys = misc.isosurfaceIndexed(data,level)
 
     else:
         # Perform parallel isosurface
-        # 1. Split in blocks (and remember shift)
-        datablocks = splitar(data,nproc,close=True)
-        shift = (np.array([d.shape[0] for d in datablocks]) - 1).cumsum()
-        # 2. Solve blocks independently
-        tasks = [(isosurface,(d,level,1)) for d in datablocks]
-        tri = multitask(tasks,nproc)
-        # 3. Shift and merge blocks
-        for t,s in zip(tri[1:],shift[:-1]):
-            t[:,:,2] += s
-        tri = np.concatenate(tri,axis=0)
-
-    return tri
+        # 1. Split in tiles
+        tiles = _tiles(data.shape,2*nproc)
+        # 2. Solve tiles independently
+        tasks = [(_tileIsosurface,(data,level,t)) for t in tiles]
+        res = multitask(tasks,nproc)
+        # 3. Merge tiles on the vertex keys
+        coords,elems,keys = [ np.concatenate(r) for r in zip(*res) ]
+        nv = np.cumsum([0]+[ len(r[0]) for r in res ])
+        nt = [ len(r[1]) for r in res ]
+        elems += np.repeat(nv[:-1],nt).reshape(-1,1)
+        keys,first,inv = np.unique(keys,return_index=True,return_inverse=True)
+        coords = coords[first]
+        elems = inv[elems].astype(np.int32)
+
+    return coords,elems
+
+
+def isoTriSurface(data,level,nproc=-1):
+    """Create an isosurface through data at given level as a TriSurface.
+
+    Parameters are like in :func:`isosurface`.
+
+    Returns a :class:`TriSurface` constructed from :func:`isosurfaceIndexed`.
+    """
+    from plugins.trisurface import TriSurface
+    coords,elems = isosurfaceIndexed(data,level,nproc)
+    return TriSurface(coords,elems)
+
+
+def _tiles(shape,ntiles):
+    """_Split a data grid in tiles.
+
+    The cells of the grid with the specified data shape are split
+    in at least `ntiles` tiles, by repeatedly halving the dimension with
+    the largest number of cells per tile.
+    Returns a list of ((z0,z1),(y0,y1),(x0,x1)) tuples with the
+    point ranges of the tiles. Adjacent tiles share a layer of points.
+    """
+    ncells = np.array(shape) - 1
+    ndiv = np.ones(3,dtype=int)
+    while ndiv.prod() < ntiles:
+        i = (ncells/ndiv).argmax()
+        if ncells[i] < 2*ndiv[i]:
+            break
+        ndiv[i] *= 2
+    bounds = [ np.linspace(0,n,d+1).round().astype(int) for n,d in zip(ncells,ndiv) ]
+    return [ ((z0,z1),(y0,y1),(x0,x1))
+             for z0,z1 in zip(bounds[0][:-1],bounds[0][1:])
+             for y0,y1 in zip(bounds[1][:-1],bounds[1][1:])
+             for x0,x1 in zip(bounds[2][:-1],bounds[2][1:]) ]
+
+
+def _tileIsosurface(data,level,tile):
+    """_Create the fused isosurface in a tile of the data.
+
+    Returns the vertices, triangles and vertex keys, with the vertices
+    and keys relative to the full data grid.
+    """
+    from lib import misc
+    (z0,z1),(y0,y1),(x0,x1) = tile
+    coords,elems,keys = misc.isosurfaceIndexed(data[z0:z1+1,y0:y1+1,x0:x1+1],level)
+    coords += [x0,y0,z0]
+    p,slot = keys // 4, keys % 4
+    iz,iy,ix = np.unravel_index(p,(z1-z0+1,y1-y0+1,x1-x0+1))
+    nz,ny,nx = data.shape
+    keys = 4*np.ravel_multi_index((iz+z0,iy+y0,ix+x0),(nz,ny,nx)).astype(np.int64) + slot
+    return coords,elems,keys
 
 
 
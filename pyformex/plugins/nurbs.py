@@ -670,6 +670,15 @@ class NurbsSurface(Geometry4):
         return pts
 
 
+    def toTriSurface(self,chordal=None,angle=None,maxlevel=10):
+        """Return an adaptive triangulation of the Nurbs surface.
+
+        This is equivalent with :func:`tessellateSurfaces` applied on
+        a list with only this surface.
+        """
+        return tessellateSurfaces([self],chordal,angle,maxlevel)
+
+
     def actor(self,**kargs):
         """Graphical representation"""
         from gui.actors import NurbsActor
@@ -822,6 +831,272 @@ def knotVector(nctrl,degree,blended=True,closed=False):
     return asarray(knots)
 
 
+def _groupByKnots(objects,key):
+    """Group objects with equal control net shape and knot vectors.
+
+    Returns a dict where the values are lists with the indices of the
+    objects in `objects` that have the same key.
+    """
+    groups = {}
+    for i,obj in enumerate(objects):
+        k = (obj.coords.shape,) + tuple([ tuple(kn) for kn in key(obj) ])
+        groups.setdefault(k,[]).append(i)
+    return groups.values()
+
+
+def curvesPointsAt(curves,u):
+    """Return points on multiple Nurbs curves at the same parametric values.
+
+    Parameters:
+
+    - `curves`: list of NurbsCurve objects.
+    - `u`: (nu,) shaped float array, parametric values at which a point
+      is to be placed on each curve.
+
+    Returns a (ncurves,nu,3) shaped Coords with the points on each curve.
+
+    Curves with the same number of control points and the same knot
+    vector are evaluated together in a single library call, so that the
+    basis functions are computed only once.
+    """
+    u = asarray(u).astype(double).ravel()
+    pts = zeros((len(curves),len(u),3))
+    for ind in _groupByKnots(curves,lambda C:[C.knots]):
+        ctrl = stack([ curves[i].coords for i in ind ]).astype(double)
+        knots = curves[ind[0]].knots.astype(double)
+        X = nurbs.curvesPoints(ctrl,knots,u)
+        if isnan(X).any():
+            raise RuntimeError,"Some error occurred during the evaluation of the Nurbs curves"
+        if X.shape[-1] == 4:
+            X = Coords4(X).toCoords()
+        pts[ind] = X
+    return Coords(pts)
+
+
+def surfacesPointsAt(surfaces,u):
+    """Return points on multiple Nurbs surfaces at the same parametric values.
+
+    Parameters:
+
+    - `surfaces`: list of NurbsSurface objects.
+    - `u`: (nu,2) shaped float array: `nu` parametric values (u,v) at which
+      a point is to be placed on each surface.
+
+    Returns a (nsurfaces,nu,3) shaped Coords with the points on each surface.
+
+    Surfaces with the same control net shape and the same knot vectors
+    are evaluated together in a single library call, so that the basis
+    functions are computed only once.
+    """
+    u = asarray(u).astype(double).reshape(-1,2)
+    pts = zeros((len(surfaces),len(u),3))
+    for ind in _groupByKnots(surfaces,lambda S:[S.uknots,S.vknots]):
+        ctrl = stack([ surfaces[i].coords for i in ind ]).astype(double)
+        U = surfaces[ind[0]].vknots.astype(double)
+        V = surfaces[ind[0]].uknots.astype(double)
+        X = nurbs.surfacesPoints(ctrl,U,V,u)
+        if isnan(X).any():
+            raise RuntimeError,"Some error occurred during the evaluation of the Nurbs surfaces"
+        if X.shape[-1] == 4:
+            X = Coords4(X).toCoords()
+        pts[ind] = X
+    return Coords(pts)
+
+
+def _paramGrid(a,b):
+    """Return the (len(a)*len(b),2) tensor product of parameter values."""
+    return column_stack([repeat(a,len(b)),tile(b,len(a))])
+
+
+def _mergeParams(g,new,eps=1.e-9):
+    """Merge parameter values into a sorted grid.
+
+    Values closer than eps times the parameter range to a previous value
+    are dropped. Returns the new sorted grid.
+    """
+    g = sort(concatenate([g,new]))
+    keep = concatenate([[True],diff(g) > eps*(g[-1]-g[0])])
+    return g[keep]
+
+
+def _refineGrid(S,g,chordal,cosangle):
+    """Refine the tensor parameter grid of a Nurbs surface once.
+
+    - `S`: NurbsSurface
+    - `g`: list of two sorted arrays with the grid parameter values in the
+      two parametric directions.
+    - `chordal`: float: maximum allowed distance of the surface from the
+      triangulation.
+    - `cosangle`: float or None: minimum allowed cosine of the angle between
+      subsequent chords.
+
+    The surface is evaluated at the grid points, at the midpoints of all
+    grid edges and at the cell centers. Every grid interval where a
+    midpoint deviates more than `chordal` from the straight chord (or the
+    chords bend more than the angle tolerance) is split in two.
+
+    Returns the list of two refined grids, or None if no refinement was
+    needed.
+    """
+    g0,g1 = g
+    m0,m1 = 0.5*(g0[:-1]+g0[1:]),0.5*(g1[:-1]+g1[1:])
+    n0,n1 = len(g0),len(g1)
+    uv = concatenate([_paramGrid(g0,g1),_paramGrid(m0,g1),
+                      _paramGrid(g0,m1),_paramGrid(m0,m1)])
+    X = S.pointsAt(uv)
+    nG,nA,nB = n0*n1,(n0-1)*n1,n0*(n1-1)
+    G = X[:nG].reshape(n0,n1,3)
+    A = X[nG:nG+nA].reshape(n0-1,n1,3)
+    B = X[nG+nA:nG+nA+nB].reshape(n0,n1-1,3)
+    C = X[nG+nA+nB:].reshape(n0-1,n1-1,3)
+    e0 = length(A - 0.5*(G[:-1]+G[1:]))
+    e1 = length(B - 0.5*(G[:,:-1]+G[:,1:]))
+    ec = length(C - 0.25*(G[:-1,:-1]+G[1:,:-1]+G[:-1,1:]+G[1:,1:]))
+    r0 = (e0.max(axis=1) > chordal) | (ec.max(axis=1) > chordal)
+    r1 = (e1.max(axis=0) > chordal) | (ec.max(axis=0) > chordal)
+    if cosangle is not None:
+        c0 = vectorPairCosAngle((A-G[:-1]).reshape(-1,3),(G[1:]-A).reshape(-1,3))
+        c1 = vectorPairCosAngle((B-G[:,:-1]).reshape(-1,3),(G[:,1:]-B).reshape(-1,3))
+        r0 |= (c0.reshape(n0-1,n1) < cosangle).any(axis=1)
+        r1 |= (c1.reshape(n0,n1-1) < cosangle).any(axis=0)
+    if not (r0.any() or r1.any()):
+        return None
+    return [ _mergeParams(g0,m0[r0]), _mergeParams(g1,m1[r1]) ]
+
+
+def _surfaceEdges(S):
+    """Return the four boundary edges of a Nurbs surface.
+
+    Returns a list of tuples (dir,side,ctrl,knots), where `dir` is the
+    parametric direction along the edge, `side` is 0 or 1 for the start
+    or end value of the other direction, ctrl are the control points of
+    the edge and knots the knot vector along the edge.
+    """
+    P = S.coords
+    K = [ S.vknots,S.uknots ]
+    return [
+        (1,0,P[0],K[1]),
+        (1,1,P[-1],K[1]),
+        (0,0,P[:,0],K[0]),
+        (0,1,P[:,-1],K[0]),
+        ]
+
+
+def _syncSharedEdges(surfaces,grids,atol):
+    """Use the same parameter values along the shared edges of surfaces.
+
+    Boundary edges of different surfaces are considered shared if they
+    have the same control points (within `atol`) and the same normalized
+    knot vector, possibly in reverse order. The grids are updated in place,
+    so that both surfaces sample the shared edge at the same points.
+    """
+    edges = {}
+    for k,S in enumerate(surfaces):
+        for d,side,ctrl,kn in _surfaceEdges(S):
+            t = (kn-kn[0]) / (kn[-1]-kn[0])
+            key = tuple(rint(asarray(ctrl)/atol).astype(int).ravel()) + tuple(around(t,9))
+            rkey = tuple(rint(asarray(ctrl[::-1])/atol).astype(int).ravel()) + tuple(around(1.-t[::-1],9))
+            rev = rkey < key
+            if rev:
+                key = rkey
+            edges.setdefault(key,[]).append((k,d,rev,kn[0],kn[-1]))
+
+    shared = [ e for e in edges.values() if len(e) > 1 ]
+    changed = True
+    while changed:
+        changed = False
+        for e in shared:
+            t = []
+            for k,d,rev,k0,k1 in e:
+                tk = (grids[k][d]-k0) / (k1-k0)
+                t.append(1.-tk if rev else tk)
+            t = _mergeParams(concatenate(t[:1]),concatenate(t[1:]))
+            for k,d,rev,k0,k1 in e:
+                tk = 1.-t[::-1] if rev else t
+                g = _mergeParams(grids[k][d],k0+tk*(k1-k0))
+                if len(g) > len(grids[k][d]):
+                    grids[k][d] = g
+                    changed = True
+
+
+def tessellateSurfaces(surfaces,chordal=None,angle=None,maxlevel=10):
+    """Adaptively triangulate a set of Nurbs surfaces.
+
+    Parameters:
+
+    - `surfaces`: list of NurbsSurface objects.
+    - `chordal`: float: maximum allowed distance between the surfaces and
+      their triangulation, measured at the midpoints of the triangle edges
+      and at the centers of the parametric cells. The default is 0.001
+      times the size of the bounding box of all control points.
+    - `angle`: float: if specified, the maximum angle (in degrees) between
+      subsequent chords along the parametric directions.
+    - `maxlevel`: int: maximum number of refinement steps.
+
+    Each surface is sampled on a tensor grid of parametric values, starting
+    from its knot values. Grid intervals are halved where the chordal or
+    angle tolerance is not met, so that flat regions get few triangles and
+    curved regions many. Boundary edges shared by different surfaces are
+    sampled at the same points, so that the result is watertight after
+    fusing the nodes.
+
+    Returns a TriSurface where the property numbers are the indices of
+    the originating surfaces in the list.
+    """
+    from plugins.trisurface import TriSurface
+    bb = bbox([ S.coords.toCoords() for S in surfaces ])
+    size = length(bb[1]-bb[0])
+    if chordal is None:
+        chordal = 0.001 * size
+    cosangle = None if angle is None else cosd(angle)
+
+    grids = []
+    for S in surfaces:
+        g = []
+        for K,n in [ (S.vknots,S.coords.shape[0]),(S.uknots,S.coords.shape[1]) ]:
+            p = len(K) - n - 1
+            k = unique(K[p:len(K)-p])
+            g.append(_mergeParams(k,0.5*(k[:-1]+k[1:])))
+        grids.append(g)
+
+    todo = range(len(surfaces))
+    for level in range(maxlevel):
+        done = []
+        for k in todo:
+            g = _refineGrid(surfaces[k],grids[k],chordal,cosangle)
+            if g is None:
+                done.append(k)
+            else:
+                grids[k] = g
+        todo = [ k for k in todo if k not in done ]
+        if not todo:
+            break
+
+    atol = 1.e-5 * size
+    _syncSharedEdges(surfaces,grids,atol)
+
+    coords,elems,prop = [],[],[]
+    offset = 0
+    for k,(S,g) in enumerate(zip(surfaces,grids)):
+        n0,n1 = len(g[0]),len(g[1])
+        X = S.pointsAt(_paramGrid(*g))
+        i = arange(n0*n1).reshape(n0,n1)
+        q = column_stack([i[:-1,:-1].ravel(),i[1:,:-1].ravel(),
+                          i[1:,1:].ravel(),i[:-1,1:].ravel()])
+        # split the quads along the shortest diagonal
+        d02 = length(X[q[:,0]]-X[q[:,2]]) <= length(X[q[:,1]]-X[q[:,3]])
+        e = where(d02.reshape(-1,1),
+                  q[:,[0,1,2,0,2,3]],q[:,[0,1,3,1,2,3]]).reshape(-1,3)
+        coords.append(X)
+        elems.append(e+offset)
+        prop.append(resize(k,len(e)))
+        offset += len(X)
+
+    M = TriSurface(Coords.concatenate(coords),concatenate(elems),prop=concatenate(prop))
+    M = M.fuse(atol=atol)
+    return M.removeDegenerate().compact()
+
+
 def toCoords4(x):
     """Convert cartesian coordinates to homogeneous
 
@@ -41,7 +41,7 @@ utils.hasExternal('gts')
 #   not in Debian package: gtssplit gtscoarsen gtsrefine gtssmooth
 #
 
-def boolean(self,surf,op,check=False,verbose=False):
+def boolean(self,surf,op,check=False,verbose=False,method='native'):
     """Perform a boolean operation with another surface.
 
     Boolean operations between surfaces are a basic operation in
@@ -58,15 +58,26 @@ def boolean(self,surf,op,check=False,verbose=False):
     - `op`: boolean operation: one of '+', '-' or '*'.
     - `check`: boolean: check that the surfaces are not self-intersecting;
       if one of them is, the set of self-intersecting faces is written
-      (as a GtsSurface) on standard output
+      (as a GtsSurface) on standard output. Only used with method 'gts'.
     - `verbose`: boolean: print statistics about the surface
+    - `method`: 'native' or 'gts'. The default uses the boolean
+      operations from :mod:`plugins.surfacebool`. With 'gts', the
+      operation is done by the external program gtsset.
 
-    Returns: a closed manifold TriSurface
+    Returns: a closed manifold TriSurface. With the native method, the
+    property numbers of the triangles are 0 for triangles originating
+    from self and 1 for those from `surf`.
     """
-    return self.gtsset(surf,op,filt = '| gts2stl',ext='.stl',check=check,verbose=verbose)
+    if method == 'gts':
+        return self.gtsset(surf,op,filt = '| gts2stl',ext='.stl',check=check,verbose=verbose)
+    import surfacebool
+    S = surfacebool.boolean(self,surf,op)
+    if verbose:
+        pf.message(S.stats())
+    return S
 
 
-def intersection(self,surf,check=False,verbose=False):
+def intersection(self,surf,check=False,verbose=False,method='native'):
     """Return the intersection curve of two surfaces.
 
     Boolean operations between surfaces are a basic operation in
@@ -79,12 +90,21 @@ def intersection(self,surf,check=False,verbose=False):
     - `surf`: a closed manifold surface
     - `check`: boolean: check that the surfaces are not self-intersecting;
       if one of them is, the set of self-intersecting faces is written
-      (as a GtsSurface) on standard output
+      (as a GtsSurface) on standard output. Only used with method 'gts'.
     - `verbose`: boolean: print statistics about the surface
+    - `method`: 'native' or 'gts': see :meth:`boolean`.
 
-    Returns: a list of intersection curves.
+    Returns: the intersection curve as a plex-2 geometry: with the native
+    method, a Mesh with a property number for each continuous part of
+    the curve; with method 'gts', a Formex.
     """
-    return self.gtsset(surf,op='*',ext='.list',curve=True,check=check,verbose=verbose)
+    if method == 'gts':
+        return self.gtsset(surf,op='*',ext='.list',curve=True,check=check,verbose=verbose)
+    import surfacebool
+    C = surfacebool.intersectionCurve(self,surf)
+    if verbose:
+        pf.message("Intersection curve: %s segments" % C.nelems())
+    return C
 
 
 def gtsset(self,surf,op,filt='',ext='.tmp',curve=False,check=False,verbose=False):
@@ -35,7 +35,7 @@ from gui.colorscale import ColorScale,ColorLegend
 from gui.draw import *
 from plugins.trisurface import *
 from plugins.objects import *
-from plugins import plot2d,formex_menu,fe_abq
+from plugins import plot2d,formex_menu,fe_abq,tetgen
 import simple
 from plugins.tools import Plane
 from pyformex.arraytools import niceLogSize
@@ -1113,9 +1113,14 @@ def smooth():
 def refine():
     S = selection.check(single=True)
     if S:
-        res = askItems([_I('max_edges',-1),
+        res = askItems([_I('method','split',itemtype='select',choices=['split','gts']),
+                        _I('max_edges',-1),
                         _I('min_cost',-1.0),
-                        ])
+                        _I('smooth',False),
+                        ], enablers=[
+                ('method','split','smooth'),
+                ],
+            )
         if res:
             selection.remember()
             if res['max_edges'] <= 0:
@@ -1319,8 +1324,15 @@ def split():
 def coarsen():
     S = selection.check(single=True)
     if S:
-        res = askItems([_I('min_edges',-1),
+        gtsitems = ['mid_vertex','length_cost','max_fold','volume_weight',
+                    'boundary_weight','shape_weight','progressive','log',
+                    'verbose']
+        qemitems = ['border_weight','feature_angle']
+        res = askItems([_I('method','qem',itemtype='select',choices=['qem','gts']),
+                        _I('min_edges',-1),
                         _I('max_cost',-1.0),
+                        _I('border_weight',1000.),
+                        _I('feature_angle',-1.0),
                         _I('mid_vertex',False),
                         _I('length_cost',False),
                         _I('max_fold',1.0),
@@ -1330,13 +1342,25 @@ def coarsen():
                         _I('progressive',False),
                         _I('log',False),
                         _I('verbose',False),
-                        ])
+                        ], enablers=[
+                ('method','qem')+tuple(qemitems),
+                ('method','gts')+tuple(gtsitems),
+                ],
+            )
         if res:
             selection.remember()
             if res['min_edges'] <= 0:
                 res['min_edges'] = None
             if res['max_cost'] <= 0:
                 res['max_cost'] = None
+            if res['feature_angle'] <= 0:
+                res['feature_angle'] = None
+            if res['method'] == 'qem':
+                skip = gtsitems
+            else:
+                skip = qemitems
+            for k in skip:
+                del res[k]
             S=S.coarsen(**res)
             selection.changeValues([S])
             selection.drawChanges()
@@ -1359,15 +1383,17 @@ def boolean():
     res = askItems([_I('surface 1',choices=surfs),
                     _I('surface 2',choices=surfs),
                     _I('operation',choices=ops),
+                    _I('method',choices=['native','gts']),
                     _I('check self intersection',False),
                     _I('verbose',False),
-                    ],'Boolean Operation')
+                    ],'Boolean Operation',
+                   enablers=[('method','gts','check self intersection')])
     if res:
         SA = pf.PF[res['surface 1']]
         SB = pf.PF[res['surface 2']]
         SC = SA.boolean(SB,op=res['operation'].strip()[0],
                         check=res['check self intersection'],
-                        verbose=res['verbose'])
+                        verbose=res['verbose'],method=res['method'])
         export({'__auto__':SC})
         selection.set('__auto__')
         selection.draw()
@@ -1382,14 +1408,16 @@ def intersection():
 
     res = askItems([_I('surface 1',choices=surfs),
                     _I('surface 2',choices=surfs),
+                    _I('method',choices=['native','gts']),
                     _I('check self intersection',False),
                     _I('verbose',False),
-                    ],'Intersection Curve')
+                    ],'Intersection Curve',
+                   enablers=[('method','gts','check self intersection')])
     if res:
         SA = pf.PF[res['surface 1']]
         SB = pf.PF[res['surface 2']]
         SC = SA.intersection(SB,check=res['check self intersection'],
-                             verbose=res['verbose'])
+                             verbose=res['verbose'],method=res['method'])
         export({'__intersection_curve__':SC})
         draw(SC,color=red,linewidth=3)
 
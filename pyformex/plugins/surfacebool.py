@@ -0,0 +1,460 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+#
+#
+"""Boolean operations on closed triangulated surfaces.
+
+This module implements the boolean operations (union, difference and
+intersection) of the volumes enclosed by two TriSurfaces, and the
+computation of their intersection curve, without using external
+programs.
+
+The candidate pairs of intersecting triangles are found with a bounding
+volume hierarchy (:class:`plugins.bvh.BVH`), and the intersection segment
+of every pair is computed with the interval overlap method of Moller.
+The points of the intersection curve are identified by the edge of one
+surface and the triangle of the other surface they are on, so that both
+surfaces get exactly the same points, without any fusing of nodes.
+The intersected triangles are split along the intersection curve, and
+the connected parts of both surfaces are classified as inside or outside
+the other surface using the generalized winding number.
+
+Both surfaces should be closed, orientable, non self-intersecting
+manifolds. Coplanar overlapping triangles are not handled: the surfaces
+are supposed to be in general position with respect to each other.
+"""
+from __future__ import print_function
+
+import pyformex as pf
+from coords import *
+from connectivity import Connectivity,connectedLineElems
+from elements import Tri3
+from mesh import Mesh
+from plugins.trisurface import TriSurface
+from plugins.bvh import elementBVH
+
+
+def _surfaceData(S,perturb=0.):
+    """_Return the data of a surface needed for the intersection.
+
+    Returns the float64 coordinates, the elems, the elem edges, the edges
+    and the unit normals of the surface S. If perturb is nonzero, the
+    coordinates are randomly displaced over a distance of maximum perturb.
+    """
+    X = S.coords.astype(float64)
+    if perturb:
+        X += random.RandomState(1).uniform(-perturb,perturb,X.shape)
+    F = S.elems.astype(Int)
+    fe,edges = Connectivity(F,eltype=Tri3).insertLevel(1)
+    edges = sort(edges,axis=1)
+    n = normalize(cross(X[F[:,1]]-X[F[:,0]],X[F[:,2]]-X[F[:,0]]))
+    return X,F,asarray(fe),asarray(edges),n
+
+
+def _crossings(X,F,fe,edges,ia,Y,G,m,ib,tol):
+    """_Find the crossings of triangles ia with the planes of triangles ib.
+
+    X,F,fe,edges are the data of the crossing surface, Y,G,m the points,
+    elems and normals of the other surface.
+
+    Returns a boolean array flagging the pairs where the triangle crosses
+    the plane, and for all pairs the numbers of the two crossing edges
+    and the two crossing points.
+    """
+    def dist(v,j):
+        """Signed distances of vertices v to the planes of triangles j"""
+        d = dotpr(X[v]-Y[G[j,0]],m[j])
+        d[abs(d) <= tol] = 0.
+        return d
+
+    d = dist(F[ia],ib[:,newaxis])
+    s = d >= 0.
+    ns = s.sum(axis=-1)
+    ok = (ns == 1) | (ns == 2)
+    # The single vertex on one side
+    k = where(ns == 1,s.argmax(axis=-1),s.argmin(axis=-1))
+    le = column_stack([k,(k+2)%3])
+    e = fe[ia[:,newaxis],le]
+    # Compute the points on the canonically ordered edges
+    p,q = edges[e,0],edges[e,1]
+    dp = dist(p,ib[:,newaxis])
+    dq = dist(q,ib[:,newaxis])
+    den = where(dp==dq,1.,dp-dq)
+    t = (dp/den)[...,newaxis]
+    x = X[p] + t * (X[q]-X[p])
+    return ok,e,x
+
+
+def intersectSurfaces(S1,S2,tol=1.e-14,perturb=1.e-9):
+    """Compute the intersection segments of two triangulated surfaces.
+
+    Parameters:
+
+    - `S1`, `S2`: TriSurfaces.
+    - `tol`: relative tolerance (with respect to the size of the surfaces)
+      under which a vertex is considered to lie in the plane of a triangle.
+    - `perturb`: relative size of a random perturbation of the vertices
+      of S2. Surfaces are often in a special position with respect to
+      each other (e.g. a translated copy of a surface), with vertices
+      lying in the planes of the other surface and edges crossing each
+      other. A small perturbation, which is far below the precision
+      of the stored coordinates, removes these singular cases.
+
+    Returns a dict with the following items:
+
+    - `coords`: (npts,3) float array with the points on the intersection
+      curve,
+    - `segments`: (nseg,2) int array with the point numbers of the
+      intersection segments,
+    - `tri1`, `tri2`: (nseg,) int arrays with the number of the triangles
+      of S1, resp. S2 containing each segment,
+    - `edge1`, `edge2`: (npts,) int arrays with for every point the
+      number of the edge of S1, resp. S2 it lies on, or -1 if the point
+      is not on an edge of that surface,
+    - `data1`, `data2`: tuples with the surface data from :func:`_surfaceData`.
+    """
+    size = max(S1.dsize(),S2.dsize())
+    D1 = X1,F1,fe1,ed1,n1 = _surfaceData(S1)
+    D2 = X2,F2,fe2,ed2,n2 = _surfaceData(S2,perturb*size)
+    tol *= size
+
+    # Candidate pairs
+    ia,ib = elementBVH(X1[F1]).overlap(elementBVH(X2[F2]),atol=tol)
+
+    # Triangle-plane crossings
+    ok1,e1,x1 = _crossings(X1,F1,fe1,ed1,ia,X2,F2,n2,ib,tol)
+    ok2,e2,x2 = _crossings(X2,F2,fe2,ed2,ib,X1,F1,n1,ia,tol)
+    ok = ok1 & ok2
+    ia,ib,e1,x1,e2,x2 = ia[ok],ib[ok],e1[ok],x1[ok],e2[ok],x2[ok]
+
+    # Interval overlap on the intersection line
+    D = cross(n1[ia],n2[ib])
+    t1 = dotpr(x1,D[:,newaxis])
+    t2 = dotpr(x2,D[:,newaxis])
+    o1 = t1.argsort(axis=-1)
+    o2 = t2.argsort(axis=-1)
+    r = arange(ia.size)[:,newaxis]
+    t1,e1,x1 = t1[r,o1],e1[r,o1],x1[r,o1]
+    t2,e2,x2 = t2[r,o2],e2[r,o2],x2[r,o2]
+    # Keys: points on edges of S1 and points on edges of S2
+    nf1,nf2 = F1.shape[0],F2.shape[0]
+    off = int64(ed1.shape[0]) * nf2
+    k1 = e1.astype(int64) * nf2 + ib[:,newaxis]
+    k2 = off + e2.astype(int64) * nf1 + ia[:,newaxis]
+    lo = t2[:,0] > t1[:,0]
+    hi = t2[:,1] < t1[:,1]
+    klo = where(lo,k2[:,0],k1[:,0])
+    khi = where(hi,k2[:,1],k1[:,1])
+    xlo = where(lo[:,newaxis],x2[:,0],x1[:,0])
+    xhi = where(hi[:,newaxis],x2[:,1],x1[:,1])
+    tlo = where(lo,t2[:,0],t1[:,0])
+    thi = where(hi,t2[:,1],t1[:,1])
+    ok = (thi > tlo) & (klo != khi)
+    ia,ib = ia[ok],ib[ok]
+    keys = concatenate([klo[ok],khi[ok]])
+    x = concatenate([xlo[ok],xhi[ok]])
+
+    # Number the points
+    keys,first,inv = unique(keys,return_index=True,return_inverse=True)
+    seg = inv.reshape(2,-1).T
+    x = x[first]
+    on1 = keys < off
+    edge1 = where(on1,keys//nf2,-1)
+    edge2 = where(on1,-1,(keys-off)//nf1)
+    return dict(coords=x,segments=seg,tri1=ia,tri2=ib,
+                edge1=edge1,edge2=edge2,data1=D1,data2=D2)
+
+
+def _earClip(P):
+    """_Triangulate a simple polygon.
+
+    P is a (n,2) float array with the vertices of a counterclockwise
+    polygon. Returns a list of triangles as vertex index triplets.
+    """
+    V = range(P.shape[0])
+    tris = []
+    def area2(a,b,c):
+        return (P[b,0]-P[a,0])*(P[c,1]-P[a,1]) - (P[b,1]-P[a,1])*(P[c,0]-P[a,0])
+    while len(V) > 3:
+        n = len(V)
+        best = None
+        for i in range(n):
+            a,b,c = V[i-1],V[i],V[(i+1)%n]
+            ar = area2(a,b,c)
+            if ar <= 0.:
+                continue
+            for v in V:
+                if v in (a,b,c):
+                    continue
+                if area2(a,b,v) > 0. and area2(b,c,v) > 0. and area2(c,a,v) >= 0.:
+                    break
+            else:
+                best = i
+                break
+        if best is None:
+            # No proper ear (degenerate polygon): clip the most convex vertex
+            best = argmax([ area2(V[i-1],V[i],V[(i+1)%n]) for i in range(n) ])
+        tris.append((V[best-1],V[best],V[(best+1)%n]))
+        del V[best]
+    tris.append(tuple(V))
+    return tris
+
+
+def _chains(segs,boundary):
+    """_Split a set of segments in chains.
+
+    - `segs`: list of (i,j) point pairs.
+    - `boundary`: set of points on the border of the triangle.
+
+    Returns a list of open chains (starting and ending at boundary points)
+    and a list of closed loops (point lists).
+    """
+    nbrs = {}
+    for i,j in segs:
+        nbrs.setdefault(i,[]).append(j)
+        nbrs.setdefault(j,[]).append(i)
+    used = set()
+    def walk(start):
+        chain = [start]
+        prev,cur = None,start
+        while True:
+            nxt = [ p for p in nbrs[cur] if p != prev and (min(cur,p),max(cur,p)) not in used ]
+            if not nxt:
+                return chain
+            prev,cur = cur,nxt[0]
+            used.add((min(prev,cur),max(prev,cur)))
+            chain.append(cur)
+            if cur in boundary or cur == start:
+                return chain
+    chains,loops = [],[]
+    for p in sorted(nbrs):
+        if p in boundary:
+            while any([ (min(p,q),max(p,q)) not in used for q in nbrs[p] ]):
+                c = walk(p)
+                if c[-1] in boundary and len(c) > 1:
+                    chains.append(c)
+    for p in sorted(nbrs):
+        while any([ (min(p,q),max(p,q)) not in used for q in nbrs[p] ]):
+            c = walk(p)
+            if len(c) > 3 and c[-1] == c[0]:
+                loops.append(c[:-1])
+    return chains,loops
+
+
+def _splitTriangles(X,F,fe,tri,seg,pedge,ptoff):
+    """_Split the triangles of a surface along the intersection segments.
+
+    - `X`: (nnod,3) coordinates of all the nodes (surface vertices and
+      intersection points).
+    - `F`, `fe`: elems and elem edges of the surface, with node numbers
+      in X.
+    - `tri`: (nseg,) the triangle containing each segment
+    - `seg`: (nseg,2) the intersection segments, with node numbers in X.
+    - `pedge`: (npts,) for every intersection point, the edge of the
+      surface it is on, or -1.
+    - `ptoff`: the node number in X of the first intersection point.
+
+    Returns an (nelems,3) array with the new triangles and an (nelems,)
+    array with the number of the triangle they are a part of.
+    """
+    order = argsort(tri,kind='mergesort')
+    tri,seg = tri[order],seg[order]
+    split = unique(tri)
+    start = tri.searchsorted(split)
+    end = tri.searchsorted(split,'right')
+    elems,parent = [],[]
+    for t,i0,i1 in zip(split,start,end):
+        v = F[t].tolist()
+        x0 = X[v[0]]
+        u = normalize(X[v[1]]-x0)
+        w = normalize(cross(cross(X[v[1]]-x0,X[v[2]]-x0),u))
+        segs = [ (i,j) for i,j in seg[i0:i1].tolist() ]
+        pts = unique(seg[i0:i1])
+        # Points on the border, sorted along each edge
+        border = [ [] for k in range(3) ]
+        for p in pts:
+            e = pedge[p-ptoff]
+            if e >= 0:
+                k = fe[t].tolist().index(e)
+                border[k].append((dotpr(X[p]-X[v[k]],X[v[(k+1)%3]]-X[v[k]]),p))
+        poly = []
+        for k in range(3):
+            poly.append(v[k])
+            poly.extend([ p for d,p in sorted(border[k]) ])
+        boundary = set([ p for b in border for d,p in b ])
+        chains,loops = _chains(segs,boundary)
+        polys = [ poly ]
+        for c in chains:
+            for ip,P in enumerate(polys):
+                if c[0] in P and c[-1] in P:
+                    i,j = P.index(c[0]),P.index(c[-1])
+                    if i > j:
+                        i,j = j,i
+                        c = c[::-1]
+                    inner = c[1:-1]
+                    polys[ip] = P[i:j+1] + inner[::-1]
+                    polys.append(P[j:] + P[:i+1] + inner)
+                    break
+        for L in loops:
+            L2 = dot(X[L]-x0,column_stack([u,w]))
+            ar = (L2[:,0]*roll(L2[:,1],-1) - roll(L2[:,0],-1)*L2[:,1]).sum()
+            if ar < 0.:
+                L = L[::-1]
+            # Find the polygon containing the loop and make a keyhole
+            for ip,P in enumerate(polys):
+                P2 = dot(X[P]-x0,column_stack([u,w]))
+                if _insidePolygon(dot(X[L[0]]-x0,column_stack([u,w])),P2):
+                    d = length(X[P][:,newaxis]-X[L][newaxis],)
+                    i,j = unravel_index(d.argmin(),d.shape)
+                    Lr = L[j:] + L[:j]
+                    polys[ip] = P[:i+1] + Lr[:1] + Lr[:0:-1] + Lr[:1] + P[i:]
+                    break
+            polys.append(L)
+        for P in polys:
+            P2 = dot(X[P]-x0,column_stack([u,w]))
+            elems.extend([ [P[a],P[b],P[c]] for a,b,c in _earClip(P2) ])
+            parent.extend([t] * (len(P)-2))
+    return array(elems,dtype=Int).reshape(-1,3),array(parent,dtype=Int)
+
+
+def _insidePolygon(p,P):
+    """_Check whether 2D point p is inside the 2D polygon P (crossing rule)."""
+    x,y = p
+    x0,y0 = P[:,0],P[:,1]
+    x1,y1 = roll(x0,-1),roll(y0,-1)
+    c = (y0 > y) != (y1 > y)
+    xc = x0[c] + (y-y0[c]) * (x1[c]-x0[c]) / (y1[c]-y0[c])
+    return (xc > x).sum() % 2 == 1
+
+
+def windingNumbers(P,x,chunk=100000):
+    """Compute the winding numbers of points with respect to a surface.
+
+    - `P`: (npts,3) float array of points.
+    - `x`: (ntri,3,3) float array with the triangles of a closed surface.
+
+    Returns an (npts,) float array with the generalized winding numbers:
+    these are (close to) 1 for points inside a closed surface with
+    outward normals, and 0 for points outside.
+    """
+    P = asarray(P,dtype=float64).reshape(-1,3)
+    x = asarray(x,dtype=float64)
+    w = zeros(P.shape[0])
+    for i in range(0,x.shape[0],chunk):
+        a,b,c = [ x[i:i+chunk,j][newaxis] - P[:,newaxis] for j in range(3) ]
+        la,lb,lc = length(a),length(b),length(c)
+        det = dotpr(a,cross(b,c))
+        den = la*lb*lc + dotpr(a,b)*lc + dotpr(a,c)*lb + dotpr(b,c)*la
+        w += 2.*arctan2(det,den).sum(axis=-1)
+    return w / (4*pi)
+
+
+def _classify(X,F,curve,other):
+    """_Classify the parts of a split surface as inside/outside another one.
+
+    - `X`, `F`: coords and elems of the split surface.
+    - `curve`: (nseg,2) node numbers of the intersection segments
+    - `other`: (ntri,3,3) coordinates of the other surface.
+
+    Returns a boolean array flagging the triangles inside the other surface.
+    """
+    hi,lo = Connectivity(F,eltype=Tri3).insertLevel(1)
+    lo = sort(asarray(lo),axis=1)
+    curve = sort(curve,axis=1)
+    nn = X.shape[0]
+    iscurve = in1d(lo[:,0].astype(int64)*nn+lo[:,1],curve[:,0].astype(int64)*nn+curve[:,1])
+    part = hi.adjacency(mask=~iscurve).frontWalk(frontinc=0,partinc=1)
+    area = length(cross(X[F[:,1]]-X[F[:,0]],X[F[:,2]]-X[F[:,0]]))
+    # Representative triangle of each part: the largest one
+    order = lexsort((-area,part))
+    parts,first = unique(part[order],return_index=True)
+    rep = order[first]
+    w = windingNumbers(X[F[rep]].mean(axis=1),other)
+    inside = zeros(parts.max()+1,dtype=bool)
+    inside[parts] = abs(w) > 0.5
+    return inside[part]
+
+
+def intersectionCurve(S1,S2):
+    """Return the intersection curve of two surfaces.
+
+    Returns a plex-2 Mesh with the intersection segments. The Mesh has
+    property numbers such that all segments forming a single continuous
+    part have the same property value.
+    """
+    I = intersectSurfaces(S1,S2)
+    if I['segments'].shape[0] == 0:
+        return Mesh(Coords(),Connectivity(nplex=2,eltype='line2'))
+    parts = connectedLineElems(I['segments'])
+    prop = concatenate([ [i]*p.nelems() for i,p in enumerate(parts)])
+    return Mesh(Coords(I['coords']),concatenate(parts),prop=prop,eltype='line2')
+
+
+def boolean(S1,S2,op):
+    """Perform a boolean operation on the volumes enclosed by two surfaces.
+
+    - `S1`, `S2`: closed manifold TriSurfaces, with outward normals.
+    - `op`: one of '+' (union), '-' (difference S1-S2) or
+      '*' (intersection).
+
+    Returns a TriSurface with the boundary of the result volume.
+    The property number of the triangles tells their origin:
+    0 for triangles from S1 and 1 for triangles from S2.
+    """
+    if op not in '+-*' or len(op) != 1:
+        raise ValueError,"Invalid boolean operation '%s'" % op
+    I = intersectSurfaces(S1,S2)
+    X1,F1,fe1,ed1,n1 = I['data1']
+    X2,F2,fe2,ed2,n2 = I['data2']
+    nv1,nv2 = X1.shape[0],X2.shape[0]
+    off = nv1+nv2
+    X = concatenate([X1,X2,I['coords']])
+    seg = I['segments'] + off
+
+    # Split the intersected triangles
+    e1,p1 = _splitTriangles(X,F1,fe1,I['tri1'],seg,I['edge1'],off)
+    e2,p2 = _splitTriangles(X,F2+nv1,fe2,I['tri2'],seg,I['edge2'],off)
+    keep1 = ones(F1.shape[0],dtype=bool)
+    keep1[p1] = False
+    keep2 = ones(F2.shape[0],dtype=bool)
+    keep2[p2] = False
+    G1 = concatenate([F1[keep1],e1])
+    G2 = concatenate([F2[keep2]+nv1,e2])
+
+    # Classify and select the parts
+    in1 = _classify(X,G1,seg,X2[F2])
+    in2 = _classify(X,G2,seg,X1[F1])
+    if op == '+':
+        G1,G2 = G1[~in1],G2[~in2]
+    elif op == '*':
+        G1,G2 = G1[in1],G2[in2]
+    else:
+        G1,G2 = G1[~in1],G2[in2][:,::-1]
+    F = concatenate([G1,G2])
+    prop = concatenate([zeros(G1.shape[0],dtype=Int),ones(G2.shape[0],dtype=Int)])
+    return TriSurface(Coords(X),F,prop=prop).compact()
+
+
+# End
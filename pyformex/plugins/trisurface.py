@@ -35,12 +35,14 @@ import pyformex as pf
 from formex import *
 from connectivity import Connectivity,connectedLineElems,adjacencyArrays
 from mesh import Mesh
+from elements import Tri3
 import mesh_ext  # load the extended Mesh functions
 
 import geomtools
 import inertia
 import fileread,filewrite
 import utils
+from instrument import instrumented,timing
 
 import os,tempfile
 import tempfile
@@ -192,6 +194,25 @@ def surface_volume(x,pt=None):
     return v
 
 
+def _qualityAspect(elems,coords):
+    """Compute the quality and aspect ratio of triangles.
+
+    This computes the same values as :meth:`TriSurface.quality` and
+    :meth:`TriSurface.aspectRatio`, but directly from the coordinates
+    of the elements. Returns a tuple (quality,aspect).
+    """
+    x = coords[elems]
+    area = geomtools.areaNormals(x)[0]
+    facedg = length(x[:,[1,2,0]]-x)
+    peri = facedg.sum(axis=-1)
+    edgmax = facedg.max(axis=-1)
+    altmin = 2*area / edgmax
+    aspect = edgmax/altmin
+    _qual_equi = sqrt(sqrt(3.)) / 6.
+    qual = sqrt(area) / peri / _qual_equi
+    return qual,aspect
+
+
 def curvature(coords,elems,edges,neighbours=1):
     """Calculate curvature parameters at the nodes.
 
@@ -201,12 +222,13 @@ def curvature(coords,elems,edges,neighbours=1):
     Eight values are returned: the Gaussian and mean curvature, the
     shape index, the curvedness, the principal curvatures and the
     principal directions.
+
+    The nodes are processed in chunks if the temporary data would
+    exceed the memory budget (see :mod:`memory`).
     """
+    import memory,multi
     # calculate n-ring neighbourhood of the nodes (n=neighbours)
     adj = adjacencyArrays(edges,nsteps=neighbours)[-1]
-    adjNotOk = adj<0
-    # for nodes that have less than three adjacent nodes, remove the adjacencies
-    adjNotOk[(adj>=0).sum(-1) <= 2] = True
     # calculate unit length average normals at the nodes p
     # a weight 1/|gi-p| could be used (gi=center of the face fi)
     p = coords
@@ -214,8 +236,25 @@ def curvature(coords,elems,edges,neighbours=1):
     # double-precision: this will allow us to check the sign of the angles
     p = p.astype(float64)
     n = n.astype(float64)
-    vp = p[adj] - p[:,newaxis]
-    vn = n[adj] - n[:,newaxis]
+    nbytes = 30 * adj.size * p.dtype.itemsize
+    rows = memory.chunksize('curvature',nbytes,adj.shape[0])
+    return multi.blockwise(_curvature,arange(adj.shape[0]),(p,n,adj),nproc=1,blocksize=rows)
+
+
+def _curvature(nodes,p,n,adj):
+    """Calculate curvature parameters at the specified nodes.
+
+    `nodes` is a list of node numbers, `p` and `n` are the coordinates
+    and the average normals at all the nodes, and `adj` is the node
+    adjacency table used for the computation.
+    """
+    adj = adj[nodes]
+    adjNotOk = adj<0
+    # for nodes that have less than three adjacent nodes, remove the adjacencies
+    adjNotOk[(adj>=0).sum(-1) <= 2] = True
+    vp = p[adj] - p[nodes][:,newaxis]
+    vn = n[adj] - n[nodes][:,newaxis]
+    n = n[nodes]
     # where adjNotOk, set vectors = [0.,0.,0.]
     # this will result in NaN values
     vp[adjNotOk] = 0.
@@ -276,6 +315,390 @@ def curvature(coords,elems,edges,neighbours=1):
     return K,H,S,C,k1,k2,e1,e2
 
 
+# Surface decimation
+
+def _qemSum(Q,nodes,K):
+    """_Add the quadrics K (n,4,4) to the quadrics Q of the given nodes."""
+    nv = Q.shape[0]
+    Q = Q.reshape(nv,16)
+    K = K.reshape(-1,16)
+    for j in range(16):
+        Q[:,j] += bincount(nodes,weights=K[:,j],minlength=nv)
+
+
+def _qemPlanes(n,x,w):
+    """_Return the weighted quadrics of planes with normals n through x."""
+    p = concatenate([n,-dotpr(n,x)[:,newaxis]],axis=-1)
+    return w[:,newaxis,newaxis] * p[:,:,newaxis] * p[:,newaxis,:]
+
+
+def _qemTargets(Q,xa,xb):
+    """_Find the optimal collapse points and costs for a set of edges.
+
+    - `Q`: (n,4,4) summed quadrics of the edge end points
+    - `xa`,`xb`: (n,3) coordinates of the edge end points
+
+    Returns the (n,3) target points and the (n,) costs. The minimum of
+    the quadric is used if it is well defined and lies close to the edge.
+    Else, the best of the end points and the midpoint is used.
+    """
+    A = Q[:,:3,:3]
+    b = Q[:,:3,3]
+    x = stack([xa,xb,0.5*(xa+xb),0.5*(xa+xb)],axis=1)
+    det = linalg.det(A)
+    ok = abs(det) > 1.e-9 * ((A**2).sum(axis=-1).sum(axis=-1))**1.5
+    if ok.any():
+        xo = linalg.solve(A[ok],-b[ok])
+        near = length(xo-x[ok,2]) <= length(xb[ok]-xa[ok])
+        x[where(ok)[0][near],3] = xo[near]
+    Ax = (A[:,newaxis,:,:]*x[:,:,newaxis,:]).sum(axis=-1)
+    cost = (x*Ax).sum(axis=-1) + 2*(x*b[:,newaxis]).sum(axis=-1) + Q[:,newaxis,3,3]
+    i = cost.argmin(axis=1)
+    j = arange(x.shape[0])
+    return x[j,i],cost[j,i].clip(min=0.)
+
+
+def _csrMin(start,values,default):
+    """_Return the minimum of the values in each row of a CSR structure.
+
+    Empty rows get the default value.
+    """
+    ok = start[1:] > start[:-1]
+    res = full((start.shape[0]-1,),default,dtype=values.dtype)
+    if ok.any():
+        res[ok] = minimum.reduceat(values,start[:-1][ok])
+    return res
+
+
+def _csrGather(start,values,rows):
+    """_Gather the entries of the given rows from a CSR structure.
+
+    Returns two arrays: the index in `rows` and the value of all entries.
+    """
+    lens = start[rows+1] - start[rows]
+    rep = repeat(arange(rows.shape[0]),lens)
+    pos = repeat(start[rows]-cumsum(lens)+lens,lens) + arange(lens.sum())
+    return rep,values[pos]
+
+
+# The arguments of TriSurface.gts_coarsen after max_cost (max_fold is also
+# accepted by qemDecimate)
+_gts_coarsen_args = ['mid_vertex','length_cost','max_fold','volume_weight',
+                     'boundary_weight','shape_weight','progressive','log',
+                     'verbose']
+
+def qemDecimate(coords,elems,prop=None,min_edges=None,max_cost=None,border_weight=1000.,feature_angle=None,max_fold=60.):
+    """Decimate a triangulated surface by quadric error edge collapses.
+
+    This implements the surface simplification algorithm of Garland and
+    Heckbert: every vertex holds the sum of the quadrics of the planes
+    of its triangles, and edges are collapsed to the point of minimal
+    quadric error. The collapses are done in rounds: each round collapses
+    all edges whose cost is minimal over their neighborhood. Since these
+    collapses do not influence each other, they are all done at once.
+
+    Parameters:
+
+    - `coords`: (nnod,3) float array with the vertex coordinates.
+    - `elems`: (nelems,3) int array with the triangles.
+    - `prop`: optional (nelems,) int array of property numbers. Edges
+      between triangles with different property are treated as
+      feature edges.
+    - `min_edges`: int: stop when the number of edges falls below this value.
+      The default is half the number of edges.
+    - `max_cost`: float: do not collapse edges with a higher cost.
+    - `border_weight`: float: weight of the penalty quadrics keeping
+      vertices on the border and feature edges. If None, the vertices
+      on border and feature edges are not moved at all.
+    - `feature_angle`: float: if specified, edges where the normals of
+      the adjacent triangles differ more than this angle (in degrees)
+      are feature edges.
+    - `max_fold`: float: maximum change (in degrees) of the normal
+      of a triangle by a collapse. Collapses that would fold triangles
+      more are not done.
+
+    Vertices on non-manifold edges are never moved. Collapses that would
+    make the surface non-manifold are not done.
+
+    Returns a tuple (coords,elems,elnrs) where `coords` and `elems` define
+    the decimated surface and `elnrs` holds the numbers of the original
+    elements that have been kept. The latter can be used to retrieve
+    element properties.
+    """
+    X = asarray(coords,dtype=float64).copy()
+    F = asarray(elems).astype(Int)
+    nv = X.shape[0]
+    elnrs = arange(F.shape[0])
+
+    def getEdges(F):
+        """Return the edges and the number of faces connected to them"""
+        edg = F[:,[0,1,1,2,2,0]].reshape(-1,2)
+        edg.sort(axis=1)
+        key = edg[:,0].astype(int64) * nv + edg[:,1]
+        ukey,first,inv = unique(key,return_index=True,return_inverse=True)
+        return edg[first],first,inv,bincount(inv)
+
+    # Triangle planes
+    v0 = X[F[:,0]]
+    nrm = cross(X[F[:,1]]-v0,X[F[:,2]]-v0)
+    area = length(nrm)
+    nrm /= where(area>0.,area,1.)[:,newaxis]
+    area *= 0.5
+
+    # Vertex quadrics
+    Q = zeros((nv,4,4),dtype=float64)
+    _qemSum(Q,F.ravel(),repeat(_qemPlanes(nrm,v0,area),3,axis=0))
+
+    # Border and feature edges
+    edges,first,inv,cnt = getEdges(F)
+    if min_edges is None:
+        min_edges = edges.shape[0] // 2
+    last = zeros_like(first)
+    last[inv] = arange(inv.shape[0])
+    f1,f2 = first//3,last//3
+    border = cnt == 1
+    feature = zeros(edges.shape[0],dtype=bool)
+    two = cnt == 2
+    if feature_angle is not None:
+        feature[two] = dotpr(nrm[f1[two]],nrm[f2[two]]) < cosd(feature_angle)
+    if prop is not None:
+        prop = asarray(prop)
+        feature[two] |= prop[f1[two]] != prop[f2[two]]
+    locked = zeros(nv,dtype=bool)
+    locked[edges[cnt > 2].ravel()] = True
+    if border_weight is None:
+        locked[edges[border | feature].ravel()] = True
+    else:
+        for sel,f in [ (border|feature,f1), (feature,f2) ]:
+            e = edges[sel]
+            xa,xb = X[e[:,0]],X[e[:,1]]
+            m = normalize(cross(xb-xa,nrm[f[sel]]))
+            w = border_weight * ((xb-xa)**2).sum(axis=-1)
+            K = _qemPlanes(m,xa,w)
+            _qemSum(Q,e[:,0],K)
+            _qemSum(Q,e[:,1],K)
+    bvert = zeros(nv,dtype=bool)
+    bvert[edges[border].ravel()] = True
+    cosfold = cosd(max_fold)
+
+    def checkCollapse(ca,cb,cx,cn):
+        """Check the collapses of edges (ca,cb) to points cx"""
+        # Link condition: the common neighbors of a and b should
+        # be the opposite vertices of the faces on the edge
+        i,v = [ concatenate(t) for t in zip(_csrGather(nstart,nbrs,ca),_csrGather(nstart,nbrs,cb)) ]
+        k,c = unique(i.astype(int64)*nv+v,return_counts=True)
+        common = bincount((k[c>1]//nv).astype(Int),minlength=ca.size)
+        ok = common == cn
+        # Fold check on the remaining faces around a and b
+        i,f = [ concatenate(t) for t in zip(_csrGather(fstart,vfac,ca),_csrGather(fstart,vfac,cb)) ]
+        k,c = unique(i.astype(int64)*F.shape[0]+f,return_counts=True)
+        k = k[c==1]
+        i,f = k // F.shape[0], k % F.shape[0]
+        T = F[f]
+        x0 = X[T]
+        moved = (T == ca[i,newaxis]) | (T == cb[i,newaxis])
+        x1 = where(moved[...,newaxis],cx[i,newaxis],x0)
+        n0 = cross(x0[:,1]-x0[:,0],x0[:,2]-x0[:,0])
+        n1 = cross(x1[:,1]-x1[:,0],x1[:,2]-x1[:,0])
+        l0,l1 = length(n0),length(n1)
+        bad = (l1 <= 1.e-12*l0) | (dotpr(n0,n1) < cosfold*l0*l1)
+        ok &= bincount(i[bad].astype(Int),minlength=ca.size) == 0
+        return ok
+
+    while True:
+        edges,first,inv,cnt = getEdges(F)
+        ne = edges.shape[0]
+        if ne <= min_edges:
+            break
+
+        # Candidate edges and their collapse cost
+        a,b = edges[:,0],edges[:,1]
+        ok = ~(locked[a] | locked[b])
+        ok &= ~(bvert[a] & bvert[b] & (cnt > 1))
+        x,cost = _qemTargets(Q[a]+Q[b],X[a],X[b])
+        if max_cost is not None:
+            ok &= cost <= max_cost
+        cand = where(ok)[0]
+        if cand.size == 0:
+            break
+        # Only consider the cheaper half of the edges in each round
+        cand = cand[argsort(cost[cand],kind='mergesort')]
+        cand = cand[:max(cand.size//2,min(cand.size,1000))]
+        rank = full((ne,),ne,dtype=Int)
+        rank[cand] = arange(cand.size)
+
+        # Vertex neighbors and faces, in CSR format
+        src = concatenate([a,b])
+        order = argsort(src,kind='mergesort')
+        src = src[order]
+        nbrs = concatenate([b,a])[order]
+        eid = concatenate([arange(ne),arange(ne)])[order]
+        nstart = src.searchsorted(arange(nv+1))
+        vfac = argsort(F.ravel(),kind='mergesort')
+        fstart = F.ravel()[vfac].searchsorted(arange(nv+1))
+        vfac //= 3
+
+        # Select independent collapses: a collapse is done if its cost
+        # is minimal over the neighborhood and the collapse is valid.
+        # The neighborhood of a selected edge is then blocked and the
+        # selection is repeated on the remaining candidates.
+        blocked = zeros(nv,dtype=bool)
+        accepted = []
+        while cand.size > 0:
+            ca,cb = a[cand],b[cand]
+            m1 = _csrMin(nstart,rank[eid],ne)
+            m2 = minimum(m1,_csrMin(nstart,m1[nbrs],ne))
+            loc = (rank[cand] == m2[ca]) & (rank[cand] == m2[cb])
+            sel = cand[loc]
+            sel = sel[checkCollapse(a[sel],b[sel],x[sel],cnt[sel])]
+            accepted.append(sel)
+            v = concatenate([a[sel],b[sel]])
+            blocked[v] = True
+            blocked[_csrGather(nstart,nbrs,v)[1]] = True
+            rank[cand[loc]] = ne
+            cand = cand[~loc]
+            drop = blocked[a[cand]] | blocked[b[cand]]
+            rank[cand[drop]] = ne
+            cand = cand[~drop]
+        sel = concatenate(accepted)
+
+        # Do not go below min_edges
+        sel = sel[argsort(cost[sel],kind='mergesort')]
+        removed = cumsum(1+cnt[sel])
+        sel = sel[ne-removed+1+cnt[sel] > min_edges]
+        if sel.size == 0:
+            break
+
+        # Collapse the edges (b onto a)
+        sa,sb = a[sel],b[sel]
+        X[sa] = x[sel]
+        Q[sa] += Q[sb]
+        bvert[sa] |= bvert[sb]
+        renum = arange(nv)
+        renum[sb] = sa
+        F = renum[F]
+        keep = (F[:,0]!=F[:,1]) & (F[:,1]!=F[:,2]) & (F[:,2]!=F[:,0])
+        F = F[keep]
+        elnrs = elnrs[keep]
+
+    # Compact the result
+    used,F = unique(F,return_inverse=True)
+    return Coords(X[used]),F.reshape(-1,3).astype(Int),elnrs
+
+
+# Surface refinement
+
+def _pnMidpoints(x0,x1,n0,n1):
+    """_Return the midpoints of curved edges.
+
+    The edges from x0 to x1 are the cubic Bezier curves of PN triangles
+    with vertex normals n0 and n1. The midpoints lie on the smooth
+    surface interpolating the vertices with the given normals.
+    """
+    d = x1-x0
+    b1 = (2*x0+x1-dotpr(d,n0)[:,newaxis]*n0) / 3.
+    b2 = (2*x1+x0+dotpr(d,n1)[:,newaxis]*n1) / 3.
+    return (x0+3*b1+3*b2+x1) / 8.
+
+
+def refineEdges(coords,elems,max_edges=None,max_length=None,smooth=False,maxiter=100):
+    """Refine a triangulated surface by splitting its longest edges.
+
+    The refinement is done in rounds. In each round, the edges longer than
+    `max_length` and longer than half the length of the longest of them
+    are split in their middle. The triangles with one, two or three split
+    edges are replaced with respectively two, three or four triangles,
+    keeping the surface connectivity consistent.
+
+    Parameters:
+
+    - `coords`: (nnod,3) float array with the vertex coordinates.
+    - `elems`: (nelems,3) int array with the triangles.
+    - `max_edges`: int: stop refining when the number of edges would
+      exceed this value.
+    - `max_length`: float: target edge length: only edges longer than this
+      are split.
+    - `smooth`: bool: if True, the new vertices are placed on the smooth
+      surface defined by the vertices and their average normals, instead
+      of on the flat triangles.
+    - `maxiter`: maximum number of refinement rounds.
+
+    Returns a tuple (coords,elems,parent) where `coords` and `elems`
+    define the refined surface and `parent` holds for every new element
+    the number of the original element it is part of.
+    """
+    X = asarray(coords,dtype=float64)
+    F = asarray(elems).astype(Int)
+    parent = arange(F.shape[0])
+    if smooth:
+        N = geomtools.averageNormals(X,F,atNodes=True).astype(float64)
+
+    for it in range(maxiter):
+        fe,edges = Connectivity(F,eltype=Tri3).insertLevel(1)
+        ne = edges.shape[0]
+        L = length(X[edges[:,1]]-X[edges[:,0]])
+        cand = argsort(-L,kind='mergesort')
+        if max_length is not None:
+            cand = cand[L[cand] > max_length]
+        if cand.size == 0:
+            break
+        cand = cand[L[cand] >= 0.5*L[cand[0]]]
+        if max_edges is not None:
+            # Every split adds about 3 edges
+            cand = cand[:max(0,(max_edges-ne)//3)]
+            if cand.size == 0:
+                break
+
+        # Create the new vertices
+        nv = X.shape[0]
+        mid = full((ne,),-1,dtype=Int)
+        mid[cand] = arange(nv,nv+cand.size)
+        x0,x1 = X[edges[cand,0]],X[edges[cand,1]]
+        if smooth:
+            n0,n1 = N[edges[cand,0]],N[edges[cand,1]]
+            X = concatenate([X,_pnMidpoints(x0,x1,n0,n1)])
+            N = concatenate([N,normalize(n0+n1)])
+        else:
+            X = concatenate([X,0.5*(x0+x1)])
+
+        # Split the triangles, after rotating their vertices such that
+        # the split edges come first
+        M = mid[fe]
+        split = M >= 0
+        nsplit = split.sum(axis=1)
+        rot = where(nsplit==1,split.argmax(axis=1),(~split).argmax(axis=1)+1)
+        rows = arange(F.shape[0])[:,newaxis]
+        cols = (rot[:,newaxis] + arange(3)) % 3
+        W = F[rows,cols]
+        M = M[rows,cols]
+        parts = [ F[nsplit==0] ]
+        parents = [ parent[nsplit==0] ]
+
+        w = nsplit == 1
+        w0,w1,w2,m0 = W[w,0],W[w,1],W[w,2],M[w,0]
+        parts += [ column_stack([w0,m0,w2]), column_stack([m0,w1,w2]) ]
+        parents += [ parent[w] ] * 2
+
+        w = nsplit == 2
+        w0,w1,w2,m0,m1 = W[w,0],W[w,1],W[w,2],M[w,0],M[w,1]
+        diag = length(X[w0]-X[m1]) <= length(X[m0]-X[w2])
+        parts += [ column_stack([m0,w1,m1]),
+                   where(diag[:,newaxis],column_stack([w0,m0,m1]),column_stack([w0,m0,w2])),
+                   where(diag[:,newaxis],column_stack([w0,m1,w2]),column_stack([m0,m1,w2])) ]
+        parents += [ parent[w] ] * 3
+
+        w = nsplit == 3
+        w0,w1,w2,m0,m1,m2 = W[w,0],W[w,1],W[w,2],M[w,0],M[w,1],M[w,2]
+        parts += [ column_stack([w0,m0,m2]), column_stack([m0,w1,m1]),
+                   column_stack([m2,m1,w2]), column_stack([m0,m1,m2]) ]
+        parents += [ parent[w] ] * 4
+
+        F = concatenate(parts).astype(Int)
+        parent = concatenate(parents)
+
+    return Coords(X),F,parent
+
+
 ############################################################################
 
 
@@ -589,6 +1012,7 @@ class TriSurface(Mesh):
     #
 
     @classmethod
+    @instrumented(pf.DEBUG.FILE,'TriSurface.read')
     def read(clas,fn,ftype=None):
         """Read a surface from file.
 
@@ -635,6 +1059,7 @@ class TriSurface(Mesh):
         elif ftype == 'neu':
             data = fileread.read_gambit_neutral(fn)
         elif ftype == 'smesh':
+            from plugins import tetgen
             data = tetgen.readSurface(fn)
         else:
             raise "Unknown TriSurface type, cannot read file %s" % fn
@@ -643,6 +1068,7 @@ class TriSurface(Mesh):
         return TriSurface(*data)
 
 
+    @instrumented(pf.DEBUG.FILE,'TriSurface.write')
     def write(self,fname,ftype=None,color=None):
         """Write the surface to file.
 
@@ -673,6 +1099,7 @@ class TriSurface(Mesh):
             elif ftype == 'off':
                 filewrite.writeOFF(fname,self.coords,self.elems)
             elif ftype == 'smesh':
+                from plugins import tetgen
                 tetgen.writeSurface(fname,self.coords,self.elems)
             pf.message("Wrote %s vertices, %s elems" % (self.ncoords(),self.nelems()))
         else:
@@ -947,7 +1374,7 @@ class TriSurface(Mesh):
         return self.peri
 
 
-    def quality(self):
+    def quality(self,nproc=None,blocksize=None):
         """Compute a quality measure for the triangle schapes.
 
         The quality of a triangle is defined as the ratio of the square
@@ -955,19 +1382,31 @@ class TriSurface(Mesh):
         ratio for an equilateral triangle with the same area.  The quality
         is then one for an equilateral triangle and tends to zero for a
         very stretched triangle.
+
+        `nproc` and `blocksize` can be specified to compute the quality
+        block-wise, possibly in parallel (see :func:`multi.blockwise`).
+        The edge data of the surface are then not computed and stored.
         """
+        import multi
+        if multi.blocking(nproc,blocksize):
+            return multi.blockwise(_qualityAspect,self.elems,(self.coords,),nproc,blocksize)[0]
         self._compute_data()
         return self.qual
 
 
-    def aspectRatio(self):
+    def aspectRatio(self,nproc=None,blocksize=None):
         """Return the apect ratio of the triangles of the surface.
 
         The aspect ratio of a triangle is the ratio of the longest edge
         over the smallest altitude of the triangle.
 
         Equilateral triangles have the smallest edge ratio (2 over square root 3).
+
+        `nproc` and `blocksize` can be used as in :meth:`quality`.
         """
+        import multi
+        if multi.blocking(nproc,blocksize):
+            return multi.blockwise(_qualityAspect,self.elems,(self.coords,),nproc,blocksize)[1]
         self._compute_data()
         return self.aspect
 
@@ -1044,43 +1483,39 @@ Quality: %s .. %s
         X is a (nX,3) shaped array of points.
         If return_points = True, a second value is returned: an array with
         the closest (foot)points matching X.
+
+        The time spent in the three stages of the computation is recorded
+        by the instrumentation if the MESH debug level is set.
         """
-        from timer import Timer
-        t = Timer()
         # distance from vertices
-        Vp = self.coords
-        res = geomtools.vertexDistance(X,Vp,return_points) # OKdist, (OKpoints)
-        dist = res[0]
-        if return_points:
-            points = res[1]
-        print("Vertex distance: %s seconds" % t.seconds(True))
-        #print dist
+        with timing('TriSurface.distanceOfPoints/vertex',pf.DEBUG.MESH,X.size):
+            Vp = self.coords
+            res = geomtools.vertexDistance(X,Vp,return_points) # OKdist, (OKpoints)
+            dist = res[0]
+            if return_points:
+                points = res[1]
 
         # distance from edges
-        Ep = self.coords[self.getEdges()]
-        res = geomtools.edgeDistance(X,Ep,return_points) # OKpid, OKdist, (OKpoints)
-        okE,distE = res[:2]
-        closer = distE < dist[okE]
-        #print okE,closer
-        if closer.size > 0:
-            dist[okE[closer]] = distE[closer]
-            if return_points:
-                points[okE[closer]] = res[2][closer]
-        print("Edge distance: %s seconds" % t.seconds(True))
-        #print dist
+        with timing('TriSurface.distanceOfPoints/edge',pf.DEBUG.MESH,X.size):
+            Ep = self.coords[self.getEdges()]
+            res = geomtools.edgeDistance(X,Ep,return_points) # OKpid, OKdist, (OKpoints)
+            okE,distE = res[:2]
+            closer = distE < dist[okE]
+            if closer.size > 0:
+                dist[okE[closer]] = distE[closer]
+                if return_points:
+                    points[okE[closer]] = res[2][closer]
 
         # distance from faces
-        Fp = self.coords[self.elems]
-        res = geomtools.faceDistance(X,Fp,return_points) # OKpid, OKdist, (OKpoints)
-        okF,distF = res[:2]
-        closer = distF < dist[okF]
-        #print okF,closer
-        if closer.size > 0:
-            dist[okF[closer]] = distF[closer]
-            if return_points:
-                points[okF[closer]] = res[2][closer]
-        print("Face distance: %s seconds" % t.seconds(True))
-        #print dist
+        with timing('TriSurface.distanceOfPoints/face',pf.DEBUG.MESH,X.size):
+            Fp = self.coords[self.elems]
+            res = geomtools.faceDistance(X,Fp,return_points) # OKpid, OKdist, (OKpoints)
+            okF,distF = res[:2]
+            closer = distF < dist[okF]
+            if closer.size > 0:
+                dist[okF[closer]] = distF[closer]
+                if return_points:
+                    points[okF[closer]] = res[2][closer]
 
         if return_points:
             return dist,points
@@ -1672,6 +2107,127 @@ Quality: %s .. %s
             return Mesh(M.coords,elems,prop=prop)
 
 
+    def intersectionWithPlanes(self,p,n,rtol=1.e-6):
+        """Return the intersection lines with a set of parallel planes.
+
+        - `p`: (nplanes,3) array: a point on each of the planes.
+        - `n`: (3,) array: the common normal vector of the planes.
+
+        This computes the same result as calling
+        :meth:`intersectionWithPlane` for each of the planes, but
+        it does so in a single pass over the surface:
+        the height of the vertices along `n` is computed once,
+        each triangle is only paired with the planes between
+        its lowest and highest vertex, and all intersection segments
+        are computed together. Intersection points are identified by
+        the edge or vertex they are on, so that no fusing of nodes
+        is needed.
+
+        Vertices closer to a plane than `rtol` times the height range
+        of the surface are considered to lie in the plane. This avoids
+        tiny segments due to rounding of the vertex heights.
+
+        Returns a list of plex-2 Meshes, one for every plane,
+        like the return value of :meth:`intersectionWithPlane`.
+        """
+        n = normalize(asarray(n,dtype=float64).reshape(3))
+        p = asarray(p,dtype=float64).reshape(-1,3)
+        nplanes = p.shape[0]
+        # Plane and vertex heights along n; planes are sorted for bucketing
+        H = dot(p,n)
+        srt = argsort(H)
+        H = H[srt]
+        h = dot(self.coords.astype(float64),n)
+        tol = rtol * (h.max()-h.min())
+
+        def height(x,k):
+            """Signed distance of heights x from plane(s) k"""
+            d = x - H[k]
+            d[abs(d) <= tol] = 0.
+            return d
+
+        # Pair each triangle with the planes in its height range
+        ele = self.elems
+        hele = h[ele]
+        lo = H.searchsorted(hele.min(axis=1)-tol,'left')
+        hi = H.searchsorted(hele.max(axis=1)+tol,'right')
+        cnt = hi - lo
+        tri = repeat(arange(ele.shape[0]),cnt)
+        pln = repeat(lo-cumsum(cnt)+cnt,cnt) + arange(cnt.sum())
+
+        edg = self.getEdges()
+        fac = self.getElemEdges()
+        ncoords = self.ncoords()
+        nedg = edg.shape[0]
+        nkey = nedg + ncoords
+
+        # Signed distances of the vertices and the edge ends
+        d = height(hele[tri],pln.reshape(-1,1))
+        ins = d == 0.
+        de = height(h[edg[fac[tri]]],pln.reshape(-1,1,1))
+        cut = (de[...,0]*de[...,1]) < 0.
+
+        # Every intersection point is keyed on plane and edge/vertex
+        base = pln.astype(int64).reshape(-1,1) * nkey
+        keys = concatenate([base+fac[tri],base+nedg+ele[tri]],axis=1)
+        mask = concatenate([cut,ins],axis=1)
+
+        # Triangles with exactly two points give a single segment
+        two = (mask.sum(axis=1) == 2)
+        seg = keys[two][mask[two]].reshape(-1,2)
+
+        # Triangles lying in the plane contribute their border edges
+        flat = ins.all(axis=1)
+        if flat.any():
+            ekeys = (pln[flat].astype(int64).reshape(-1,1)*nedg + fac[tri[flat]]).reshape(-1)
+            ekeys,ecnt = unique(ekeys,return_counts=True)
+            ekeys = ekeys[ecnt==1]
+            epln,eid = ekeys // nedg, ekeys % nedg
+            vkeys = epln.reshape(-1,1) * nkey + nedg + edg[eid]
+            seg = concatenate([seg,vkeys])
+
+        # Remove duplicate segments (edges shared by triangles)
+        seg.sort(axis=1)
+        if seg.shape[0] > 0:
+            seg = seg[lexsort((seg[:,1],seg[:,0]))]
+            keep = ones(seg.shape[0],dtype=bool)
+            keep[1:] = (seg[1:] != seg[:-1]).any(axis=1)
+            seg = seg[keep]
+
+        # Number the points and compute their coordinates
+        ukeys,elems = unique(seg,return_inverse=True)
+        elems = elems.reshape(-1,2)
+        upln,uid = ukeys // nkey, ukeys % nkey
+        x = zeros((ukeys.shape[0],3),dtype=float64)
+        isv = uid >= nedg
+        x[isv] = self.coords[uid[isv]-nedg]
+        iedg = edg[uid[~isv]]
+        x0 = self.coords[iedg[:,0]].astype(float64)
+        x1 = self.coords[iedg[:,1]].astype(float64)
+        d0 = height(h[iedg[:,0]],upln[~isv])
+        d1 = height(h[iedg[:,1]],upln[~isv])
+        x[~isv] = x0 + (d0/(d0-d1)).reshape(-1,1) * (x1-x0)
+        x = Coords(x)
+
+        # Split by plane: keys, and thus nodes, are sorted by plane
+        xstart = upln.searchsorted(arange(nplanes+1))
+        spln = upln[elems[:,0]]
+        order = argsort(spln,kind='mergesort')
+        elems,spln = elems[order],spln[order]
+        estart = spln.searchsorted(arange(nplanes+1))
+        res = [None] * nplanes
+        for i in range(nplanes):
+            e = elems[estart[i]:estart[i+1]] - xstart[i]
+            if e.shape[0] == 0:
+                M = Mesh(Coords(),Connectivity(nplex=2,eltype='line2'))
+            else:
+                parts = connectedLineElems(e)
+                prop = concatenate([ [j]*q.nelems() for j,q in enumerate(parts)])
+                M = Mesh(x[xstart[i]:xstart[i+1]],concatenate(parts,axis=0),prop=prop,eltype='line2')
+            res[srt[i]] = M
+        return res
+
+
     def slice(self,dir=0,nplanes=20):
         """Intersect a surface with a sequence of planes.
 
@@ -1682,13 +2238,14 @@ Quality: %s .. %s
         values, i.e. a list of Meshes, one for every cutting plane.
         In each Mesh the simply connected parts are identified by
         property number.
+        All planes are handled together by :meth:`intersectionWithPlanes`.
         """
         o = self.center()
         if type(dir) is int:
             dir = unitVector(dir)
         xmin,xmax = self.coords.directionalExtremes(dir,o)
         P = Coords.interpolate(xmin,xmax,nplanes)
-        return [ self.intersectionWithPlane(p,dir) for p in P ]
+        return self.intersectionWithPlanes(P,dir)
 
 
     @deprecation("depr_patchextension")
@@ -1752,11 +2309,12 @@ Quality: %s .. %s
 ##################  Smooth a surface #############################
 
 
-    def smooth(self,method='lowpass',iterations=1,lambda_value=0.5,neighbourhood=1,alpha=0.0,beta=0.2):
+    def smooth(self,method='lowpass',iterations=1,lambda_value=0.5,neighbourhood=1,alpha=0.0,beta=0.2,weight=None):
         """Smooth the surface.
 
         Returns a TriSurface which is a smoothed version of the original.
         Two smoothing methods are available: 'lowpass' and 'laplace'.
+        The border vertices are not moved.
 
         Parameters:
 
@@ -1768,6 +2326,10 @@ Quality: %s .. %s
 
         - `neighbourhood`: int: maximum number of edges followed in defining
           the node neighbourhood
+        - `weight`: the weights of the neighbours: None (uniform),
+          'inversedistance' or 'cotangent'. See
+          :func:`smoothing.edgeWeights`. Cotangent weights can only be used
+          with a neighbourhood of 1.
 
         Extra parameters for 'laplace':
 
@@ -1775,39 +2337,23 @@ Quality: %s .. %s
 
         Returns the smoothed TriSurface
         """
+        from smoothing import Laplacian,edgeWeights,neighbourEdges
         method = method.lower()
 
-        # find adjacency
-        adj = adjacencyArrays(self.getEdges(),nsteps=neighbourhood)[1:]
-        adj = column_stack(adj)
-        # find interior vertices
-        bound_edges = self.borderEdgeNrs()
-        inter_vertex = resize(True,self.ncoords())
-        inter_vertex[unique(self.getEdges()[bound_edges])] = False
-        # calculate weights
-        w = ones(adj.shape,dtype=float)
-        w[adj<0] = 0.
-        val = (adj>=0).sum(-1).reshape(-1,1)
-        w /= val
-        w = w.reshape(adj.shape[0],adj.shape[1],1)
-
-        # recalculate vertices
+        edges = self.getEdges()
+        if neighbourhood > 1:
+            if weight == 'cotangent':
+                raise ValueError,"Cotangent weights require a neighbourhood of 1"
+            edges = neighbourEdges(edges,neighbourhood)
+        w = edgeWeights(self.coords,edges,weight,self.elems)
+        # the border vertices are kept fixed
+        fixed = unique(self.getEdges()[self.borderEdgeNrs()])
+        L = Laplacian(edges,self.ncoords(),w,fixed=fixed)
 
         if method == 'laplace':
-            xo = self.coords
-            x = self.coords.copy()
-            for step in range(iterations):
-                xn = x + lambda_value*(w*(x[adj]-x.reshape(-1,1,3))).sum(1)
-                xd = xn - (alpha*xo + (1-alpha)*x)
-                x[inter_vertex] = xn[inter_vertex] - (beta*xd[inter_vertex] + (1-beta)*(w[inter_vertex]*xd[adj[inter_vertex]]).sum(1))
-
+            x = L.hc(self.coords,iterations,lambda_value,alpha,beta)
         else: # default: lowpass
-            k = 0.1
-            mu_value = -lambda_value/(1-k*lambda_value)
-            x = self.coords.copy()
-            for step in range(iterations):
-                x[inter_vertex] = x[inter_vertex] + lambda_value*(w[inter_vertex]*(x[adj[inter_vertex]]-x[inter_vertex].reshape(-1,1,3))).sum(1)
-                x[inter_vertex] = x[inter_vertex] + mu_value*(w[inter_vertex]*(x[adj[inter_vertex]]-x[inter_vertex].reshape(-1,1,3))).sum(1)
+            x = L.lowpass(self.coords,iterations,lambda_value,k=0.1)
 
         return TriSurface(x,self.elems,prop=self.prop)
 
@@ -1822,34 +2368,43 @@ Quality: %s .. %s
         return self.smooth('laplace',iterations,lambda_value,alpha=alpha,beta=beta)
 
 
-    def refine(self,max_edges=None,min_cost=None,method='gts'):
+    def refine(self,max_edges=None,min_cost=None,method='split',smooth=False):
         """Refine the TriSurface.
 
         Refining a TriSurface means increasing the number of triangles and
         reducing their size, while keeping the changes to the modeled surface
         minimal.
-        Construct a refined version of the surface.
-        This uses the external program `gtsrefine`. The surface
-        should be a closed orientable non-intersecting manifold.
-        Use the :meth:`check` method to find out.
 
         Parameters:
 
         - `max_edges`: int: stop the refining process if the number of
-          edges exceeds this value
+          edges exceeds this value. If neither `max_edges` nor `min_cost`
+          is specified, the default is twice the current number of edges.
         - `min_cost`: float: stop the refining process if the cost of refining
-          an edge is smaller
-        - `log`: boolean: log the evolution of the cost
-        - `verbose`: boolean: print statistics about the surface
+          an edge is smaller. The cost of an edge is its length.
+        - `method`: 'split' or 'gts'. The default 'split' method splits
+          the longest edges in vectorized rounds (see :func:`refineEdges`)
+          and keeps the property numbers of the surface.
+          The 'gts' method uses the external program `gtsrefine` (see
+          :meth:`gts_refine`). The surface should then be a closed
+          orientable non-intersecting manifold.
+        - `smooth`: bool: only for the 'split' method: if True, the new
+          vertices are placed on a smooth surface through the vertices,
+          instead of on the flat triangles.
+
+        Returns the refined TriSurface.
         """
         if method == 'gts':
             return self.gts_refine(max_edges,min_cost)
 
-        # THIS IS WORK IN PROGRESS
-        self.getElemEdges()
-        edglen = length(self.coords[self.edges[:,1]]-self.coords[self.edges[:,0]])
-        print(edglen)
-        return self
+        if max_edges is None and min_cost is None:
+            max_edges = self.nedges() * 2
+        x,e,parent = refineEdges(self.coords,self.elems,max_edges,min_cost,smooth)
+        if self.prop is None:
+            prop = None
+        else:
+            prop = self.prop[parent]
+        return TriSurface(x,e,prop=prop)
 
 
 ###################################################################
@@ -1988,7 +2543,57 @@ Quality: %s .. %s
         #
 
 
-    def coarsen(self,min_edges=None,max_cost=None,
+    def coarsen(self,min_edges=None,max_cost=None,*args,**kargs):
+        """Coarsen the surface.
+
+        Construct a coarsened version of the surface, with less edges,
+        while keeping the changes to the modeled surface minimal.
+
+        Parameters:
+
+        - `min_edges`: int: stop the coarsening process if the number of
+          edges was to fall below it. The default is half the number of
+          edges of the surface.
+        - `max_cost`: float: stop the coarsening process if the cost of
+          collapsing an edge is larger
+        - `method`: 'qem' or 'gts', to be specified as a keyword argument.
+          The default 'qem' method collapses edges
+          in order of increasing quadric error (see :func:`qemDecimate`).
+          It keeps the property numbers of the surface. Extra arguments
+          `border_weight`, `feature_angle` and `max_fold` are passed to
+          :func:`qemDecimate`.
+          The 'gts' method uses the external program `gtscoarsen`
+          (see :meth:`gts_coarsen`), to which any extra arguments are passed.
+
+        .. note:: Previously, this method always used `gtscoarsen`.
+          Calls passing the gts specific arguments (`mid_vertex`,
+          `length_cost`, `volume_weight`, `boundary_weight`,
+          `shape_weight`, `progressive`, `log`, `verbose`), either as
+          keywords or positionally after `max_cost`, now need
+          ``method='gts'``; else a ValueError is raised.
+
+        Returns the coarsened TriSurface.
+        """
+        method = kargs.pop('method','qem')
+        if method == 'gts':
+            return self.gts_coarsen(min_edges,max_cost,*args,**kargs)
+        gtsargs = [ k for k in _gts_coarsen_args if k in kargs and k != 'max_fold' ]
+        if args or gtsargs:
+            if args:
+                gtsargs = _gts_coarsen_args[:len(args)] + gtsargs
+            raise ValueError,"The arguments %s are only accepted by the 'gts' coarsening method: pass method='gts' (the default method is now 'qem')" % ', '.join(gtsargs)
+        if method != 'qem':
+            raise ValueError,"Invalid coarsening method: %s" % method
+
+        x,e,elnrs = qemDecimate(self.coords,self.elems,self.prop,min_edges,max_cost,**kargs)
+        if self.prop is None:
+            prop = None
+        else:
+            prop = self.prop[elnrs]
+        return TriSurface(x,e,prop=prop)
+
+
+    def gts_coarsen(self,min_edges=None,max_cost=None,
                 mid_vertex=False, length_cost=False, max_fold=1.0,
                 volume_weight=0.5, boundary_weight=0.5, shape_weight=0.0,
                 progressive=False, log=False, verbose=False):
@@ -2420,19 +3025,53 @@ def intersectSurfaceWithSegments(s1, segm, atol=1.e-5):
     return p[win], il[win], it[win]
 
 
-import pyformex_gts
-pyformex_gts.install_more_trisurface_methods()
+# TriSurface methods installed by plugin modules, with the name of the
+# function installing them. The plugins are only loaded when one of their
+# methods is used.
+_plugin_methods = {
+    'pyformex_gts': ('install_more_trisurface_methods',['boolean','intersection','gtsset']),
+    'tetgen': ('install_more_trisurface_methods',['tetmesh','checkSelfIntersectionsWithTetgen']),
+    'vmtk_itf': ('install_trisurface_methods',['centerline','remesh']),
+    }
 
+def _loadPlugin(module):
+    """Load a plugin module and install its TriSurface methods."""
+    import importlib
+    mod = importlib.import_module('plugins.'+module)
+    getattr(mod,_plugin_methods[module][0])()
 
-import tetgen
-tetgen.install_more_trisurface_methods()
 
+def _pluginMethod(module,name):
+    """Create a TriSurface method that loads its plugin on first use.
 
-import vmtk_itf
-
+    The loaded plugin replaces the method with its own implementation,
+    which is then called.
+    """
+    def method(self,*args,**kargs):
+        _loadPlugin(module)
+        if getattr(TriSurface,name).im_func is method:
+            raise RuntimeError,"Plugin %s did not install TriSurface.%s" % (module,name)
+        return getattr(self,name)(*args,**kargs)
+    method.__name__ = name
+    method.__doc__ = "See :mod:`plugins.%s`. The plugin is loaded on first use." % module
+    return method
+
+for _module in _plugin_methods:
+    for _name in _plugin_methods[_module][1]:
+        setattr(TriSurface,_name,_pluginMethod(_module,_name))
+del _module,_name
+
+
+def _webgl(self,name,caption=None):
+    """Create a WebGL model of the surface.
+
+    See :func:`webgl.surface2webgl`. The webgl module (which requires the
+    GUI) is only loaded when this method is used.
+    """
+    import webgl
+    return webgl.surface2webgl(self,name,caption)
 
-import webgl
-TriSurface.webgl = webgl.surface2webgl
+TriSurface.webgl = _webgl
 
 
 # End
@@ -31,7 +31,7 @@ from __future__ import print_function
 
 import pyformex as pf
 from track import TrackedDict
-from pyformex import utils
+import utils
 import os,sys
 import cPickle
 import gzip
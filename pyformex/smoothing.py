@@ -0,0 +1,279 @@
+# $Id$
+##
+##  This file is part of pyFormex 0.8.9  (Fri Nov  9 10:49:51 CET 2012)
+##  pyFormex is a tool for generating, manipulating and transforming 3D
+##  geometrical models by sequences of mathematical operations.
+##  Home page: http://pyformex.org
+##  Project page:  http://savannah.nongnu.org/projects/pyformex/
+##  Copyright 2004-2012 (C) Benedict Verhegghe (benedict.verhegghe@ugent.be)
+##  Distributed under the GNU General Public License version 3 or later.
+##
+##
+##  This program is free software: you can redistribute it and/or modify
+##  it under the terms of the GNU General Public License as published by
+##  the Free Software Foundation, either version 3 of the License, or
+##  (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+##  GNU General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see http://www.gnu.org/licenses/.
+##
+"""Laplacian smoothing of meshes.
+
+This module provides a sparse weighted Laplacian operator on the nodes
+of a mesh and the smoothing algorithms built on it: the lowpass filter
+of Taubin and the Laplacian smoothing with HC shrinkage compensation of
+Vollmer et al. The operator is assembled once in compressed sparse row
+(CSR) format, and each smoothing step is a sparse matrix-vector product.
+If scipy is available, its sparse matrices are used for the products.
+
+The smoothing methods of :class:`Mesh` and :class:`TriSurface` are
+implemented with this module.
+"""
+from __future__ import print_function
+
+from coords import *
+
+
+def edgeWeights(coords,edges,weight=None,elems=None):
+    """Compute weights for the edges of a mesh.
+
+    Parameters:
+
+    - `coords`: (ncoords,3) float array with the nodal coordinates.
+    - `edges`: (nedges,2) int array with the (unique) edges.
+    - `weight`: the type of weights. One of:
+
+      - None or 'uniform': all weights are 1.
+      - 'inversedistance': the inverse of the edge lengths.
+      - 'distance': the edge lengths.
+      - 'cotangent': the cotangent weights, i.e. half the sum of the
+        cotangents of the angles opposite to the edge in the adjacent
+        triangles. This requires the `elems` of a triangle mesh.
+        Negative weights (from obtuse triangles) are set to zero.
+
+    - `elems`: (nelems,3) int array with the triangles having the
+      specified edges. Only required for 'cotangent' weights.
+
+    Returns an (nedges,) float array with the edge weights.
+
+    Example:
+
+    >>> X = [[0.,0.,0.],[1.,0.,0.],[1.,1.,0.],[0.,1.,0.]]
+    >>> E = [[0,1],[1,2],[0,2],[2,3],[0,3]]
+    >>> print(edgeWeights(X,E,'inversedistance').round(4))
+    [ 1.      1.      0.7071  1.      1.    ]
+    >>> print(edgeWeights(X,E,'cotangent',[[0,1,2],[0,2,3]]).round(4))
+    [ 0.5  0.5  0.   0.5  0.5]
+    """
+    X = asarray(coords,dtype=float64)
+    edges = asarray(edges)
+    if weight in [None,'uniform']:
+        return ones(edges.shape[0])
+
+    if weight in ['distance','inversedistance']:
+        w = length(X[edges[:,1]]-X[edges[:,0]])
+        if weight == 'inversedistance':
+            nz = w != 0.
+            w[nz] = 1. / w[nz]
+            w[~nz] = 1.
+        return w
+
+    if weight == 'cotangent':
+        if elems is None or asarray(elems).shape[-1] != 3:
+            raise ValueError,"Cotangent weights require a triangle mesh"
+        elems = asarray(elems)
+        n = X.shape[0]
+        ekey = edges.min(axis=1).astype(int64)*n + edges.max(axis=1)
+        srt = ekey.argsort()
+        w = zeros(edges.shape[0])
+        for k in range(3):
+            i,j,o = elems[:,(k+1)%3],elems[:,(k+2)%3],elems[:,k]
+            u,v = X[i]-X[o],X[j]-X[o]
+            cot = dotpr(u,v) / maximum(length(cross(u,v)),1.e-30)
+            key = minimum(i,j).astype(int64)*n + maximum(i,j)
+            pos = srt[ekey[srt].searchsorted(key).clip(0,srt.size-1)]
+            ok = ekey[pos] == key
+            w += 0.5 * bincount(pos[ok],weights=cot[ok],minlength=w.size)
+        return w.clip(min=0.)
+
+    raise ValueError,"Invalid weight type: %s" % weight
+
+
+class Laplacian(object):
+    """A sparse weighted averaging operator on the nodes of a mesh.
+
+    The operator replaces each node value by the weighted average of the
+    values of its neighbours. The Laplacian of a nodal field x is then
+    ``L.average(x) - x``.
+
+    Parameters:
+
+    - `edges`: (nedges,2) int array with the (unique) connections between
+      the nodes.
+    - `ncoords`: int: number of nodes. Default is the highest node number
+      in `edges` plus 1.
+    - `weights`: (nedges,) float array with (symmetric) edge weights,
+      e.g. as computed by :func:`edgeWeights`. Default is uniform weights.
+    - `border`: None, or a boolean array flagging the border nodes.
+      Border nodes are only averaged over their border neighbours. This
+      avoids shrinking of the border into the mesh.
+    - `fixed`: None, or a boolean array or an index flagging nodes that
+      keep their value. Nodes without neighbours are always fixed.
+
+    Example:
+
+    >>> L = Laplacian([[0,1],[1,2]],fixed=[0,2])
+    >>> print(L.average([0.,3.,1.]))
+    [ 0.   0.5  1. ]
+    """
+
+    def __init__(self,edges,ncoords=None,weights=None,border=None,fixed=None):
+        """Assemble the CSR operator."""
+        edges = asarray(edges).reshape(-1,2)
+        if ncoords is None:
+            ncoords = edges.max() + 1 if edges.size > 0 else 0
+        self.n = n = ncoords
+        if weights is None:
+            weights = ones(edges.shape[0])
+        rows = concatenate([edges[:,0],edges[:,1]])
+        cols = concatenate([edges[:,1],edges[:,0]])
+        w = concatenate([weights,weights]).astype(float64)
+        ok = (w != 0.) & (rows != cols)
+        if border is not None:
+            border = asarray(border)
+            ok &= ~border[rows] | border[cols]
+        if fixed is not None:
+            isfixed = zeros(n,dtype=bool)
+            isfixed[fixed] = True
+            ok &= ~isfixed[rows]
+        rows,cols,w = rows[ok],cols[ok],w[ok]
+
+        # Normalize the rows, and add unit diagonal entries for fixed nodes
+        wsum = bincount(rows,weights=w,minlength=n)
+        w /= wsum[rows]
+        fix = where(wsum == 0.)[0]
+        rows = concatenate([rows,fix])
+        cols = concatenate([cols,fix])
+        w = concatenate([w,ones(fix.size)])
+        srt = rows.argsort()
+        self.indices = cols[srt].astype(Int)
+        self.data = w[srt]
+        self.indptr = concatenate([[0],cumsum(bincount(rows,minlength=n))]).astype(Int)
+        try:
+            from scipy.sparse import csr_matrix
+            self.matrix = csr_matrix((self.data,self.indices,self.indptr),shape=(n,n))
+        except ImportError:
+            self.matrix = None
+
+
+    def average(self,x):
+        """Return the weighted average of the neighbour values.
+
+        - `x`: (ncoords,...) array with the nodal values.
+
+        Returns a float array with the same shape as x.
+        """
+        x = asarray(x,dtype=float64)
+        if self.n == 0:
+            return x.copy()
+        if self.matrix is not None:
+            return self.matrix.dot(x.reshape(self.n,-1)).reshape(x.shape)
+        y = self.data.reshape((-1,)+(1,)*(x.ndim-1)) * x[self.indices]
+        return add.reduceat(y,self.indptr[:-1])
+
+
+    def step(self,f):
+        """Return a function performing a smoothing step with factor f.
+
+        The returned function maps the nodal values x to
+        ``x + f * (self.average(x) - x)``. With scipy, the step is
+        precomputed as a single sparse matrix.
+        """
+        if self.matrix is not None:
+            from scipy.sparse import identity
+            B = (f*self.matrix + (1.-f)*identity(self.n)).tocsr()
+            return lambda x: B.dot(x.reshape(self.n,-1)).reshape(x.shape)
+        return lambda x: x + f * (self.average(x) - x)
+
+
+    def lowpass(self,x,iterations=1,lamb=0.5,mu=None,k=0.1):
+        """Apply Taubin's lowpass filter to a nodal field.
+
+        Each iteration consists of a smoothing step with a positive factor
+        `lamb` followed by an inflating step with a negative factor `mu`.
+
+        - `x`: (ncoords,...) array with the nodal values.
+        - `iterations`: int: number of iterations.
+        - `lamb`: float: the positive scale factor.
+        - `mu`: float: the negative scale factor. If not specified, it is
+          computed from the pass-band frequency `k` as
+          ``-lamb/(1-k*lamb)``.
+
+        Returns the smoothed values as a float array.
+        """
+        if mu is None:
+            if lamb*k == 1:
+                raise ValueError,"Cannot assign values of lamb and k which result in lamb*k==1"
+            mu = -lamb/(1-k*lamb)
+        x = asarray(x,dtype=float64)
+        if self.n == 0:
+            return x.copy()
+        smooth,inflate = self.step(lamb),self.step(mu)
+        for i in range(iterations):
+            x = inflate(smooth(x))
+        return x
+
+
+    def hc(self,x,iterations=1,lamb=1.,alpha=0.,beta=0.2):
+        """Apply Laplacian smoothing with HC shrinkage compensation.
+
+        Each iteration performs a Laplacian smoothing step with factor
+        `lamb`, and then pushes the nodes back towards a combination of
+        the original and the previous positions.
+
+        - `x`: (ncoords,...) array with the nodal values.
+        - `iterations`: int: number of iterations.
+        - `lamb`: float: factor of the Laplacian smoothing step.
+        - `alpha`: float: weight of the original positions in the
+          compensation.
+        - `beta`: float: weight of the node itself versus its neighbours
+          in the compensation.
+
+        Returns the smoothed values as a float array.
+        """
+        xo = x = asarray(x,dtype=float64)
+        if self.n == 0:
+            return x.copy()
+        smooth = self.step(lamb)
+        for i in range(iterations):
+            xn = smooth(x)
+            d = xn - (alpha*xo + (1.-alpha)*x)
+            x = xn - (beta*d + (1.-beta)*self.average(d))
+        return x
+
+
+def neighbourEdges(edges,nsteps=1):
+    """Return the node pairs connected by a path of at most nsteps edges.
+
+    - `edges`: (nedges,2) int array with the edges of a mesh.
+    - `nsteps`: int: maximum number of edges in the path.
+
+    Returns an (npairs,2) int array with the connected node pairs,
+    with the lowest node number first.
+    """
+    from connectivity import adjacencyArrays
+    edges = asarray(edges)
+    if nsteps <= 1:
+        return edges
+    adj = column_stack(adjacencyArrays(edges,nsteps=nsteps)[1:])
+    i,j = where(adj >= 0)
+    e = column_stack([i,adj[i,j]])
+    return e[e[:,0] < e[:,1]]
+
+
+# End
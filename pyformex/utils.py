@@ -125,12 +125,19 @@ def hasModule(name,check=False):
 
     By default, the module is only checked on the first call.
     The result is remembered in the the_version dict.
+    The result is also kept in a persistent cache (see :func:`detectCache`),
+    so that the module does not have to be imported in later sessions,
+    as long as it is found at the same place and has not been changed.
     The optional argument check==True forces a new detection.
     """
     if name in the_version and not check:
         return the_version[name]
-    else:
-        return checkModule(name)
+    if not check:
+        version = _cachedModule(name)
+        if version is not None:
+            the_version[name] = version
+            return version
+    return checkModule(name)
 
 
 def requireModule(name):
@@ -217,6 +224,7 @@ def checkModule(name,ver=(),fatal=False,quiet=False):
     _congratulations(name,m,'module',fatal,quiet=quiet)
     #if version:
     the_version[name] = m
+    _storeModule(name,m)
     return m
 
 
@@ -228,11 +236,19 @@ def hasExternal(name,force=False):
 
     The external command is only checked on the first call.
     The result is remembered in the the_external dict.
+    The result is also kept in a persistent cache (see :func:`detectCache`),
+    so that the command does not have to be run again in later sessions,
+    as long as the executable is not changed.
+    The optional argument force==True forces a new detection.
     """
     if name in the_external and not force:
         return the_external[name]
-    else:
-        return checkExternal(name)
+    if not force:
+        version = _cachedExternal(name)
+        if version is not None:
+            the_external[name] = version
+            return version
+    return checkExternal(name)
 
 
 def checkExternal(name=None,command=None,answer=None,quiet=False):
@@ -277,9 +293,199 @@ def checkExternal(name=None,command=None,answer=None,quiet=False):
     _congratulations(name,version,'program',quiet=quiet)
     #if version:
     the_external[name] = version
+    _storeExternal(name,command,version)
     return version
 
 
+##########################################################################
+## Persistent cache of detected software ##
+###########################################
+
+_detect_cache = None
+_detect_cache_file = None
+
+def detectCacheFile():
+    """Return the name of the file holding the detection cache.
+
+    The file is stored in the user configuration directory. Returns None
+    if there is no user configuration directory.
+    """
+    confdir = pf.cfg.get('userconfdir',None)
+    if confdir:
+        return os.path.join(confdir,'detected')
+
+
+def detectCache():
+    """Return the persistent cache of detected software.
+
+    The cache is a :class:`Config` which is read from the file returned by
+    :func:`detectCacheFile` on first use. As long as there is no user
+    configuration directory (early in the startup), an empty cache is
+    returned that is not kept: the file is then read on the first use
+    after the configuration has been set.
+    """
+    global _detect_cache,_detect_cache_file
+    from config import Config
+    fn = detectCacheFile()
+    if not fn:
+        return Config()
+    if _detect_cache is None or _detect_cache_file != fn:
+        _detect_cache = Config()
+        _detect_cache_file = fn
+        if os.path.exists(fn):
+            try:
+                _detect_cache.read(fn)
+            except:
+                pf.debug("Error reading detection cache %s" % fn,pf.DEBUG.DETECT)
+                _detect_cache = Config()
+    return _detect_cache
+
+
+def saveDetectCache():
+    """Save the detection cache to file.
+
+    The cache is only saved to the file it was read from.
+    """
+    fn = detectCacheFile()
+    if not fn or _detect_cache is None or _detect_cache_file != fn:
+        return
+    try:
+        if not os.path.exists(os.path.dirname(fn)):
+            os.makedirs(os.path.dirname(fn))
+        detectCache().write(fn,header="# Software detected by pyFormex\n\n")
+    except:
+        pf.debug("Could not save detection cache %s" % fn,pf.DEBUG.DETECT)
+
+
+def which(prog):
+    """Return the full path name of an executable program.
+
+    The program is searched in the directories of the PATH environment
+    variable, unless it contains a directory part.
+    Returns an empty string if no executable was found.
+    """
+    if os.path.dirname(prog):
+        path = [ '' ]
+    else:
+        path = os.environ.get('PATH','').split(os.pathsep)
+    for d in path:
+        fn = os.path.join(d,prog)
+        if os.path.isfile(fn) and os.access(fn,os.X_OK):
+            return fn
+    return ''
+
+
+def _programStamp(command):
+    """Return the path and mtime of the program run by a command."""
+    prog = command.split()
+    if prog:
+        path = which(prog[0])
+        if path:
+            return path,mtime(path)
+    return '',0
+
+
+def _cachedExternal(name):
+    """Return the cached version of an external command.
+
+    Returns None if the command is not in the cache or the cached value
+    is outdated, i.e. if the command was changed, or the executable now
+    resolves to another file, or has been modified.
+    """
+    cached = detectCache().get('externals/%s' % name,None)
+    if cached:
+        try:
+            command,version,path,stamp = cached
+            cmd = known_externals.get(name,(name,))[0]
+            if command == cmd and (path,stamp) == _programStamp(command):
+                return version
+        except:
+            pass
+    return None
+
+
+def _moduleName(name):
+    """Return the name of the module to import for a known module alias."""
+    ver = known_modules.get(name,())
+    if len(ver) > 0 and len(ver[0]) > 0:
+        return ver[0]
+    return name
+
+
+def _moduleStamp(modname):
+    """Return the path and mtime of a module, without importing it.
+
+    For a package, the path and mtime of the package directory of the
+    top level package are returned.
+    """
+    import imp
+    try:
+        fil,path,desc = imp.find_module(modname.split('.')[0])
+        if fil:
+            fil.close()
+    except ImportError:
+        return '',0
+    if path and os.path.exists(path):
+        return path,mtime(path)
+    return path,0
+
+
+def _cachedModule(name):
+    """Return the cached version of a Python module.
+
+    Returns None if the module is not in the cache or the cached value
+    is outdated, i.e. if the module is now found at another place, or
+    has been modified.
+    """
+    cached = detectCache().get('modules/%s' % name,None)
+    if cached:
+        try:
+            version,path,stamp = cached
+            if (path,stamp) == _moduleStamp(_moduleName(name)):
+                return version
+        except:
+            pass
+    return None
+
+
+def _storeModule(name,version):
+    """Store the result of detecting a Python module in the cache."""
+    path,stamp = _moduleStamp(_moduleName(name))
+    value = (version,path,stamp)
+    cache = detectCache()
+    if cache.get('modules/%s' % name,None) != value:
+        cache['modules/%s' % name] = value
+        saveDetectCache()
+
+
+def refreshDetected():
+    """Detect all known modules and external programs anew.
+
+    This clears the detection cache and then checks all the modules in
+    known_modules and all the programs in known_externals. The results
+    are saved in a fresh detection cache.
+    Use this when software was installed or removed in a way that is not
+    noticed by the cache validation.
+    """
+    global _detect_cache,_detect_cache_file
+    from config import Config
+    _detect_cache = Config()
+    _detect_cache_file = detectCacheFile()
+    checkAllModules()
+    checkExternal()
+    saveDetectCache()
+
+
+def _storeExternal(name,command,version):
+    """Store the result of detecting an external command in the cache."""
+    path,stamp = _programStamp(command)
+    value = (command,version,path,stamp)
+    cache = detectCache()
+    if cache.get('externals/%s' % name,None) != value:
+        cache['externals/%s' % name] = value
+        saveDetectCache()
+
+
 def _congratulations(name,version,typ='module',fatal=False,quiet=False,severity=2):
     """Report a detected module/program."""
     if version:
@@ -794,13 +1000,23 @@ def timeEval(s,glob=None):
     return res
 
 
-def countLines(fn):
-    """Return the number of lines in a text file."""
-    sta,out = runCommand("wc %s" % fn)
-    if sta == 0:
-        return int(out.split()[0])
-    else:
+def countLines(fn,blocksize=1<<20):
+    """Return the number of lines in a text file.
+
+    The file is read in blocks of `blocksize` bytes. Returns 0 if the
+    file can not be read.
+    """
+    n = 0
+    try:
+        with open(fn,'rb') as fil:
+            while True:
+                block = fil.read(blocksize)
+                if not block:
+                    break
+                n += block.count('\n')
+    except IOError:
         return 0
+    return n
 
 
 ##########################################################################
@@ -1398,16 +1614,8 @@ def interrogate(item):
 
 def memory_report(keys=None):
     """Return info about memory usage"""
-    sta,out,err = system('cat /proc/meminfo')
-    res = {}
-    for line in out.split('\n'):
-        try:
-            k,v = line.split(':')
-            k = k.strip()
-            v = v.replace('kB','').strip()
-            res[k] = int(v)
-        except:
-            break
+    from memory import meminfo
+    res = meminfo()
     res['MemUsed'] = res['MemTotal'] - res['MemFree'] - res['Buffers'] - res['Cached']
     if keys:
         res = selectDict(res,keys)
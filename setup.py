@@ -185,6 +185,7 @@ def run_setup(with_cext):
               'pyformex.gui',
               'pyformex.lib',
               'pyformex.plugins',
+              'pyformex.bench',
               'pyformex.examples'
               ],
           package_data={ 'pyformex': PKG_DATA },